@@ -26,6 +26,42 @@ c=0.99
 
 VIZ_PER_COVERAGE=20
 VIZ = True
+# Trajectories per plot when workers only send back a sample
+VIZ_MAX_TRAJS=20
+
+# Trajectories simulated per sampling batch
+BATCH_SIZE=100
+
+# Use the batched NumPy engine for equation models (False forces the scalar path)
+BATCH_ENGINE=True
+# In checkSafety, validate log records while simulating and stop rejected trajectories early
+FUSED_VALIDATION=True
+# Particles per splitting run of the rare-event sampler (checkSafety --sampler=smc)
+SMC_PARTICLES=1000
+# Cross-entropy falsification before sampling (checkSafety --falsify): candidates per
+# iteration, iterations, elite fraction, and piecewise-constant noise segments searched
+FALSIFY_POPULATION=200
+FALSIFY_ITERATIONS=25
+FALSIFY_ELITE=0.1
+FALSIFY_SEGMENTS=20
+# In checkSafety, try to prove equation models safe by interval propagation through the log boxes first
+INTERVAL_PRECHECK=True
+# Give up on the interval proof once an enclosure is this many times wider than the widest log box
+INTERVAL_WIDTH_FACTOR=100
+# In checkSafety, prune the initial box of ANN models by interval bound propagation before sampling;
+# bisection rounds and the largest number of sub-boxes kept
+IBP_PRUNE=True
+IBP_MAX_ROUNDS=16
+IBP_MAX_BOXES=4096
+# Give up bisecting when this many sub-boxes are reached without any pruned
+IBP_PROBE_BOXES=1024
+# Trajectory bank (posto.py bank, checkSafety --bank): about this many grid cells over the
+# bank region, and the fewest trajectories simulated into a cell when a query runs out of them
+# (a top-up is otherwise sized to what the query is missing)
+BANK_CELLS=256
+BANK_TOPUP=100
+# Segmented check (checkSafety --segment): trajectories tried per window before it is reported undecided
+SEGMENT_MAX_TRAJS=1000000
 
 '''
 Colors for terminal messages
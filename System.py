@@ -2,6 +2,8 @@ import os,sys,copy
 import time
 import ast
 import json
+import random
+import numpy as np
 
 PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
 sys.path.append(PROJECT_ROOT)
@@ -11,10 +13,18 @@ from lib.GenLog import *
 from lib.TrajValidity import *
 from lib.TrajSafety import *
 from lib.JFBF import *
-from lib.Visualize import *
 from lib.Equation import *
-from lib.ANN import *
-from concurrent.futures import ProcessPoolExecutor
+from lib.Workers import WorkerPool
+from lib.Reservoir import Reservoir
+from lib.LogFile import LogFile
+from lib.Monitor import Monitor
+from lib.Falsify import Falsifier
+from lib.InitCover import InitCover
+from lib.TrajBank import TrajBank
+from lib.STL import STL
+from lib.Metrics import Metrics, clock
+from lib.RejectionProfile import RejectionProfile
+from itertools import count, combinations
 
 
 class System:
@@ -23,16 +33,29 @@ class System:
     dtlog = None
 
 
-    def __init__(self, log_path, mode=None, model_path=None, states=None, constraints=None):
+    def __init__(self, log_path, mode=None, model_path=None, states=None, constraints=None,
+                 workers=1, seed=None, plot=True, spec=None):
 
         self.log_path   = log_path
         self.mode       = mode
         self.model_path = model_path
+        self.rng        = np.random.default_rng()
+        self.workers    = workers
+        self.seed       = seed
+        self.plot       = plot
+        # STL specification (formula or file) checked instead of the constraints
+        self.spec       = spec
+        # Phase timers and counters of the current run (lib/Metrics.py)
+        self.metrics    = Metrics()
+        # Constructor arguments, used to rebuild this System in worker processes
+        self.args       = (log_path, mode, model_path, states, constraints, 1, None, False, spec)
 
         # Select model
         if mode == "equation":
             self.model = Equation(model_path)
         elif mode == "ann":
+            # Keras/TensorFlow is only loaded for ANN models (and only if the NumPy engine cannot run them)
+            from lib.ANN import ANN
             self.model = ANN(model_path)
 
         if os.path.isdir(self.log_path):
@@ -54,16 +77,27 @@ class System:
 
             for item in cons_list:
                 if isinstance(item, dict):
-                    st  = item.get("state_idx", item.get("state"))
+                    st  = item.get("coeffs", item.get("state_idx", item.get("state")))
                     op  = item.get("op",        item.get("inequal"))
                     val = item.get("const",     item.get("value"))
                 else:
                     st, op, val = item
 
-                if isinstance(st, str):
-                    st = state_vars.index(st)
                 if val is None:
                     raise ValueError(f"Constraint {item!r} missing numeric constant")
+                # Linear constraint over several states: {"x": 1.0, "y": -0.5} or one coefficient per state
+                if isinstance(st, list):
+                    st = dict(enumerate(st))
+                if isinstance(st, dict):
+                    coeffs = {}
+                    for k, a in st.items():
+                        k = state_vars.index(k) if isinstance(k, str) and k in state_vars else int(k)
+                        if float(a) != 0:
+                            coeffs[k] = float(a)
+                    processed.append((coeffs, op, float(val)))
+                    continue
+                if isinstance(st, str):
+                    st = state_vars.index(st)
                 processed.append((int(st), op, float(val)))
 
             return state_vars, processed
@@ -86,6 +120,8 @@ class System:
 
     def getNextState(self, state):
         nextState = self.model.getNextState(state)
+        self.metrics.count('modelCalls')
+        self.metrics.count('stepsSimulated')
         return nextState
 
     def getTraj(self, initState, T):
@@ -102,18 +138,474 @@ class System:
         return traj
     
 
-    def getRandomTrajs(self,initSet,T,K):
+    def visualizer(self):
+        """Plotting helper, or None with plotting off; matplotlib is imported on first use."""
+        if not self.plot:
+            return None
+        from lib.Visualize import Visualize
+        return Visualize(VIZ, msg, self.imgdir, self.state_names)
+
+    def safetyChecker(self):
+        """The STL specification when one is given, otherwise the safety constraints."""
+        if self.spec is not None:
+            if not self.state_names:
+                raise RuntimeError("An STL specification needs the state names (--states or the model's state_vars).")
+            return STL.load(self.spec, self.state_names)
+        return TrajSafety(self.constraints)
+
+    def useBatch(self):
+        # Batched engine only for equation models whose step was not overridden (dev mode)
+        return (BATCH_ENGINE and self.mode == 'equation'
+                and self.model.batch is not None
+                and 'getNextState' not in self.__dict__)
+
+    def getRandomTrajsBatch(self, initSet, T, K):
+        """
+        Simulate K trajectories of length T from uniform initial points in
+        initSet, advancing all of them together. Returns a (K, T, n) array.
+        """
+        lo = np.array([dim[0] for dim in initSet], dtype=float)
+        hi = np.array([dim[1] for dim in initSet], dtype=float)
+        states = self.rng.uniform(lo, hi, size=(K, len(initSet)))
+        trajs = self.getTrajsFrom(states, T)
+        if not np.isfinite(trajs).all():
+            print(f"{msg.WARNING}[WARN]{msg.ENDC} Overflow encountered in "
+                  f"{int((~np.isfinite(trajs).all(axis=(1, 2))).sum())} trajectories.")
+        return trajs
+
+    def getTrajsFrom(self, states, T):
+        """
+        (K, T, n) trajectories from given (K, n) initial states, with the
+        batched equation engine or an ANN model. Returns None for engines that
+        only simulate from their own random initial points (dev mode, scalar
+        equations).
+        """
+        if not self.canSimulateFrom():
+            return None
+        if self.useBatch():
+            with self.metrics.phase('simulate'):
+                trajs = np.empty((len(states), T, states.shape[1]))
+                for t in range(T):
+                    trajs[:, t] = states
+                    if t + 1 < T:
+                        states = self.model.getNextStates(states, self.rng)
+            self.metrics.count('modelCalls', max(T - 1, 0))
+            self.metrics.count('stepsSimulated', len(states) * max(T - 1, 0))
+            return trajs
+        with self.metrics.phase('simulate'):
+            trajs = self.model.getTrajs(states, T)
+        self.metrics.count('modelCalls', max(T - 1, 0))
+        self.metrics.count('stepsSimulated', len(states) * max(T - 1, 0))
+        return trajs
+
+    def canSimulateFrom(self):
+        """
+        Whether getTrajsFrom can simulate from given initial states: the
+        batched equation engine, or an ANN model whose step was not
+        overridden (dev mode).
+        """
+        return self.useBatch() or (self.mode == 'ann' and self.canParallel()
+                                   and 'getNextState' not in self.__dict__)
+
+    def stepStates(self, states):
+        """Advance a (K, n) array of states by one step, whatever the engine."""
+        if self.useBatch() or (self.mode == 'ann' and 'getNextState' not in self.__dict__):
+            self.metrics.count('modelCalls')
+            self.metrics.count('stepsSimulated', len(states))
+        if self.useBatch():
+            return self.model.getNextStates(states, self.rng)
+        if self.mode == 'ann' and 'getNextState' not in self.__dict__:
+            if self.model.windowSize(states.shape[1]) > 1:
+                raise ValueError("windowed ANN models cannot be stepped from the current state alone")
+            if 'getNextState' in self.model.__dict__:
+                # Overridden trajectory function (dev mode)
+                return np.array(self.model.getNextState(states.tolist(), 2), dtype=float)[:, 1]
+            return self.model.getTrajs(states, 2)[:, 1]
+        nextStates = []
+        for state in states:
+            nextState = self.getNextState(tuple(state))
+            # Overflow: nan never lies inside a log box
+            nextStates.append([np.nan] * states.shape[1] if nextState is None else list(nextState))
+        return np.array(nextStates, dtype=float).reshape(states.shape)
+
+    def getValidTrajsFused(self, initSet, T, K, logUn, safety_checker, keepRows=None):
+        """
+        Simulate K trajectories while checking every log record as soon as its
+        time step is reached. Trajectories that leave a log box stop being
+        simulated; the survivors run to T. Safety is checked step by step on
+        the surviving states.
+
+        Returns (valTrajs, nInVal, tViolate, valRows): the valid trajectories
+        as a (Kv, T, n) array, the number of rejected ones, for each valid
+        trajectory the first violating time step (-1 if safe), matching
+        TrajValidity.getValTrajs and TrajSafety.isTrajSafe, and the row
+        index of each valid trajectory within the batch.
+
+        keepRows (row indices) limits which trajectories have their history
+        stored; valTrajs then only holds the valid rows among them. With an
+        empty keepRows no history is kept and memory does not depend on T.
+        """
+        valObj = TrajValidity(logUn)
+        order = valObj.order
+        times = valObj.times[order]
+        lo, hi = valObj.lo[order], valObj.hi[order]
+
+        lo0 = np.array([dim[0] for dim in initSet], dtype=float)
+        hi0 = np.array([dim[1] for dim in initSet], dtype=float)
+        states = self.rng.uniform(lo0, hi0, size=(K, len(initSet)))
+        alive = np.arange(K)
+        tViolate = np.full(K, -1)
+        # History slot of every row (-1: not stored)
+        slot = np.full(K, -1)
+        keepRows = alive if keepRows is None else np.asarray(keepRows, dtype=int)
+        slot[keepRows] = np.arange(len(keepRows))
+        trajs = np.empty((len(keepRows), T, len(initSet)))
+        m = self.metrics
+        m.rejections.ensure(len(times), len(initSet))
+        tick = clock()
+        r = 0
+        for t in range(T):
+            s = slot[alive]
+            trajs[s[s >= 0], t] = states[s >= 0]
+            # Drop trajectories outside the box of every record logged at t
+            while r < len(times) and times[r] == t:
+                outside = ~((states >= lo[r]) & (states <= hi[r]))
+                inside = ~outside.any(axis=1)
+                m.rejections.add(order[r], len(states), outside[~inside])
+                states, alive = states[inside], alive[inside]
+                r += 1
+            tick = m.lap('validate', tick)
+            if len(alive) == 0:
+                break
+            if safety_checker.stepwise:
+                bad = safety_checker.violated(states[:, :safety_checker.nStates] @ safety_checker.A.T).any(axis=1)
+                first = alive[bad & (tViolate[alive] < 0)]
+                tViolate[first] = t
+                tick = m.lap('safety', tick)
+            if t + 1 < T:
+                m.count('modelCalls')
+                m.count('stepsSimulated', len(states))
+                states = self.model.getNextStates(states, self.rng)
+                tick = m.lap('simulate', tick)
+
+        s = slot[alive]
+        if not safety_checker.stepwise:
+            # Whole-trajectory checks need the history: only stored rows get a verdict
+            with m.phase('safety'):
+                tViolate[alive[s >= 0]] = safety_checker.getViolations(trajs[s[s >= 0]])
+        return trajs[s[s >= 0]], K - len(alive), tViolate[alive], alive
+
+    def getValidTrajsSplit(self, initSet, T, N, logUn, safety_checker):
+        """
+        Splitting (sequential Monte Carlo) over the log records: N particles
+        start in initSet; at every record the particles outside its box are
+        replaced by copies of uniformly chosen survivors (path, first safety
+        violation and initial ancestor included), and all particles are
+        then simulated on to the next record. Survivors keep their own slot.
+
+        Returns (trajs, ancestors, tViolate, logZ): the final (N, T, n)
+        particle paths, the index of the initial state each one descends
+        from, its first unsafe time step (-1 if safe), and log Z, the
+        log of the product of the survival fractions, which estimates the
+        probability that a plain trajectory is valid. If every particle
+        misses some record the run dies out and trajs is None.
+        """
+        valObj = TrajValidity(logUn)
+        order = valObj.order
+        times = valObj.times[order]
+        lo, hi = valObj.lo[order], valObj.hi[order]
+
+        lo0 = np.array([dim[0] for dim in initSet], dtype=float)
+        hi0 = np.array([dim[1] for dim in initSet], dtype=float)
+        states = self.rng.uniform(lo0, hi0, size=(N, len(initSet)))
+        ancestors = np.arange(N)
+        tViolate = np.full(N, -1)
+        trajs = np.empty((N, T, len(initSet)))
+        m = self.metrics
+        m.rejections.ensure(len(times), len(initSet))
+        tick = clock()
+        logZ = 0.0
+        r = 0
+        for t in range(T):
+            trajs[:, t] = states
+            inside = np.ones(N, dtype=bool)
+            while r < len(times) and times[r] == t:
+                outside = ~((states >= lo[r]) & (states <= hi[r]))
+                missed = inside & outside.any(axis=1)
+                m.rejections.add(order[r], int(inside.sum()), outside[missed])
+                inside &= ~missed
+                r += 1
+            nIn = int(inside.sum())
+            m.count('particlesReplaced', N - nIn)
+            if nIn == 0:
+                m.lap('validate', tick)
+                return None, ancestors[:0], tViolate[:0], -np.inf
+            if nIn < N:
+                logZ += np.log(nIn / N)
+                dead = np.flatnonzero(~inside)
+                src = self.rng.choice(np.flatnonzero(inside), len(dead))
+                states[dead] = states[src]
+                ancestors[dead] = ancestors[src]
+                tViolate[dead] = tViolate[src]
+                trajs[dead, :t + 1] = trajs[src, :t + 1]
+            tick = m.lap('validate', tick)
+            if safety_checker.stepwise:
+                bad = safety_checker.violated(states[:, :safety_checker.nStates] @ safety_checker.A.T).any(axis=1)
+                tViolate[bad & (tViolate < 0)] = t
+                tick = m.lap('safety', tick)
+            if t + 1 < T:
+                states = self.stepStates(states)
+                tick = m.lap('simulate', tick)
+        if not safety_checker.stepwise:
+            with m.phase('safety'):
+                tViolate = safety_checker.getViolations(trajs)
+        return trajs, ancestors, tViolate, logZ
+
+    def seedBatch(self, b, seedSeq):
+        # Batch b gets its own stream derived from the run seed, whichever process runs it
+        child = np.random.SeedSequence(seedSeq.entropy, spawn_key=(b,))
+        self.rng = np.random.default_rng(child)
+        random.seed(int(child.generate_state(1)[0]))
+
+    def canParallel(self):
+        # Overridden step functions (dev mode) cannot be rebuilt in a worker
+        return ('getNextState' not in self.__dict__
+                and 'getNextState' not in getattr(getattr(self, 'model', None), '__dict__', {}))
+
+    def runBatches(self, name, ctx, isFinal=None, nJobs=None):
+        """
+        Yield the results of self.<name>(b, **ctx) for b = 0, 1, 2, ... in
+        order, across `self.workers` processes when possible. Results do not
+        depend on the number of workers, only on the seed.
+        """
+        if self.workers > 1 and not self.canParallel():
+            warn("Custom getNextState cannot run in worker processes; using a single process.")
+        if self.workers <= 1 or not self.canParallel() or nJobs == 1:
+            batches = count() if nJobs is None else range(nJobs)
+            for b in batches:
+                yield getattr(self, name)(b, **ctx)
+            return
+        pool = WorkerPool(self.args, self.workers, ctx)
+        try:
+            for res in pool.map(name, isFinal, nJobs):
+                # The worker's timers and counters for this batch
+                if isinstance(res, dict) and 'metrics' in res:
+                    self.metrics.merge(res.pop('metrics'))
+                yield res
+        finally:
+            pool.close()
+
+    def trajsBatch(self, b, seedSeq, initSet, T, sizes):
+        self.seedBatch(b, seedSeq)
+        return self.getRandomTrajs(initSet, T, sizes[b])
+
+    def getRandomTrajsPar(self, initSet, T, K):
+        """getRandomTrajs split into one seeded chunk per worker."""
+        nChunks = max(1, min(self.workers, K))
+        sizes = [K // nChunks + (1 if i < K % nChunks else 0) for i in range(nChunks)]
+        ctx = {'seedSeq': np.random.SeedSequence(self.seed), 'initSet': initSet, 'T': T, 'sizes': sizes}
+        trajs = []
+        for res in self.runBatches('trajsBatch', ctx, nJobs=nChunks):
+            trajs += res
+        return trajs
+
+    def safetyBatch(self, b, seedSeq, logUn, T, fused, nKeep, bounded=False, cover=None):
+        """
+        One batch of the checkSafety sampling loop: simulate BATCH_SIZE
+        trajectories from the first log box, keep the valid ones and check
+        their safety. Returns counts plus the safe and unsafe trajectories:
+        all of them when nKeep is None, otherwise a uniform sample of at most
+        nKeep of each. In bounded mode the fused loop keeps no history and
+        the sample holds (batch, row) ids, which replayTrajs turns back into
+        trajectories. ANN models draw their initial points from `cover`, an
+        InitCover of the first log box, when one is given.
+        """
+        self.seedBatch(b, seedSeq)
+        safety_checker = self.safetyChecker()
+        if fused:
+            # Simulate and validate together, dropping trajectories at the first missed record
+            valTrajsIt, _, tViolate, valRows = self.getValidTrajsFused(
+                logUn[0][0], T, BATCH_SIZE, logUn, safety_checker,
+                keepRows=[] if bounded else None)
+            if bounded:
+                safe_it = [(b, int(row)) for row in valRows[tViolate < 0]]
+                unsafe_it = [(b, int(row)) for row in valRows[tViolate >= 0]]
+            else:
+                safe_it = valTrajsIt[tViolate < 0].tolist()
+                unsafe_it = valTrajsIt[tViolate >= 0].tolist()
+            nVal = len(valRows)
+        elif self.useBatch():
+            trajs = self.getRandomTrajsBatch(logUn[0][0], T, BATCH_SIZE)
+            with self.metrics.phase('validate'):
+                valTrajsIt, _ = TrajValidity(logUn).getValTrajs(trajs, self.metrics.rejections)
+            with self.metrics.phase('safety'):
+                safe_it, unsafe_it = [arr.tolist() for arr in safety_checker.getSafeUnsafeTrajs(valTrajsIt)]
+            nVal = len(valTrajsIt)
+        else:
+            with self.metrics.phase('simulate'):
+                trajs = self.getRandomTrajs(logUn[0][0], T, BATCH_SIZE, cover=cover)
+            with self.metrics.phase('validate'):
+                valTrajsIt, inValTrajsIt = TrajValidity(logUn).getValTrajs(trajs, self.metrics.rejections)
+            with self.metrics.phase('safety'):
+                safe_it, unsafe_it = safety_checker.getSafeUnsafeTrajs(valTrajsIt)
+            nVal = len(valTrajsIt)
+        self.metrics.count('trajsGenerated', BATCH_SIZE)
+        self.metrics.count('trajsRejected', BATCH_SIZE - nVal)
+        return {
+            'nVal': nVal,
+            'nSafe': len(safe_it),
+            'nUnsafe': len(unsafe_it),
+            'safe': self.sampleItems(safe_it, nKeep),
+            'unsafe': self.sampleItems(unsafe_it, nKeep),
+        }
+
+    def smcBatch(self, b, seedSeq, logUn, T, nKeep):
+        """
+        One independent splitting run of SMC_PARTICLES particles. nVal counts
+        the distinct initial states among the final particles. Resampling
+        makes these lineages dependent, so they are not independent valid
+        samples and support no JFB confidence; the count only measures how
+        much of the initial box a run explored. Safe and unsafe trajectories
+        are sampled one per initial state.
+        """
+        self.seedBatch(b, seedSeq)
+        safety_checker = self.safetyChecker()
+        trajs, ancestors, tViolate, logZ = self.getValidTrajsSplit(
+            logUn[0][0], T, SMC_PARTICLES, logUn, safety_checker)
+        # One representative per initial state; a lineage is unsafe if any of its particles is
+        bad = tViolate >= 0
+        _, safeIdx = np.unique(ancestors[~bad], return_index=True)
+        _, unsafeIdx = np.unique(ancestors[bad], return_index=True)
+        safeIdx = np.flatnonzero(~bad)[safeIdx]
+        unsafeIdx = np.flatnonzero(bad)[unsafeIdx]
+        safeIdx = safeIdx[~np.isin(ancestors[safeIdx], ancestors[unsafeIdx])]
+        self.metrics.count('trajsGenerated', SMC_PARTICLES)
+        return {
+            'logZ': logZ,
+            'nVal': len(safeIdx) + len(unsafeIdx),
+            'nSafe': len(safeIdx),
+            'nUnsafe': len(unsafeIdx),
+            'safe': self.sampleItems([] if trajs is None else trajs[safeIdx].tolist(), nKeep),
+            'unsafe': self.sampleItems([] if trajs is None else trajs[unsafeIdx].tolist(), nKeep),
+        }
+
+    def bankBatch(self, b, seedSeq, logUn, T, nKeep, query):
+        """
+        One batch of the checkSafety sampling loop, drawn from a trajectory
+        bank (lib/TrajBank.py) instead of simulated; same result dict as
+        safetyBatch.
+        """
+        self.seedBatch(b, seedSeq)
+        safety_checker = self.safetyChecker()
+        # Top-ups of the bank count under 'simulate' as well
+        with self.metrics.phase('bankDraw'):
+            trajs = query.draw(self.rng, BATCH_SIZE, self, T)
+        with self.metrics.phase('validate'):
+            valTrajsIt, _ = TrajValidity(logUn).getValTrajs(trajs, self.metrics.rejections)
+        with self.metrics.phase('safety'):
+            safe_it, unsafe_it = [arr.tolist() for arr in safety_checker.getSafeUnsafeTrajs(valTrajsIt)]
+        self.metrics.count('trajsGenerated', BATCH_SIZE)
+        self.metrics.count('trajsRejected', BATCH_SIZE - len(valTrajsIt))
+        return {
+            'nVal': len(valTrajsIt),
+            'nSafe': len(safe_it),
+            'nUnsafe': len(unsafe_it),
+            'safe': self.sampleItems(safe_it, nKeep),
+            'unsafe': self.sampleItems(unsafe_it, nKeep),
+        }
+
+    def bankQuery(self, bank_path, logUn, T):
+        """
+        A BankQuery over the first log box from the bank at bank_path, or
+        None (with a warning) when that bank cannot serve this check.
+        """
+        bank = TrajBank(bank_path)
+        if not bank.matches(self.mode, self.model_path):
+            warn(f"Bank {bank_path} was simulated from a different model; sampling as usual.")
+        elif bank.T < T:
+            warn(f"Bank {bank_path} holds {bank.T}-step trajectories, the log needs {T}; sampling as usual.")
+        elif not bank.serves(logUn[0][0]):
+            warn(f"The first log box is not inside the region of bank {bank_path}; sampling as usual.")
+        elif not self.canSimulateFrom():
+            warn("Custom getNextState models cannot use a bank; sampling as usual.")
+        else:
+            note(f"Bank: {bank_path}, {bank.N} trajectories over {int(np.prod(bank.grid))} cells")
+            return bank.query(logUn[0][0])
+        return None
+
+    def buildBank(self, bank_path, init_set, T, size):
+        """
+        Create a trajectory bank over init_set with T-step trajectories, or
+        add to the existing bank at bank_path, by about `size` trajectories.
+        """
+        if not self.canSimulateFrom():
+            raise RuntimeError("A bank needs the batched equation engine or an ANN model.")
+        if os.path.isfile(os.path.join(bank_path, 'meta.json')):
+            bank = TrajBank(bank_path)
+            if not bank.matches(self.mode, self.model_path):
+                raise RuntimeError(f"{bank_path} holds trajectories of a different model.")
+            if bank.T != T or [[l, h] for l, h in zip(bank.lo, bank.hi)] != init_set:
+                raise RuntimeError(f"{bank_path} covers {[[l, h] for l, h in zip(bank.lo, bank.hi)]} "
+                                   f"with T={bank.T}; use another directory for a different region or horizon.")
+        else:
+            bank = TrajBank.create(bank_path, self.mode, self.model_path, init_set, T, self.seed)
+        ts_start = time.time()
+        nOld = bank.N
+        bank.fill(self, size)
+        note(f"Added {bank.N - nOld} trajectories in {time.time() - ts_start:.2f} sec")
+        note(f"Bank {bank_path}: {bank.N} trajectories of {bank.T} steps over a "
+             f"{' x '.join(map(str, bank.grid))} grid")
+
+    def sampleItems(self, items, nKeep):
+        # Uniform sample (in stream order) for merging into a Reservoir
+        if nKeep is None or len(items) <= nKeep:
+            return items
+        return [items[i] for i in sorted(self.rng.choice(len(items), nKeep, replace=False))]
+
+    def replayTrajs(self, ids, seedSeq, logUn, T):
+        """
+        Rebuild the trajectories behind (batch, row) ids from a bounded run by
+        re-running those batches from their seeded streams.
+        """
+        trajs = {}
+        safety_checker = self.safetyChecker()
+        # Replayed batches were profiled already
+        rejections, self.metrics.rejections = self.metrics.rejections, RejectionProfile()
+        try:
+            for b in sorted({b for b, _ in ids}):
+                rows = sorted(row for bb, row in ids if bb == b)
+                self.seedBatch(b, seedSeq)
+                valTrajs, _, _, valRows = self.getValidTrajsFused(
+                    logUn[0][0], T, BATCH_SIZE, logUn, safety_checker, keepRows=rows)
+                for row, traj in zip([row for row in valRows if row in rows], valTrajs):
+                    trajs[(b, int(row))] = traj
+        finally:
+            self.metrics.rejections = rejections
+        return [trajs[i] for i in ids]
+
+    def getRandomTrajs(self,initSet,T,K,cover=None):
         
         import random
+        if self.useBatch():
+            return self.getRandomTrajsBatch(initSet, T, K).tolist()
+
         if self.mode == 'ann':
-            init_points = []
-            for _ in range(K):
-                point = []
-                for dim in initSet:
-                    value = random.uniform(dim[0], dim[1])
-                    point.append(value)
-                init_points.append(point)
-            return self.model.getNextState(init_points, T)
+            if cover is not None:
+                init_points = cover.sample(self.rng, K).tolist()
+            else:
+                init_points = []
+                for _ in range(K):
+                    point = []
+                    for dim in initSet:
+                        value = random.uniform(dim[0], dim[1])
+                        point.append(value)
+                    init_points.append(point)
+            if 'getNextState' in self.model.__dict__:
+                # Overridden trajectory function (dev mode)
+                return self.model.getNextState(init_points, T)
+            self.metrics.count('modelCalls', max(T - 1, 0))
+            self.metrics.count('stepsSimulated', K * max(T - 1, 0))
+            return self.model.getTrajs(init_points, T).tolist()
             
         trajs=[]
         for i in range(K):
@@ -155,18 +647,21 @@ class System:
         note(f"Model file: {self.model_path}")
         
         K = 10
-        trajs = self.getRandomTrajs(init_set, T, K)
+        trajs = self.getRandomTrajsPar(init_set, T, K)
 
         prefix = "behaviorPair"
         nStates = len(trajs[0][0])
-        for (i, j) in combinations(range(nStates), 2):
-            pair_trajs = []
-            for traj in trajs:
-                new_traj = [ [point[i], point[j]] for point in traj ]
-                pair_trajs.append(new_traj)
-            viz = Visualize(VIZ, msg, self.imgdir, self.state_names)
-            viz.vizTrajs(i, j, pair_trajs, logUn=None, save=True,
-                        name=f"{prefix}_{i}_{j}")
+        viz = self.visualizer()
+        if viz is None:
+            note("Plotting disabled; no behavior plots written.")
+        else:
+            for (i, j) in combinations(range(nStates), 2):
+                pair_trajs = []
+                for traj in trajs:
+                    new_traj = [ [point[i], point[j]] for point in traj ]
+                    pair_trajs.append(new_traj)
+                viz.vizTrajs(i, j, pair_trajs, logUn=None, save=True,
+                            name=f"{prefix}_{i}_{j}")
 
         ok("Behavior generated successfully.")
         ok(f"Stored at: {msg.UNDERLINE}{self.imgdir}{msg.ENDC}")
@@ -191,22 +686,18 @@ class System:
         System.prob = prob
         System.dtlog = dtlog
 
-        trajsL = self.getRandomTrajs(init_set, T, 1)
+        trajsL = self.getRandomTrajsPar(init_set, T, 1)
         logger = GenLog(trajsL[0])
         logUn=logger.genLog(System.dtlog, System.prob)[0]
 
         os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
-        with open(self.log_path, "w") as f:
-            for box, t in logUn:
-                interval_strs = []
-                for (lo, hi) in box:
-                    interval_strs.append(f"[{lo}, {hi}]")
-                intervals_line = ", ".join(interval_strs)
-                f.write(f"t={int(t)}: [{intervals_line}]\n")
+        # Text .lg, or binary .lgb by extension
+        LogFile.fromRecords(logUn).write(self.log_path)
 
-        viz = Visualize(VIZ, msg, self.imgdir, self.state_names)
-        viz.vizLog(logUn, save=True)
-        viz.vizTrajLog(trajsL, logUn, save=True, name_prefix="traj_log_pair")
+        viz = self.visualizer()
+        if viz is not None:
+            viz.vizLog(logUn, save=True)
+            viz.vizTrajLog(trajsL, logUn, save=True, name_prefix="traj_log_pair")
 
 
         ok("Log generated successfully.")
@@ -216,22 +707,216 @@ class System:
         
 
     def readLog(self):  
-        logUn = []
-        max_t = 0
-        with open(self.log_path, "r") as f:
-            for line in f:
-                # Each line in the log looks like: t=0: [[x_lo,x_hi],[y_lo,y_hi]]
-                t_part, box_part = line.strip().split(":")
-                t = int(t_part.split("=")[1])
-                # Use ast.literal_eval to safely parse the box lists
-                box = ast.literal_eval(box_part.strip())
-                logUn.append((box, t))
-                if t > max_t:
-                    max_t = t
-        return logUn, max_t
-
-
-    def checkSafety(self):
+        """
+        Read the log as a LogFile: the text .lg format through the streaming
+        parser, or the binary .lgb format memory-mapped. The result also
+        works as the usual list of (box, t) records.
+        """
+        with self.metrics.phase('parseLog'):
+            logUn = LogFile.read(self.log_path)
+        return logUn, logUn.maxTime()
+
+
+    @staticmethod
+    def anytimeConfidence(jfb, nVal):
+        """
+        What nVal valid samples, all safe, support under the JFB test: the
+        confidence c at the configured B, and the Bayes factor B at the
+        configured c.
+        """
+        return (f"confidence {jfb.getConfidence(nVal):.6f} at B={jfb.B:g} ; "
+                f"Bayes factor {jfb.getBayesFactor(nVal):.4g} at c={jfb.c:g}")
+
+    def reportSplitting(self, logZs, nDistinct, K):
+        """
+        Summary of the splitting runs: the estimated probability that a plain
+        trajectory is valid (mean of the runs' Z) and the number of distinct
+        initial states explored. No confidence is given (see smcBatch).
+        """
+        Z = float(np.mean(np.exp(logZs)))
+        note(f"Splitting: {len(logZs)} run(s) of {SMC_PARTICLES} particles ; "
+             f"estimated P(valid trajectory) = {Z:.3g}")
+        if Z > 0:
+            note(f"Plain sampling would need about {K / Z:.0f} trajectories for {K} valid ones")
+        note(f"Distinct initial states among the valid particles: {nDistinct} ; "
+             f"splitting is screening only and gives no JFB confidence")
+
+    def reportRobustness(self, safety_checker, safeTrajs, unsafeTrajs):
+        """
+        Robustness margin and first violation time of the kept trajectories
+        (all of them, or the uniform sample of a parallel or bounded run).
+        """
+        for name, trajs in (("Safe", safeTrajs), ("Unsafe", unsafeTrajs)):
+            # Truncated (overflowed) trajectories are ragged and get no margin
+            T = max((len(traj) for traj in trajs), default=0)
+            trajs = [traj for traj in trajs if len(traj) == T]
+            if not trajs:
+                continue
+            trajs = np.asarray(trajs, dtype=float)
+            rho = safety_checker.robustness(trajs)
+            line = (f"{msg.OKBLUE}[STL]{msg.ENDC} {name} ({len(trajs)} kept): robustness "
+                    f"min {rho.min():.4g}, median {np.median(rho):.4g}, max {rho.max():.4g}")
+            tViolate = safety_checker.getViolations(trajs)
+            if (tViolate >= 0).any():
+                line += f"; earliest violation at t={int(tViolate[tViolate >= 0].min())}"
+            print(line)
+
+    def falsify(self, logUn, safety_checker, T, seedSeq):
+        """
+        Cross-entropy search for a valid unsafe trajectory (lib/Falsify.py)
+        before sampling. Returns the witness trajectory, or None.
+        """
+        if self.mode == 'ann' and self.model.windowSize(len(logUn[0][0])) > 1 and not self.canSimulateFrom():
+            note("Falsification skipped: this windowed ANN model cannot be simulated from chosen initial states")
+            return None
+        # (0, 0) is the reservoir stream; (b,) keys belong to the batches
+        rng = np.random.default_rng(np.random.SeedSequence(seedSeq.entropy, spawn_key=(0, 1)))
+        ts_start = time.time()
+        res = Falsifier(self, logUn, safety_checker, T, rng).run()
+        ts = time.time() - ts_start
+        if res['witness'] is not None:
+            print(f"{msg.FAIL}[Falsified]{msg.ENDC} Valid trajectory violating the constraints at "
+                  f"t={res['tViolate']}, found among {res['nSims']} candidates in {ts:.2f} sec")
+            return res['witness']
+        margin = (f"; smallest margin of a valid candidate: {res['bestRobustness']:.4g}"
+                  if np.isfinite(res['bestRobustness']) else "; no valid candidate found")
+        note(f"Falsification found no unsafe trajectory among {res['nSims']} candidates "
+             f"({ts:.2f} sec{margin}); sampling as usual")
+        return None
+
+    def intervalCheck(self, logUn, safety_checker, T):
+        """
+        Try to prove safety without sampling. The enclosure starts as the
+        first log box, is pushed through the equations with interval
+        arithmetic (noise over its whole range) and is intersected with the
+        box of every record on the way, since a valid trajectory passes
+        through all of them. Returns (True, None) when no enclosure meets an
+        unsafe half-space, and (False, reason) when the proof fails.
+        """
+        from lib.Interval import Interval
+        if self.mode != 'equation' or 'getNextState' in self.__dict__ or 'getNextState' in self.model.__dict__:
+            return False, "only equation models can be propagated"
+        if not safety_checker.stepwise:
+            return False, "temporal specifications are not supported"
+        step = Equation.buildInterval(self.model_path)
+        if step is None:
+            return False, "closed-loop models are not supported"
+
+        order = np.argsort(logUn.times, kind='stable')
+        times, lo, hi = logUn.times[order], logUn.lo[order], logUn.hi[order]
+        maxWidth = INTERVAL_WIDTH_FACTOR * np.maximum((hi - lo).max(axis=0), 1e-12)
+        # Upper bound of A[j] @ x over a box, rounded outward
+        rows = [[float(a) for a in row] for row in safety_checker.A]
+        bounds = safety_checker.b
+        nStates = safety_checker.nStates
+
+        boxes = [Interval(l, h) for l, h in logUn[0][0]]
+        r = 0
+        for t in range(T):
+            if t > 0:
+                try:
+                    boxes = step(boxes)
+                except Exception as e:
+                    return False, f"interval evaluation failed at t={t} ({e})"
+            while r < len(times) and times[r] == t:
+                boxes = [Interval(max(x.lo, l), min(x.hi, h)) for x, l, h in zip(boxes, lo[r], hi[r])]
+                if any(x.lo > x.hi for x in boxes):
+                    raise RuntimeError(f"No trajectory of the model passes through the log box at t={t}; "
+                                       "the log does not match the model.")
+                r += 1
+            for j, row in enumerate(rows):
+                top = sum((a * x for a, x in zip(row, boxes[:nStates]) if a != 0), Interval(0.0)).hi
+                if top >= bounds[j]:
+                    return False, f"the enclosure meets an unsafe half-space at t={t}"
+            widths = np.array([x.width() for x in boxes])
+            if not np.all(widths <= maxWidth):
+                return False, f"the enclosure grew too wide at t={t}"
+        return True, None
+
+    def coverInitSet(self, logUn):
+        """
+        For ANN models run by the NumPy engine, the sub-boxes of the first log
+        box that interval bound propagation cannot rule out (lib/InitCover.py).
+        Returns None when there is nothing to prune with.
+        """
+        if not IBP_PRUNE or self.mode != 'ann' or not self.canParallel() or 'getNextState' in self.__dict__:
+            return None
+        ts_start = time.time()
+        cover = InitCover.build(self.model, logUn[0][0], logUn)
+        if cover is None:
+            if self.model.net is not None:
+                note(f"IBP pruned nothing from the initial box ({time.time() - ts_start:.2f} sec); "
+                     f"sampling it uniformly")
+            return None
+        if len(cover) == 0:
+            raise RuntimeError("No initial point in the first log box reaches every log record; "
+                               "the log does not match the model.")
+        note(f"IBP kept {len(cover)} sub-boxes covering {100 * cover.fraction():.3g}% of the initial box "
+             f"({time.time() - ts_start:.2f} sec); sampling initial points from them")
+        return cover
+
+    def instrumented(self, run, report=None, profile=False, **options):
+        """
+        Run `run()` with fresh timers and counters in self.metrics, under
+        cProfile and tracemalloc if `profile`, and write a JSON report of the
+        run's result (verdict and counts) and all metrics to `report`.
+        """
+        self.metrics.reset()
+        if profile:
+            self.metrics.startProfile()
+        start = clock()
+        result = {'verdict': 'ERROR'}
+        try:
+            result = run()
+            return result
+        except Exception as e:
+            result = {'verdict': 'ERROR', 'error': repr(e)}
+            raise
+        finally:
+            self.metrics.lap('total', start)
+            prof = self.metrics.stopProfile(os.path.join(self.imgdir, 'profile')) if profile else None
+            if prof is not None:
+                info("Profile (wall and CPU time per phase; phases may nest):")
+                self.metrics.summary()
+                note(f"cProfile data: {prof['cprofile']} ; summary: {prof['summary']} ; "
+                     f"traced memory peak {prof['tracedPeakMB']:.1f} MiB")
+            if report:
+                Metrics.writeReport(report, {
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'log': self.log_path, 'mode': self.mode, 'model': self.model_path,
+                    'seed': self.seed, 'workers': self.workers, 'spec': self.spec,
+                    'options': options,
+                    'result': result,
+                    'parameters': {'B': B, 'c': c, 'BATCH_SIZE': BATCH_SIZE},
+                    'metrics': self.metrics.report(),
+                    'profile': prof,
+                })
+                note(f"Report written to {report}")
+
+    def checkSafety(self, bounded=False, sampler='iid', falsify=False, bank=None,
+                    quiet=False, report=None, profile=False, timeBudget=None):
+        """
+        Check the log for safety (runSafetyCheck), with the instrumentation of
+        `instrumented`. `quiet` drops the progress line of every batch.
+        """
+        return self.instrumented(
+            lambda: self.runSafetyCheck(bounded, sampler, falsify, bank, quiet, timeBudget), report, profile,
+            command='checkSafety', bounded=bounded, sampler=sampler, falsify=falsify, bank=bank,
+            timeBudget=timeBudget)
+
+    def runSafetyCheck(self, bounded=False, sampler='iid', falsify=False, bank=None, quiet=False,
+                       timeBudget=None, K=None, trace=None):
+        """
+        Sample valid trajectories until K of them are safe or one is unsafe.
+        With timeBudget (seconds), sampling also stops after the first batch
+        that ends past the budget; the verdict is then UNDECIDED unless an
+        unsafe trajectory was found, and the confidence reached so far is
+        reported (anytimeConfidence).
+
+        K defaults to the JFB sample count of the configured B and c. A
+        `trace` list receives (trajectories generated, valid, unsafe,
+        seconds), all cumulative, after every batch.
+        """
 
         os.makedirs(self.imgdir, exist_ok=True)
         info("Running safety check...")
@@ -240,78 +925,191 @@ class System:
         note(f"Model File: {self.model_path}")
 
         # Ensure constraints have been loaded
-        if not self.constraints:
+        if not self.constraints and self.spec is None:
             raise RuntimeError("No constraints defined in the model; cannot perform safety check.")
 
-        # Create the safety checker with all constraints
-        safety_checker = TrajSafety(self.constraints)
-        note("Using constraints from JSON model:")
-        for st_idx, oper, bound in self.constraints:
-            note(f"  state[{st_idx}] {oper} {bound}")
+        # Create the safety checker with all constraints, or the STL specification
+        safety_checker = self.safetyChecker()
+        if self.spec is not None:
+            note(f"Using STL specification: {safety_checker.describe()}")
+        else:
+            note("Using constraints from JSON model:")
+            for con in self.constraints:
+                note(f"  {TrajSafety.describe(con)}")
 
         ts_start = time.time()
         logUn, T = self.readLog()
         T = T + 1
-        K = JFB(B, c).getNumberOfSamples()
+        jfb = JFB(B, c)
+        K = jfb.getNumberOfSamples() if K is None else K
         isSafe = True
+        outOfTime = False
         totTrajs = 0
-        valTrajObj = TrajValidity(logUn)
-        valTrajs = []
+        nVal = nSafe = nUnsafe = 0
         safeTrajs = []
         unsafeTrajs = []
 
+        # Bounded fused runs keep no history, which whole-trajectory specifications need
+        fused = FUSED_VALIDATION and self.useBatch() and not (bounded and not safety_checker.stepwise)
+        # Worker processes and bounded runs only keep a uniform sample of trajectories for the plots
+        parallel = self.workers > 1 and self.canParallel()
+        seedSeq = np.random.SeedSequence(self.seed)
+        ctx = {'seedSeq': seedSeq, 'logUn': logUn, 'T': T, 'fused': fused,
+               'nKeep': VIZ_MAX_TRAJS if (parallel or bounded) else None,
+               'bounded': bounded}
+        batchName, batchSize = 'safetyBatch', BATCH_SIZE
+        if sampler == 'smc':
+            if self.mode == 'ann' and self.model.windowSize(len(logUn[0][0])) > 1:
+                raise RuntimeError("Windowed ANN models are not Markovian in the state; splitting cannot "
+                                   "resample particles from their current state. Use --sampler=iid.")
+            # Splitting runs, screening only; their valid count is the number of distinct initial states
+            ctx = {'seedSeq': seedSeq, 'logUn': logUn, 'T': T, 'nKeep': ctx['nKeep']}
+            batchName, batchSize = 'smcBatch', SMC_PARTICLES
+            note(f"Sampler: splitting over log records, {SMC_PARTICLES} particles per run")
+        logZs = []
+        # (b,) spawn keys belong to the batches
+        resRng = np.random.default_rng(np.random.SeedSequence(seedSeq.entropy, spawn_key=(0, 0)))
+        safeRes = Reservoir(VIZ_MAX_TRAJS, resRng)
+        unsafeRes = Reservoir(VIZ_MAX_TRAJS, resRng)
+
         # Check the log samples for immediate violations
         safeSamps, unsafeSamps = safety_checker.getSafeUnsafeLog(logUn)
+        safety_checker.reportLogViolations(unsafeSamps)
 
-        if len(unsafeSamps) == 0:
-            # Generate and test random trajectories
-            while len(valTrajs) <= K:
-                try:
-                    # Generate K valid trajectories from the initial log box
-                    trajs = self.getRandomTrajs(logUn[0][0], T, 100)
-                except OverflowError as e:
-                    print(f"{msg.FAIL}[ERROR]{msg.ENDC} {e}")
-                    print(f"{msg.WARNING}[HINT]{msg.ENDC} Aborting safety check because the system state blew up.")
-                    return
-                totTrajs += 1
-                valTrajsIt, inValTrajsIt = valTrajObj.getValTrajs(trajs)
-                valTrajs += valTrajsIt
-                print(f"{msg.HEADER}Total Trajectories Generated:{msg.ENDC} "
-                    f"{msg.BOLD}{totTrajs * 100}{msg.ENDC} ; "
-                    f"{msg.OKCYAN}Valid Trajectories:{msg.ENDC} "
-                    f"{msg.BOLD}{len(valTrajs)}{msg.ENDC}")
-                safe_it, unsafe_it = safety_checker.getSafeUnsafeTrajs(valTrajsIt)
-                safeTrajs += safe_it
-                unsafeTrajs += unsafe_it
-                if unsafe_it:
-                    isSafe = False
-                    break
-                if len(valTrajs) >= K:
-                    break
-        else:
+        proved = False
+        if INTERVAL_PRECHECK and len(unsafeSamps) == 0 and self.mode == 'equation' and safety_checker.stepwise:
+            ts_iv = time.time()
+            with self.metrics.phase('intervalCheck'):
+                proved, reason = self.intervalCheck(logUn, safety_checker, T)
+            if proved:
+                print(f"{msg.OKGREEN}[Proved]{msg.ENDC} Interval enclosure through the log boxes never meets "
+                      f"the unsafe set ({time.time() - ts_iv:.2f} sec); no sampling needed")
+            else:
+                note(f"Interval pre-check inconclusive: {reason}; sampling as usual")
+
+        witness = None
+        if falsify and len(unsafeSamps) == 0 and not proved:
+            with self.metrics.phase('falsify'):
+                witness = self.falsify(logUn, safety_checker, T, seedSeq)
+            if witness is not None:
+                # One valid unsafe trajectory settles the verdict
+                isSafe = False
+                nVal = nUnsafe = 1
+                unsafeTrajs = [witness.tolist()]
+
+        if len(unsafeSamps) == 0 and witness is None and not proved:
+            query = None
+            if sampler == 'iid' and bank:
+                query = self.bankQuery(bank, logUn, T)
+            if query is not None:
+                ctx = {'seedSeq': seedSeq, 'logUn': logUn, 'T': T, 'nKeep': ctx['nKeep'], 'query': query}
+                # The bank is memory-mapped and grows in place: draw from it in this process
+                results = (self.bankBatch(b, **ctx) for b in count())
+            else:
+                if sampler == 'iid':
+                    with self.metrics.phase('initCover'):
+                        ctx['cover'] = self.coverInitSet(logUn)
+                results = self.runBatches(batchName, ctx, isFinal=lambda r: r['nUnsafe'] > 0)
+            # Generate and test random trajectories from the initial log box
+            try:
+                for res in results:
+                    totTrajs += 1
+                    logZs.append(res.get('logZ'))
+                    nVal += res['nVal']
+                    nSafe += res['nSafe']
+                    nUnsafe += res['nUnsafe']
+                    if trace is not None:
+                        trace.append((totTrajs * batchSize, nVal, nUnsafe, time.time() - ts_start))
+                    if not quiet:
+                        print(f"{msg.HEADER}Total Trajectories Generated:{msg.ENDC} "
+                            f"{msg.BOLD}{totTrajs * batchSize}{msg.ENDC} ; "
+                            f"{msg.OKCYAN}Valid Trajectories:{msg.ENDC} "
+                            f"{msg.BOLD}{nVal}{msg.ENDC}"
+                            + ("" if sampler == 'smc' else f" ; {self.anytimeConfidence(jfb, nVal)}"), flush=True)
+                    if ctx['nKeep'] is None:
+                        safeTrajs += res['safe']
+                        unsafeTrajs += res['unsafe']
+                    else:
+                        safeRes.merge(res['safe'], res['nSafe'])
+                        unsafeRes.merge(res['unsafe'], res['nUnsafe'])
+                    if res['nUnsafe']:
+                        isSafe = False
+                        break
+                    if nVal >= K:
+                        break
+                    if timeBudget is not None and time.time() - ts_start >= timeBudget:
+                        outOfTime = True
+                        break
+            except OverflowError as e:
+                print(f"{msg.FAIL}[ERROR]{msg.ENDC} {e}")
+                print(f"{msg.WARNING}[HINT]{msg.ENDC} Aborting safety check because the system state blew up.")
+                return {'verdict': 'ERROR', 'error': str(e)}
+            if query is not None:
+                note(f"Bank: drew {totTrajs * batchSize} trajectories; simulated {query.nNew} new ones into the bank")
+        elif not proved:
             isSafe = False
 
+        if ctx['nKeep'] is not None and witness is None:
+            safeTrajs, unsafeTrajs = safeRes.items, unsafeRes.items
+            if bounded and fused and sampler != 'smc' and 'query' not in ctx:
+                with self.metrics.phase('replay'):
+                    safeTrajs = self.replayTrajs(safeTrajs, seedSeq, logUn, T)
+                    unsafeTrajs = self.replayTrajs(unsafeTrajs, seedSeq, logUn, T)
+
         ts = time.time() - ts_start
         print(f"{msg.BOLD}Time Taken:{msg.ENDC} {msg.OKCYAN}{ts}{msg.ENDC}")
 
+        if sampler == 'smc' and logZs:
+            self.reportSplitting(logZs, nVal, K)
+        if self.spec is not None:
+            self.reportRobustness(safety_checker, safeTrajs, unsafeTrajs)
+
+        # Splitting that finds no valid unsafe trajectory decides nothing
+        screened = sampler == 'smc' and isSafe and not proved
+
         # Reporting results
-        if isSafe:
+        if screened:
+            print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.WARNING}{msg.BOLD}UNDECIDED{msg.ENDC} "
+                  f"(screening: splitting found no valid unsafe trajectory; use --sampler=iid for a verdict)")
+        elif outOfTime and isSafe:
+            print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.WARNING}{msg.BOLD}UNDECIDED{msg.ENDC} "
+                  f"(time budget of {timeBudget:g} sec used up with {nVal} of K={K} valid samples)")
+            note(f"Reached: {self.anytimeConfidence(jfb, nVal)}")
+        elif isSafe:
             print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.OKGREEN}{msg.BOLD}SAFE{msg.ENDC}")
         else:
             print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.FAIL}{msg.BOLD}UNSAFE{msg.ENDC}")
-        print(f"{msg.OKBLUE}[Trajs]{msg.ENDC} {msg.OKGREEN}Safe:{msg.ENDC} {len(safeTrajs)} "
-            f"{msg.FAIL}Unsafe:{msg.ENDC} {len(unsafeTrajs)}")
+        print(f"{msg.OKBLUE}[Trajs]{msg.ENDC} {msg.OKGREEN}Safe:{msg.ENDC} {nSafe} "
+            f"{msg.FAIL}Unsafe:{msg.ENDC} {nUnsafe}")
         print(f"{msg.OKCYAN}[Log]{msg.ENDC} {msg.OKGREEN}Safe:{msg.ENDC} {len(safeSamps)} "
             f"{msg.FAIL}Unsafe:{msg.ENDC} {len(unsafeSamps)}")
-        print(f"{msg.HEADER}Total Trajectories Generated:{msg.ENDC} {msg.BOLD}{totTrajs * 100}{msg.ENDC} ; "
-            f"{msg.OKCYAN}Valid Trajectories:{msg.ENDC} {msg.BOLD}{len(valTrajs)}{msg.ENDC}")
+        print(f"{msg.HEADER}Total Trajectories Generated:{msg.ENDC} {msg.BOLD}{totTrajs * batchSize}{msg.ENDC} ; "
+            f"{msg.OKCYAN}Valid Trajectories:{msg.ENDC} {msg.BOLD}{nVal}{msg.ENDC}")
+        result = {
+            'verdict': ('UNDECIDED' if outOfTime or screened else 'SAFE') if isSafe else 'UNSAFE',
+            'proved': proved, 'witness': witness is not None, 'outOfTime': outOfTime,
+            # What the valid samples support; not defined for proved, unsafe or screening verdicts
+            'confidence': jfb.getConfidence(nVal) if isSafe and not proved and not screened else None,
+            'bayesFactor': jfb.getBayesFactor(nVal) if isSafe and not proved and not screened else None,
+            'trajsGenerated': totTrajs * batchSize, 'valid': nVal, 'safe': nSafe, 'unsafe': nUnsafe,
+            'logSafe': len(safeSamps), 'logUnsafe': len(unsafeSamps),
+            'K': K, 'timeTaken': ts,
+        }
+        rejections = self.reportRejections(logUn)
+        result['rejectionProfile'] = rejections
 
-        viz = Visualize(VIZ, msg, self.imgdir, self.state_names)
+        plotStart = clock()
+        viz = self.visualizer()
+        if viz is None:
+            return result
+        if rejections:
+            viz.vizRejections(rejections, save=True, name="RejectionProfile")
 
         n_states = len(logUn[0][0]) if logUn else 0
 
         for state_idx in range(n_states):
-            bounds = [const for (st, op, const) in self.constraints if st == state_idx]
+            # Only single-state constraints can be drawn as a threshold line
+            bounds = [const for (st, op, const) in self.constraints or [] if st == state_idx]
 
             if unsafeSamps:
                 viz.vizLogsSafeUnsafe2D(
@@ -339,3 +1137,267 @@ class System:
                     state_idx, save=True,
                     name=f"UnsafeTrajs_state{state_idx}"
                 )
+        self.metrics.lap('plot', plotStart)
+        return result
+
+    def sweepSafety(self, pairs, bounded=False, sampler='iid', falsify=False, bank=None,
+                    quiet=False, report=None, profile=False, timeBudget=None):
+        """
+        Safety verdicts for several (B, c) pairs from one sample stream: the
+        check samples up to the largest K, and each pair is decided on the
+        prefix of batches a checkSafety run at that (B, c) would have used
+        (runSweep).
+        """
+        return self.instrumented(
+            lambda: self.runSweep(pairs, bounded, sampler, falsify, bank, quiet, timeBudget), report, profile,
+            command='sweep', pairs=pairs, bounded=bounded, sampler=sampler, falsify=falsify, bank=bank,
+            timeBudget=timeBudget)
+
+    def runSweep(self, pairs, bounded=False, sampler='iid', falsify=False, bank=None, quiet=False,
+                 timeBudget=None):
+        """
+        A pair with sample count K_i is decided by the batches up to the
+        first one after which K_i valid samples are in: UNSAFE if one of
+        them holds an unsafe trajectory, SAFE otherwise. With the same seed
+        this is the verdict checkSafety gives at that (B, c), batch for
+        batch; pairs whose K_i the stream never reached are UNDECIDED.
+        """
+        Ks = [JFB(Bi, ci).getNumberOfSamples() for Bi, ci in pairs]
+        info(f"Sweeping {len(pairs)} (B, c) pairs; sampling up to K={max(Ks)}")
+        trace = []
+        result = self.runSafetyCheck(bounded, sampler, falsify, bank, quiet, timeBudget, K=max(Ks), trace=trace)
+        if result['verdict'] == 'ERROR':
+            return result
+
+        rows = []
+        for (Bi, ci), Ki in zip(pairs, Ks):
+            row = {'B': Bi, 'c': ci, 'K': Ki, 'verdict': 'UNDECIDED',
+                   'trajsGenerated': None, 'valid': None, 'timeTaken': None}
+            if result['proved']:
+                row['verdict'] = 'SAFE'
+            elif not trace and result['verdict'] == 'UNSAFE':
+                # Unsafe log records or a falsification witness decide every pair
+                row['verdict'] = 'UNSAFE'
+            for nGen, nVal, nUnsafe, ts in trace:
+                if nUnsafe or nVal >= Ki:
+                    row.update(verdict='UNSAFE' if nUnsafe else 'SAFE', trajsGenerated=nGen, valid=nVal, timeTaken=ts)
+                    break
+            rows.append(row)
+
+        colors = {'SAFE': msg.OKGREEN, 'UNSAFE': msg.FAIL, 'UNDECIDED': msg.WARNING}
+        info("Sweep (each pair decided on a prefix of the same sample stream):")
+        for row in rows:
+            used = (f"{row['valid']} valid of {row['trajsGenerated']} trajectories, {row['timeTaken']:.2f} sec"
+                    if row['valid'] is not None else
+                    "not reached" if row['verdict'] == 'UNDECIDED' else "decided before sampling")
+            print(f"  B={row['B']:<10g} c={row['c']:<8g} K={row['K']:<6} "
+                  f"{colors[row['verdict']]}{msg.BOLD}{row['verdict']}{msg.ENDC} ({used})")
+        result['sweep'] = rows
+        return result
+
+    def reportRejections(self, logUn):
+        """
+        Write the rejection profile of the run (lib/RejectionProfile.py) to
+        img/rejection_profile.json and print the records that reject the
+        most trajectories. Returns the per-record rows.
+        """
+        profile = self.metrics.rejections
+        rows = profile.report(logUn.times, self.state_names)
+        if not any(row['reached'] for row in rows):
+            return rows
+        path = os.path.join(self.imgdir, 'rejection_profile.json')
+        RejectionProfile.write(path, rows)
+        if any(row['rejected'] for row in rows):
+            info("Records rejecting the most trajectories (first missed record, in time order):")
+            profile.summary(rows)
+        note(f"Rejection profile written to {path}")
+        return rows
+
+    def splitLog(self, logUn, steps):
+        """
+        Cut the log into windows of about `steps` time steps. A window ends at
+        the last record within `steps` of its first (at least the next record
+        time) and the next window starts at that same record, so every record
+        and every step between records is in some window. Returns a list of
+        (t0, LogFile with times shifted by -t0).
+        """
+        order = np.argsort(logUn.times, kind='stable')
+        times, lo, hi = logUn.times[order], logUn.lo[order], logUn.hi[order]
+        windows = []
+        start = 0
+        while True:
+            t0 = int(times[start])
+            nxt = int(np.searchsorted(times, t0, side='right'))
+            end = int(np.searchsorted(times, t0 + steps, side='right')) - 1
+            if nxt < len(times):
+                end = max(end, nxt)
+            # All records at the last time belong to the window
+            end = int(np.searchsorted(times, times[end], side='right')) - 1
+            windows.append((t0, LogFile(times[start:end + 1] - t0, lo[start:end + 1], hi[start:end + 1])))
+            if end == len(times) - 1:
+                return windows
+            start = int(np.searchsorted(times, times[end], side='left'))
+
+    def segmentBatch(self, b, seedSeq, windows, fused):
+        """
+        Check window b on its own: sample trajectories from its first log box
+        until K of them pass its records, one of those is unsafe, or
+        SEGMENT_MAX_TRAJS have been tried.
+        """
+        t0, sub = windows[b]
+        T = sub.maxTime() + 1
+        K = JFB(B, c).getNumberOfSamples()
+        # Every window has its own streams
+        winSeq = np.random.SeedSequence([seedSeq.entropy, b])
+        nVal = nGen = 0
+        witness = None
+        # Window records are numbered within the window: keep them out of the log's rejection profile
+        rejections, self.metrics.rejections = self.metrics.rejections, RejectionProfile()
+        try:
+            for j in count():
+                res = self.safetyBatch(j, winSeq, sub, T, fused, nKeep=1)
+                nGen += BATCH_SIZE
+                nVal += res['nVal']
+                if res['nUnsafe']:
+                    witness = np.asarray(res['unsafe'][0])
+                    break
+                if nVal >= K or nGen >= SEGMENT_MAX_TRAJS:
+                    break
+        finally:
+            self.metrics.rejections = rejections
+        verdict = 'unsafe' if witness is not None else ('safe' if nVal >= K else 'undecided')
+        tViolate = -1
+        if witness is not None:
+            tViolate = t0 + int(TrajSafety(self.constraints).getViolations(witness[None])[0])
+        return {'t0': t0, 't1': t0 + T - 1, 'verdict': verdict, 'nVal': nVal, 'nGen': nGen,
+                'tViolate': tViolate}
+
+    def checkSafetySegmented(self, steps, report=None, profile=False):
+        """
+        Screening check for long logs: every window of about `steps` time
+        steps (splitLog) is checked independently, starting from its own first
+        log box, across worker processes. Needs a Markovian model, whose next
+        state depends on the current state alone.
+        """
+        return self.instrumented(lambda: self.runSegmented(steps), report, profile,
+                                 command='checkSafety', segment=steps)
+
+    def runSegmented(self, steps):
+        info(f"Running segmented safety check (windows of about {steps} steps)...")
+        note(f"Log path: {self.log_path}")
+        note(f"Mode: {self.mode}")
+        note(f"Model File: {self.model_path}")
+        if not self.constraints:
+            raise RuntimeError("No constraints defined in the model; cannot perform safety check.")
+        if self.spec is not None:
+            raise RuntimeError("Segmented checks split the log in time; they do not support STL specifications.")
+
+        ts_start = time.time()
+        logUn, _ = self.readLog()
+        if self.mode == 'ann' and self.model.windowSize(len(logUn[0][0])) > 1:
+            raise RuntimeError("Windowed ANN models are not Markovian in the state; "
+                               "a window cannot start from a single log box.")
+        safety_checker = TrajSafety(self.constraints)
+        safeSamps, unsafeSamps = safety_checker.getSafeUnsafeLog(logUn)
+        safety_checker.reportLogViolations(unsafeSamps)
+        if unsafeSamps:
+            print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.FAIL}{msg.BOLD}UNSAFE{msg.ENDC}")
+            return {'verdict': 'UNSAFE', 'logUnsafe': len(unsafeSamps)}
+
+        windows = self.splitLog(logUn, steps)
+        note(f"{len(windows)} windows over t=0..{logUn.maxTime()}")
+        ctx = {'seedSeq': np.random.SeedSequence(self.seed), 'windows': windows,
+               'fused': FUSED_VALIDATION and self.useBatch()}
+        colors = {'safe': msg.OKGREEN, 'unsafe': msg.FAIL, 'undecided': msg.WARNING}
+        results = []
+        for b, res in enumerate(self.runBatches('segmentBatch', ctx, nJobs=len(windows))):
+            results.append(res)
+            extra = f", first violation at t={res['tViolate']}" if res['tViolate'] >= 0 else ""
+            print(f"{msg.OKBLUE}[Window {b}]{msg.ENDC} t={res['t0']}..{res['t1']}: "
+                  f"{colors[res['verdict']]}{res['verdict'].upper()}{msg.ENDC} "
+                  f"({res['nVal']} valid of {res['nGen']}{extra})")
+
+        ts = time.time() - ts_start
+        print(f"{msg.BOLD}Time Taken:{msg.ENDC} {msg.OKCYAN}{ts}{msg.ENDC}")
+        verdicts = [res['verdict'] for res in results]
+        if 'unsafe' in verdicts:
+            verdict, color = 'UNSAFE', msg.FAIL
+        elif 'undecided' in verdicts:
+            verdict, color = 'UNDECIDED', msg.WARNING
+        else:
+            verdict, color = 'SAFE', msg.OKGREEN
+        print(f"{msg.BOLD}Safety (segmented):{msg.ENDC} {color}{msg.BOLD}{verdict}{msg.ENDC} ; "
+              f"{verdicts.count('safe')} safe, {verdicts.count('unsafe')} unsafe, "
+              f"{verdicts.count('undecided')} undecided of {len(windows)} windows")
+        note("Guarantee: each window is checked over every trajectory piece that starts anywhere in its first "
+             "log box and passes its records. This over-approximates the pieces of trajectories that pass the "
+             "whole log.")
+        note(f"SAFE: every window passed the JFB test (B={B}, c={c}) under its own sampling distribution, uniform "
+             "over the window's first box. That distribution is not the single-pass one, so this is a screening "
+             "result, not the single-pass guarantee.")
+        note("UNSAFE: the unsafe piece is consistent with its window's records only, and may be spurious for the "
+             "whole log; confirm with a single-pass check.")
+        return {'verdict': verdict, 'timeTaken': ts,
+                'windows': [{key: res[key] for key in ('t0', 't1', 'verdict', 'nVal', 'nGen', 'tViolate')}
+                            for res in results]}
+
+    def monitor(self, poll=1.0, maxIdle=None):
+        """
+        Follow a text log as it grows and update the verdict after every
+        batch of appended records, keeping the valid trajectories in memory
+        (see lib/Monitor.py). Stops after maxIdle seconds without new
+        records, or on Ctrl-C.
+        """
+        info("Monitoring log...")
+        note(f"Log path: {self.log_path}")
+        note(f"Mode: {self.mode}")
+        note(f"Model File: {self.model_path}")
+
+        if not self.constraints:
+            raise RuntimeError("No constraints defined in the model; cannot perform safety check.")
+        safety_checker = TrajSafety(self.constraints)
+        note("Using constraints from JSON model:")
+        for con in self.constraints:
+            note(f"  {TrajSafety.describe(con)}")
+
+        K = JFB(B, c).getNumberOfSamples()
+        self.seedBatch(0, np.random.SeedSequence(self.seed))
+        mon = Monitor(self, K, safety_checker)
+        offset = 0
+        idle = 0.0
+        try:
+            while True:
+                size = os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0
+                if size < offset:
+                    warn("Log file was truncated; starting over.")
+                    mon = Monitor(self, K, safety_checker)
+                    offset = 0
+                new, offset = LogFile.readTextFrom(self.log_path, offset) if size else (None, 0)
+                if new is None:
+                    if maxIdle is not None and idle >= maxIdle:
+                        break
+                    time.sleep(poll)
+                    idle += poll
+                    continue
+                idle = 0.0
+                ts_start = time.time()
+                nNew = mon.update(new)
+                ts = time.time() - ts_start
+                verdict = (f"{msg.OKGREEN}{msg.BOLD}SAFE{msg.ENDC}" if mon.isSafe()
+                           else f"{msg.FAIL}{msg.BOLD}UNSAFE{msg.ENDC}")
+                print(f"{msg.OKBLUE}[t={mon.t}]{msg.ENDC} +{len(new)} records ({mon.nRecords} total) ; "
+                    f"{msg.OKCYAN}Valid:{msg.ENDC} {len(mon.states)} (refilled {nNew}) ; "
+                    f"{msg.FAIL}Unsafe:{msg.ENDC} {mon.nUnsafe()} trajs, {mon.nLogUnsafe} log records ; "
+                    f"{ts:.4f} sec ; {verdict}")
+        except KeyboardInterrupt:
+            print()
+
+        if mon.nRecords == 0:
+            warn("No log records were read.")
+            return
+        if mon.isSafe():
+            print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.OKGREEN}{msg.BOLD}SAFE{msg.ENDC}")
+        else:
+            print(f"{msg.BOLD}Safety:{msg.ENDC} {msg.FAIL}{msg.BOLD}UNSAFE{msg.ENDC}")
+        print(f"{msg.HEADER}Total Trajectories Generated:{msg.ENDC} {msg.BOLD}{mon.nGenerated}{msg.ENDC} ; "
+            f"{msg.OKCYAN}Valid Trajectories:{msg.ENDC} {msg.BOLD}{len(mon.states)}{msg.ENDC}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark: an equation-mode `posto.py checkSafety --no-plot` run
+on a small log must finish within a time budget, and importing System must
+not load TensorFlow, Keras or matplotlib. Exits with status 1 when either
+check fails, so it can run in CI.
+
+Usage:
+    startup.py [--runs=<N>] [--budget=<sec>]
+
+Options:
+    --runs=<N>        Number of timed runs [default: 5].
+    --budget=<sec>    Budget for the median wall time of a run, in seconds [default: 3.0].
+"""
+
+import os,sys
+import subprocess
+import time
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+from docopt import docopt
+from Parameters import *
+
+# Modules an equation-mode run must not import
+HEAVY_MODULES = ['tensorflow', 'keras', 'matplotlib', 'h5py']
+
+CHECK_CMD = [
+    sys.executable, os.path.join(PROJECT_ROOT, 'posto.py'), 'checkSafety',
+    '--log=' + os.path.join(PROJECT_ROOT, 'logs', 'model0.lg'),
+    '--mode=equation',
+    '--model_path=' + os.path.join(PROJECT_ROOT, 'models', 'model0.json'),
+    '--seed=0', '--no-plot',
+]
+
+IMPORT_PROBE = (
+    "import sys, time; t = time.time(); sys.path.append(sys.argv[1]); import System; "
+    "print(time.time() - t); print(' '.join(m for m in sys.argv[2:] if m in sys.modules))"
+)
+
+
+def timeRun(cmd):
+    start = time.time()
+    proc = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True)
+    elapsed = time.time() - start
+    if proc.returncode != 0:
+        die(f"Benchmark run failed: {' '.join(cmd)}", hint=proc.stdout[-500:] + proc.stderr[-500:])
+    return elapsed
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__)
+    runs = int(args['--runs'])
+    budget = float(args['--budget'])
+
+    probe = subprocess.run([sys.executable, '-c', IMPORT_PROBE, PROJECT_ROOT] + HEAVY_MODULES,
+                           cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    importTime, loaded = (probe.stdout.splitlines() + [''])[:2]
+    note(f"import System: {float(importTime):.3f} sec")
+
+    times = sorted(timeRun(CHECK_CMD) for _ in range(runs))
+    median = times[len(times) // 2]
+    note(f"checkSafety --no-plot: median {median:.3f} sec, min {times[0]:.3f} sec over {runs} runs")
+
+    failed = False
+    if loaded.split():
+        warn(f"import System loaded {loaded}")
+        failed = True
+    if median > budget:
+        warn(f"Median {median:.3f} sec is over the {budget:.3f} sec budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    ok(f"Startup within budget ({median:.3f} <= {budget:.3f} sec)")
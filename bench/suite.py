@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the sampling pipeline. Runs `posto.py checkSafety`,
+`behavior` and `generateLog` over the shipped models and logs, plus
+synthetic scale-up models with many states and long horizons, and records
+per run: trajectories per second, acceptance rate, time to verdict, peak
+RSS and startup time. `compare` flags regressions of one result file
+against a stored baseline, and exits with status 1 if it finds any.
+
+The MountainCar controller is benchmarked through its closed-loop equation
+model, models/MountainCarCL.json, on purpose. No ANN of the MountainCar
+dynamics ships: models/MountainCar_ReluController.h5 is only the controller,
+and its ANN-mode setup (dev/ModelANN.py) supplies the plant as a Python
+getNextState override, which posto.py cannot load.
+
+Usage:
+    suite.py run [--out=<json>] [--only=<names>] [--quick] [--timeout=<sec>] [--runs=<N>] [--workdir=<dir>]
+    suite.py compare [--baseline=<json>] [--tolerance=<pct>] <results>
+    suite.py list [--quick]
+
+Options:
+    --out=<json>          Result file [default: bench/results.json].
+    --only=<names>        Comma-separated case names or shell patterns, e.g. "check-Jet-*,check-synth-*".
+    --quick               Only the small cases tagged quick (a couple of minutes in all).
+    --timeout=<sec>       Per-run time limit; a run that hits it is stopped and its partial counts are kept [default: 120].
+    --runs=<N>            Runs per case; every metric is the median over them [default: 1].
+    --workdir=<dir>       Directory for generated models and logs (default: a temporary directory).
+    --baseline=<json>     Baseline result file [default: bench/baseline.json].
+    --tolerance=<pct>     Relative change, in percent, a metric may get worse before it is flagged [default: 20].
+"""
+
+import os,sys
+import re
+import json
+import time
+import fnmatch
+import platform
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+from docopt import docopt
+from Parameters import *
+
+import numpy as np
+
+# Shipped models: file and the initial set used for behavior and generateLog (docs/commands.md).
+# MC is the MountainCar controller in closed loop (see the module docstring).
+MODELS = {
+    'Jet':   ('models/Jet.json',   [[0.8, 1.0], [0.8, 1.0]]),
+    'VDP':   ('models/VDP.json',   [[1.0, 1.5], [2.1, 2.6]]),
+    'MC':    ('models/MountainCarCL.json', [[-1.2, -1.1], [-0.07, -0.03]]),
+    'model0': ('models/model0.json', [[0.05, 0.12], [0.17, 0.23]]),
+    'model1': ('models/model1.json', [[-2.0, 2.0], [-1.5, 1.5], [-1.5, 1.5]]),
+    'model2': ('models/model2.json', [[-0.5, 0.5], [-0.5, 0.5], [-1.0, 1.0], [-1.0, 1.0]]),
+    'model3': ('models/model3.json', [[12.25, 31.85], [52.08, 54.83], [-17.47, -14.23]]),
+    'model4': ('models/model4.json', [[20.0, 24.0], [20.0, 24.0], [20.0, 24.0], [2.0, 4.0], [0.0, 3.0]]),
+    'model5': ('models/model5.json', [[68.87, 88.87], [0.0, 19.73], [4.72, 13.72], [-10.0, -0.54]]),
+    'model6': ('models/model6.json', [[3.05, 7.55], [-1.0, 1.0], [-8.82, 3.18]]),
+    'model7': ('models/model7.json', [[-1.77, -1.17], [-0.59, 0.21], [0.17, 0.97], [0.78, 1.18], [1.25, 2.0]]),
+    'model8': ('models/model8.json', [[-4.5, 6.5], [-4.5, 6.5], [-7.0, -1.0], [-7.0, -1.0]]),
+    'model9': ('models/model9.json', [[130.0, 150.0], [30.0, 40.0], [3.0, 3.5], [-10.0, -5.0]]),
+    'model10': ('models/model10.json', [[-4.23, -2.23], [0.44, 6.44], [-6.47, -4.67], [3.71, 4.91]]),
+}
+
+# Shipped logs and the model each was generated from (logs/model1.lg is 2-D and does not match model1)
+SHIPPED_LOGS = [
+    ('Jet', 'logs/Jet.lg'),
+    ('Jet', 'art/figA3a/Jet.lg'), ('Jet', 'art/figA3b/Jet.lg'),
+    ('Jet', 'art/figA3c/Jet.lg'), ('Jet', 'art/figA3d/Jet.lg'),
+    ('VDP', 'art/figA4a/VDP.lg'), ('VDP', 'art/figA4b/VDP.lg'),
+    ('VDP', 'art/figA4c/VDP.lg'), ('VDP', 'art/figA4d/VDP.lg'),
+    ('MC', 'art/figB6a/MCcontroller.lg'), ('MC', 'art/figB6b/MCcontroller.lg'),
+    ('MC', 'art/figB6c/MCcontroller.lg'), ('MC', 'art/figB6d/MCcontroller.lg'),
+    ('model0', 'logs/model0.lg'), ('model2', 'logs/model2.lg'),
+    ('model3', 'logs/model3.lg'), ('model5', 'logs/model5.lg'),
+]
+
+# Models without a shipped log get a seeded one: horizon, steps between records, box half-width
+GEN_LOG = (300, 15, 0.05)
+
+# Synthetic scale-up models: (number of states, horizon)
+SYNTH_SIZES = [(8, 1000), (32, 1000), (128, 1000), (8, 10000), (32, 10000)]
+
+# Cases small enough for --quick
+QUICK = {'check-Jet-figA3d', 'check-model0', 'check-model2', 'check-MC-figB6a',
+         'behavior-Jet', 'generateLog-Jet', 'check-synth-n8-T1000'}
+
+# Metrics compared by `compare`, and whether larger values are better
+METRICS = {
+    'trajsPerSec': True,
+    'acceptance': True,
+    'verdictTime': False,
+    'peakRssMB': False,
+    'startup': False,
+}
+
+# Changes smaller than this are noise whatever their relative size (seconds, MB)
+SLACK = {'verdictTime': 0.1, 'startup': 0.05, 'peakRssMB': 5.0}
+
+ANSI = re.compile(r'\x1b\[[0-9;]*m')
+PROGRESS = re.compile(r'Total Trajectories Generated:\s*(\d+)\s*;\s*Valid Trajectories:\s*(\d+)')
+TIME_TAKEN = re.compile(r'Time Taken:\s*([0-9.eE+-]+)', re.IGNORECASE)
+VERDICT = re.compile(r'Safety:\s*(SAFE|UNSAFE)')
+
+
+def synthModel(n):
+    """
+    Equation model with n states coupled in a ring that mostly rotates
+    (x_i moves with x_{i+1} - x_{i-1}), with light damping, a nonlinear
+    term and a little noise. Box enclosures of a rotation keep growing, so
+    the interval pre-check gives up and the check has to sample; the
+    trajectories themselves stay far from the unsafe set x0 >= 4.
+    """
+    names = [f"x{i}" for i in range(n)]
+    equations = {
+        f"{names[i]}'": (f"{names[i]} + dt * ({names[(i + 1) % n]} - {names[(i - 1) % n]} - 0.05*{names[i]} "
+                         f"+ 0.1*sin({names[(i + 2) % n]})) + ep")
+        for i in range(n)
+    }
+    return {
+        'state_vars': names,
+        'constants': {'dt': 0.01},
+        'ranges': {'ep': [-0.001, 0.001]},
+        'equations': equations,
+        'safety_constraints': [{'state': 'x0', 'op': 'ge', 'const': 4.0}],
+    }
+
+
+def seededLog(model_path, init, T, every, eps, path, seed=0):
+    """
+    A log of one trajectory from the centre of `init`, recorded every
+    `every` steps with boxes of half-width eps. Unlike generateLog it is the
+    same on every run, so the checks on it are comparable.
+    """
+    from System import System
+    system = System(path, 'equation', model_path, plot=False)
+    system.rng = np.random.default_rng(seed)
+    centre = np.array([[(lo + hi) / 2 for lo, hi in init]])
+    traj = system.getTrajsFrom(centre, T + 1)[0]
+    records = [([[float(x - eps), float(x + eps)] for x in traj[t]], t) for t in range(0, T + 1, every)]
+    # The first box is the initial set, as in generated logs
+    records[0] = (init, 0)
+    from lib.LogFile import LogFile
+    LogFile.fromRecords(records).write(path)
+
+
+def buildCases(workdir):
+    """Case name -> (posto.py arguments, setup function or None)."""
+    cases = {}
+    for model, log in SHIPPED_LOGS:
+        name = f"check-{model}" if log.startswith('logs/') else f"check-{model}-{log.split('/')[1]}"
+        cases[name] = (['checkSafety', f'--log={log}', '--mode=equation',
+                        f'--model_path={MODELS[model][0]}', '--seed=0', '--no-plot'], None)
+    logged = {model for model, _ in SHIPPED_LOGS}
+    for model, (path, init) in MODELS.items():
+        initArg = ','.join(f"[{lo},{hi}]" for lo, hi in init)
+        cases[f"behavior-{model}"] = (['behavior', f'--log={os.path.join(workdir, "behavior-" + model)}',
+                                       f'--init={initArg}', '--timestamp=1000', '--mode=equation',
+                                       f'--model_path={path}', '--seed=0', '--no-plot'], None)
+        cases[f"generateLog-{model}"] = (['generateLog', f'--log={os.path.join(workdir, "gen-" + model + ".lg")}',
+                                          f'--init={initArg}', '--timestamp=3000', '--mode=equation',
+                                          f'--model_path={path}', '--prob=7', '--dtlog=0.05', '--seed=0',
+                                          '--no-plot'], None)
+        if model not in logged:
+            log = os.path.join(workdir, f"seeded-{model}.lg")
+            cases[f"check-{model}-seeded"] = (
+                ['checkSafety', f'--log={log}', '--mode=equation', f'--model_path={path}', '--seed=0', '--no-plot'],
+                lambda path=path, init=init, log=log: seededLog(path, init, *GEN_LOG, log))
+    for n, T in SYNTH_SIZES:
+        model = os.path.join(workdir, f"synth-n{n}.json")
+        log = os.path.join(workdir, f"synth-n{n}-T{T}.lg")
+        cases[f"check-synth-n{n}-T{T}"] = (
+            ['checkSafety', f'--log={log}', '--mode=equation', f'--model_path={model}', '--seed=0', '--no-plot'],
+            lambda n=n, T=T, model=model, log=log: setupSynth(n, T, model, log))
+    return cases
+
+
+def setupSynth(n, T, model, log):
+    if not os.path.isfile(model):
+        with open(model, 'w') as f:
+            json.dump(synthModel(n), f, indent=2)
+    seededLog(model, [[0.9, 1.1]] * n, T, T // 20, 1.0, log)
+
+
+def runOnce(args, timeout):
+    """
+    Run posto.py with `args`, timestamping its output lines. Returns the
+    metrics of the run; a run stopped at `timeout` keeps what it printed.
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED='1', TF_CPP_MIN_LOG_LEVEL='3')
+    start = time.time()
+    proc = subprocess.Popen([sys.executable, os.path.join(PROJECT_ROOT, 'posto.py')] + args,
+                            cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, start_new_session=True)
+    timedOut = threading.Event()
+
+    def stop():
+        timedOut.set()
+        os.killpg(proc.pid, signal.SIGKILL)
+
+    timer = threading.Timer(timeout, stop)
+    timer.start()
+    lines = []
+    for line in proc.stdout:
+        lines.append((time.time() - start, ANSI.sub('', line.rstrip())))
+    timer.cancel()
+    # wait4 gives the resource usage of this child alone
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    wall = time.time() - start
+
+    res = {'wall': wall, 'peakRssMB': usage.ru_maxrss / 1024, 'startup': lines[0][0] if lines else wall}
+    if timedOut.is_set():
+        res['status'] = 'timeout'
+    elif proc.returncode != 0 or any('[ERROR]' in text for _, text in lines):
+        res['status'] = 'error'
+        res['error'] = next((text for _, text in lines if '[ERROR]' in text), f"exit status {proc.returncode}")
+    else:
+        res['status'] = 'ok'
+
+    trajs = valid = None
+    tLast = taken = None
+    for t, text in lines:
+        m = PROGRESS.search(text)
+        if m:
+            trajs, valid, tLast = int(m.group(1)), int(m.group(2)), t
+        m = TIME_TAKEN.search(text)
+        if m:
+            taken = float(m.group(1))
+        m = VERDICT.search(text)
+        if m:
+            res['verdict'] = m.group(1)
+            res['verdictTime'] = t
+    if args[0] == 'behavior':
+        # behavior simulates 10 trajectories, generateLog one
+        trajs = 10
+    elif args[0] == 'generateLog':
+        trajs = 1
+    if args[0] != 'checkSafety' and res['status'] == 'ok':
+        res['verdictTime'] = wall
+    if trajs is not None:
+        res['trajs'] = trajs
+        if args[0] == 'checkSafety':
+            res['valid'] = valid
+            res['acceptance'] = valid / trajs if trajs else None
+        # Sampling time: as reported by the command, or up to the last progress line of a stopped run
+        busy = taken if taken is not None else (tLast - res['startup'] if tLast is not None else None)
+        res['trajsPerSec'] = trajs / busy if (trajs and busy) else None
+    return res
+
+
+def median(values):
+    values = sorted(v for v in values if v is not None)
+    return values[len(values) // 2] if values else None
+
+
+def runCase(name, args, setup, timeout, runs):
+    if setup is not None:
+        setup()
+    results = [runOnce(args, timeout) for _ in range(runs)]
+    res = dict(results[-1])
+    for key in ('wall', 'peakRssMB', 'startup', 'verdictTime', 'trajsPerSec', 'acceptance'):
+        if any(key in r for r in results):
+            res[key] = median([r.get(key) for r in results])
+    res['command'] = ' '.join(args)
+    return res
+
+
+def selectCases(cases, only, quick):
+    names = list(cases)
+    if quick:
+        names = [name for name in names if name in QUICK]
+    if only:
+        patterns = [p.strip() for p in only.split(',') if p.strip()]
+        names = [name for name in names if any(fnmatch.fnmatch(name, p) for p in patterns)]
+    return names
+
+
+def gitCommit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def fmt(v):
+    if v is None:
+        return '-'
+    return f"{v:.4g}" if isinstance(v, float) else str(v)
+
+
+def run(args):
+    timeout = float(args['--timeout'])
+    runs = int(args['--runs'])
+    workdir = args['--workdir'] or tempfile.mkdtemp(prefix='posto-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    cases = buildCases(workdir)
+    names = selectCases(cases, args['--only'], args['--quick'])
+    if not names:
+        die("No benchmark case matches.", hint="See `suite.py list` for the case names.")
+
+    out = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': gitCommit(),
+            'host': platform.node(),
+            'cpus': os.cpu_count(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'timeout': timeout,
+            'runs': runs,
+        },
+        'cases': {},
+    }
+    try:
+        for i, name in enumerate(names):
+            info(f"[{i + 1}/{len(names)}] {name}")
+            res = runCase(name, *cases[name], timeout, runs)
+            out['cases'][name] = res
+            note(f"  {res['status']}: {fmt(res.get('trajsPerSec'))} trajs/sec, acceptance "
+                 f"{fmt(res.get('acceptance'))}, verdict after {fmt(res.get('verdictTime'))} sec, "
+                 f"peak RSS {fmt(res['peakRssMB'])} MB, startup {fmt(res['startup'])} sec")
+            if res['status'] == 'error':
+                warn(f"  {res['error']}")
+    finally:
+        if not args['--workdir']:
+            shutil.rmtree(workdir, ignore_errors=True)
+        os.makedirs(os.path.dirname(os.path.abspath(args['--out'])), exist_ok=True)
+        with open(args['--out'], 'w') as f:
+            json.dump(out, f, indent=2)
+        ok(f"Results written to {args['--out']}")
+
+
+def compare(args):
+    for flag, path in (('--baseline', args['--baseline']), ('<results>', args['<results>'])):
+        if not os.path.isfile(path):
+            die(f"{flag} not found: {path!r}.",
+                hint="Create it with `suite.py run --out=<json>`; bench/baseline.json comes from `run --quick`.")
+    with open(args['--baseline']) as f:
+        base = json.load(f)
+    with open(args['<results>']) as f:
+        cur = json.load(f)
+    tol = float(args['--tolerance']) / 100
+    note(f"Baseline: {args['--baseline']} (commit {base['meta'].get('commit')}, {base['meta'].get('host')})")
+    note(f"Current:  {args['<results>']} (commit {cur['meta'].get('commit')}, {cur['meta'].get('host')})")
+
+    regressions = 0
+    for name in sorted(set(base['cases']) & set(cur['cases'])):
+        b, c = base['cases'][name], cur['cases'][name]
+        rows = []
+        if b['status'] != c['status']:
+            bad = b['status'] == 'ok'
+            rows.append((f"status {b['status']} -> {c['status']}", bad))
+        for key, higher in METRICS.items():
+            vb, vc = b.get(key), c.get(key)
+            if vb is None or vc is None:
+                continue
+            rel = (vc - vb) / abs(vb) if vb else (0.0 if vc == vb else float('inf'))
+            # Positive when the metric got worse
+            worse = -rel if higher else rel
+            rows.append((f"{key} {fmt(vb)} -> {fmt(vc)} ({100 * rel:+.1f}%)",
+                         worse > tol and abs(vc - vb) > SLACK.get(key, 0.0)))
+        flagged = [text for text, bad in rows if bad]
+        regressions += len(flagged)
+        if flagged:
+            print(f"{msg.FAIL}[REGRESSION]{msg.ENDC} {name}: " + '; '.join(flagged))
+        else:
+            print(f"{msg.OKGREEN}[OK]{msg.ENDC} {name}")
+    for name in sorted(set(base['cases']) ^ set(cur['cases'])):
+        note(f"{name}: only in {'the baseline' if name in base['cases'] else 'the current results'}")
+    if regressions:
+        warn(f"{regressions} metric(s) worse than the baseline by more than {100 * tol:.0f}%")
+        sys.exit(1)
+    ok(f"No regression beyond {100 * tol:.0f}%")
+
+
+if __name__ == '__main__':
+    args = docopt(__doc__)
+    if args['list']:
+        for name in selectCases(buildCases('<workdir>'), None, args['--quick']):
+            print(name)
+    elif args['run']:
+        run(args)
+    elif args['compare']:
+        compare(args)
@@ -10,7 +10,7 @@ from Parameters import *
 
 def my_getNextState1(state):
     x = np.asarray(state, dtype=np.float32).reshape(1, -1)
-    u = float(sys_obj.model.model.predict(x, verbose=0)[0, 0]) 
+    u = float(sys_obj.model.predict(x)[0, 0])
     p_cur, v_cur = float(state[0]), float(state[1])
     p_next = p_cur + v_cur
     v_next = v_cur + 0.0015 * u - 0.0025 * math.cos(3.0 * p_cur)
@@ -25,7 +25,7 @@ def my_getNextState2(init_states, T):
             trajectories[idx].append((st[0], st[1]))
         x_batch = np.asarray(states, dtype=np.float32)
         # Use the model loaded by System rather than a stand‑alone controller
-        u_batch = sys_obj.model.model.predict(x_batch, verbose=0).reshape(K, -1)
+        u_batch = sys_obj.model.predict(x_batch).reshape(K, -1)
         new_states = []
         for i in range(K):
             p_cur, v_cur = states[i]
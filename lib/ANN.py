@@ -1,71 +1,157 @@
 import os
 import numpy as np
-try:
-    from tensorflow.keras.models import load_model
-except Exception:
-    from keras.models import load_model
+from lib.DenseNet import DenseNet
+
+
+def loadKeras(model_path):
+    # TensorFlow/Keras is only imported for models the NumPy engine cannot run
+    try:
+        from tensorflow.keras.models import load_model
+    except Exception:
+        from keras.models import load_model
+    return load_model(model_path, compile=False, safe_mode=False)
+
 
 class ANN:
     def __init__(self, model_path: str):
         if not os.path.isfile(model_path):
             raise FileNotFoundError(f"Model not found at {model_path}")
-        self.model = load_model(model_path, compile=False, safe_mode=False)
-        self.input_shape = self.model.input_shape
+        self.model_path = model_path
+        self.keras = None
+        self.call = None
+        # Sequential Dense models run as NumPy matrix products, anything else through Keras
+        self.net = DenseNet.load(model_path)
+        if self.net is not None:
+            self.input_shape = self.net.inputShape
+        else:
+            self.input_shape = self.model.input_shape
 
-    def prepareInput(self, state):
-        arr = np.asarray(state, dtype=np.float32).reshape(-1)
+    @property
+    def model(self):
+        # Keras model, loaded on first use: NumPy-engine models only load it if called directly
+        if self.keras is None:
+            self.keras = loadKeras(self.model_path)
+        return self.keras
+
+    def predict(self, x):
+        if self.net is not None:
+            return self.net.predict(x)
+        return self.model.predict(x, verbose=0)
+
+    def inputShape(self, n):
+        """
+        Per-sample model input shape for states of n values. Shapes are
+        checked here, once, before any simulation.
+        """
         shape = self.input_shape
         if isinstance(shape, list):
             raise ValueError("Multiple input models are not supported")
 
         if len(shape) == 2:
-            nFeatures = shape[1] or arr.size
-            if arr.size != nFeatures:
-                raise ValueError(f"expected {nFeatures} features, got {arr.size}")
-            return arr.reshape(1, nFeatures)
+            nFeatures = shape[1] or n
+            if n != nFeatures:
+                raise ValueError(f"expected {nFeatures} features, got {n}")
+            return (nFeatures,)
 
         if len(shape) == 3:
             # Recurrent input: (batch, timesteps, features)
             _, timesteps, features = shape
             if features is None:
-                features, timesteps = arr.size, 1
+                features, timesteps = n, 1
             total_expected = (timesteps or 1) * features
-            if arr.size == features:
-                return arr.reshape(1, 1, features)
-            if arr.size == total_expected:
-                return arr.reshape(1, timesteps, features)
+            if n == features:
+                return (1, features)
+            if n == total_expected:
+                return (timesteps, features)
             raise ValueError(
                 f"expected {features} or {total_expected} values for "
-                f"{timesteps} time steps, got {arr.size}"
+                f"{timesteps} time steps, got {n}"
             )
         raise ValueError(f"unsupported input shape {shape}")
 
+    def windowSize(self, n):
+        """
+        Number of past states a windowed model reads for states of n values:
+        the timesteps of a (batch, timesteps, n) input, 1 for every other model.
+        """
+        shape = self.input_shape
+        if not isinstance(shape, list) and len(shape) == 3 and shape[2] == n and (shape[1] or 1) > 1:
+            return shape[1]
+        return 1
+
+    def prepareInput(self, state):
+        arr = np.asarray(state, dtype=np.float32).reshape(-1)
+        return arr.reshape((1,) + self.inputShape(arr.size))
+
+    def compiledCall(self):
+        """
+        Batch forward pass: the NumPy engine, or the Keras model called
+        directly inside a tf.function instead of through model.predict.
+        """
+        if self.net is not None:
+            return self.net.predict
+        if self.call is None:
+            try:
+                import tensorflow as tf
+                self.call = tf.function(lambda x: self.model(x, training=False), reduce_retracing=True)
+            except ImportError:
+                self.call = lambda x: self.model(x, training=False)
+        return self.call
+
+    def getOutputs(self, states):
+        """Model outputs (K, m) for a (K, n) batch of states, in one call."""
+        states = np.asarray(states, dtype=np.float32)
+        x = states.reshape((len(states),) + self.inputShape(states.shape[1]))
+        return np.asarray(self.compiledCall()(x), dtype=float).reshape(len(states), -1)
+
     def getSingleState(self, state):
         x = self.prepareInput(state)
-        out = self.model.predict(x, verbose=0)
+        out = self.predict(x)
         return tuple(float(v) for v in out.reshape(-1))
 
+    def getTrajs(self, init_states, T):
+        """
+        Simulate T steps from (K, n) initial states with the model output as
+        the next state. Returns a (K, T, n) array; the model input buffer is
+        allocated once and every output is written straight into it.
+
+        Windowed models (input (batch, W, n)) read the last W states of each
+        trajectory from a (K, W, n) buffer, oldest first, that is shifted in
+        place every step; at the start the window is filled with the initial
+        state.
+        """
+        states = np.asarray(init_states, dtype=float)
+        K, n = states.shape
+        trajs = np.empty((K, T, n))
+        if T == 0:
+            return trajs
+        trajs[:, 0] = states
+        if T == 1:
+            return trajs
+        W = self.windowSize(n)
+        if W > 1:
+            x = np.empty((K, W, n), dtype=np.float32)
+            x[...] = states[:, None, :]
+        else:
+            x = np.empty((K,) + self.inputShape(n), dtype=np.float32)
+        call = self.compiledCall()
+        for t in range(T - 1):
+            if W > 1:
+                if t > 0:
+                    # Drop the oldest state, append the newest
+                    x[:, :-1] = x[:, 1:]
+                    x[:, -1] = trajs[:, t]
+            else:
+                x[...] = trajs[:, t].reshape(x.shape)
+            out = np.asarray(call(x))
+            if out.size != K * n:
+                raise ValueError(
+                    f"model outputs {out.size // K} values per state, expected {n} "
+                    f"to use them as the next state"
+                )
+            trajs[:, t + 1] = out.reshape(K, n)
+        return trajs
+
     def getNextState(self, init_states, T):
-            
-        states = [list(map(float, s)) for s in init_states]
-        K = len(states)
-        trajectories = [[] for _ in range(K)]
-        for _ in range(T):
-            # append current state to each trajectory
-            for idx, st in enumerate(states):
-                trajectories[idx].append(tuple(st))
-            try:
-                # build a batch array and predict next states
-                x_batch = [self.prepareInput(st) for st in states]
-                x_batch = np.concatenate(x_batch, axis=0)
-                out = self.model.predict(x_batch, verbose=0)
-                out_flat = out.reshape((K, -1))
-                states = [list(map(float, out_flat[i])) for i in range(K)]
-            except Exception:
-                # fall back to one‑by‑one prediction if the batch fails
-                new_states = []
-                for st in states:
-                    ns = list(self.getSingleState(st))
-                    new_states.append(ns)
-                states = new_states
-        return trajectories
\ No newline at end of file
+        """T-step trajectories from each initial state, as lists of state tuples."""
+        return [[tuple(st) for st in traj] for traj in self.getTrajs(init_states, T).tolist()]
@@ -0,0 +1,146 @@
+import os,sys
+import json
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+
+# Activations evaluated in NumPy; any other activation falls back to Keras
+ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 1 / (1 + np.exp(-x)),
+}
+# Layers that are the identity at inference time
+PASS_LAYERS = {'InputLayer', 'Dropout'}
+# Flattens a (timesteps, features) window input; the identity on flat inputs
+FLATTEN_LAYERS = {'Flatten'}
+
+
+class DenseNet:
+    """
+    Sequential Dense network evaluated as NumPy matrix products. The layer
+    configuration and weights are read straight from a Keras .h5 file with
+    h5py, so neither TensorFlow nor Keras is needed. Inference runs in the
+    dtype the weights were saved in (float32), as Keras does.
+    """
+
+    def __init__(self, layers, nIn, inputShape=None):
+        # layers: list of (kernel (nIn, nOut), bias (nOut,) or None, activation name)
+        self.layers = layers
+        self.nIn = nIn
+        # Keras-style input shape: (None, nIn), or (None, timesteps, features) for windowed models
+        self.inputShape = inputShape or (None, nIn)
+        self.nOut = layers[-1][0].shape[1]
+        self.dtype = layers[0][0].dtype
+
+    @staticmethod
+    def load(model_path):
+        """
+        Return a DenseNet for a Sequential model made of Dense layers with
+        the activations in ACTIVATIONS (plus InputLayer, Dropout and
+        Activation layers, and a Flatten layer over a (timesteps, features)
+        window input), or None when the model is anything else.
+        """
+        try:
+            import h5py
+        except ImportError:
+            return None
+        try:
+            with h5py.File(model_path, 'r') as f:
+                if 'model_config' not in f.attrs or 'model_weights' not in f:
+                    return None
+                config = f.attrs['model_config']
+                config = json.loads(config.decode() if isinstance(config, bytes) else config)
+                return DenseNet.fromConfig(config, f['model_weights'])
+        except (OSError, KeyError, ValueError, TypeError):
+            return None
+
+    @staticmethod
+    def fromConfig(config, weights):
+        if config.get('class_name') != 'Sequential':
+            return None
+        layerCfgs = config['config']
+        layerCfgs = layerCfgs['layers'] if isinstance(layerCfgs, dict) else layerCfgs
+        layers = []
+        inputShape = None
+        flat = True
+        for layer in layerCfgs:
+            kind, cfg = layer['class_name'], layer['config']
+            shape = cfg.get('batch_shape', cfg.get('batch_input_shape'))
+            if shape is not None:
+                if len(shape) not in (2, 3) or None in shape[1:]:
+                    return None
+                inputShape = tuple(shape)
+                # Dense on a 3-D input works per time step: only supported after a Flatten
+                flat = len(shape) == 2
+            if kind in PASS_LAYERS:
+                continue
+            if kind in FLATTEN_LAYERS:
+                flat = True
+                continue
+            if not flat:
+                return None
+            if kind == 'Activation':
+                if not layers or cfg['activation'] not in ACTIVATIONS or layers[-1][2] != 'linear':
+                    return None
+                layers[-1] = (layers[-1][0], layers[-1][1], cfg['activation'])
+                continue
+            if kind != 'Dense' or cfg.get('activation', 'linear') not in ACTIVATIONS:
+                return None
+            group = weights[cfg['name']]
+            names = [n.decode() if isinstance(n, bytes) else n for n in group.attrs['weight_names']]
+            kernel = np.asarray(group[[n for n in names if n.split('/')[-1].startswith('kernel')][0]])
+            bias = [n for n in names if n.split('/')[-1].startswith('bias')]
+            bias = np.asarray(group[bias[0]]) if cfg.get('use_bias', True) and bias else None
+            layers.append((kernel, bias, cfg.get('activation', 'linear')))
+        if not layers:
+            return None
+        nIn = layers[0][0].shape[0]
+        if inputShape is not None and int(np.prod(inputShape[1:])) != nIn:
+            return None
+        return DenseNet(layers, nIn, inputShape)
+
+    def predict(self, x):
+        """Outputs (K, nOut) for a (K, nIn) batch of inputs (or (K, timesteps, features) windows)."""
+        x = np.asarray(x, dtype=self.dtype).reshape(-1, self.nIn)
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            if bias is not None:
+                x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    def bounds(self, lo, hi):
+        """
+        Interval bound propagation: elementwise bounds (M, nOut) on the
+        outputs over M input boxes given by (M, nIn) corners, as inputs (or
+        flattened windows). Dense layers map a box's center and radius
+        through W and |W|, and every activation is increasing. The bounds
+        are padded for the rounding of the inputs to the network dtype and
+        of its dot products, so they also hold for what predict returns.
+        """
+        eps = float(np.finfo(self.dtype).eps)
+        lo = np.asarray(lo, dtype=float).reshape(-1, self.nIn)
+        hi = np.asarray(hi, dtype=float).reshape(-1, self.nIn)
+        with np.errstate(over='ignore', invalid='ignore'):
+            for kernel, bias, activation in self.layers:
+                lo, hi = lo - eps * np.abs(lo), hi + eps * np.abs(hi)
+                W = kernel.astype(float)
+                center = (lo + hi) / 2 @ W
+                radius = (hi - lo) / 2 @ np.abs(W)
+                mag = np.maximum(np.abs(lo), np.abs(hi)) @ np.abs(W)
+                if bias is not None:
+                    center = center + bias
+                    mag = mag + np.abs(bias)
+                # Error bound of a float dot product of length nIn, plus the bias addition
+                err = (W.shape[0] + 1) * eps * mag
+                lo = ACTIVATIONS[activation](center - radius - err)
+                hi = ACTIVATIONS[activation](center + radius + err)
+                lo, hi = lo - eps * np.abs(lo), hi + eps * np.abs(hi)
+                # Overflowed bounds say nothing
+                lo = np.where(np.isnan(lo), -np.inf, lo)
+                hi = np.where(np.isnan(hi), np.inf, hi)
+        return lo, hi
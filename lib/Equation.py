@@ -15,21 +15,45 @@ ALLOWED_FUNCS = {
     'fabs': math.fabs, 'abs': abs
 }
 
+# NumPy counterparts of ALLOWED_FUNCS, used by the batched engine
+ALLOWED_FUNCS_NP = {
+    'sin': np.sin, 'cos': np.cos, 'tan': np.tan,
+    'exp': np.exp, 'log': np.log, 'sqrt': np.sqrt,
+    'fabs': np.fabs, 'abs': np.abs
+}
+
 # Cache compiled equations so repeated runs don't reparse JSON
 eq_cache = {}
+batch_cache = {}
+# Controller networks of closed-loop models, loaded once per path
+controller_cache = {}
+interval_cache = {}
+# Parsed specifications, shared by build, buildBatch and buildInterval
+parse_cache = {}
 
 class Equation:
     def __init__(self, eq_path):
         self.func = Equation.build(eq_path)
+        self.batch = Equation.buildBatch(eq_path)
+        # Noise variables and their ranges, for callers that choose the noise themselves
+        self.noise_ranges = Equation.parse(eq_path)[3]
 
     def getNextState(self, state):
         return self.func(state)
 
+    def getNextStates(self, states, rng, t=None, noise=None):
+        """
+        Advance a (K, n) state matrix by one step. Noise variables are drawn
+        as (K,) vectors from the numpy Generator `rng`, unless `noise` gives
+        their (K,) values by name.
+        """
+        return self.batch(states, rng, t, noise)
+
     @staticmethod
-    def build(json_path):
-        # Return cached function if we have already compiled this JSON
-        if json_path in eq_cache:
-            return eq_cache[json_path]
+    def parse(json_path):
+        # The JSON is read (and the controller probed) once per path
+        if json_path in parse_cache:
+            return parse_cache[json_path]
 
         # Read the JSON specification
         with open(json_path, 'r') as fp:
@@ -69,10 +93,64 @@ class Equation:
                     lo, hi = hi, lo
                 noise_ranges[k] = (lo, hi)
 
+        controller = Equation.parseController(json_path, spec, state_vars)
+
+        parse_cache[json_path] = (state_vars, rhs_exprs, safe_globals, noise_ranges, controller)
+        return parse_cache[json_path]
+
+    @staticmethod
+    def parseController(json_path, spec, state_vars):
+        """
+        Closed-loop models name a neural controller whose outputs the
+        equations use as variables:
+            "controller": {"model_path": "models/ctrl.h5",
+                           "inputs": ["p", "v"], "outputs": ["u"]}
+        "inputs" defaults to all state variables. Returns (net, input
+        indices, output names), or None for an open-loop model.
+        """
+        ctrl = spec.get('controller')
+        if ctrl is None:
+            return None
+        if 'model_path' not in ctrl or not ctrl.get('outputs'):
+            raise KeyError(f"{json_path}: controller needs 'model_path' and 'outputs'")
+        inputs = ctrl.get('inputs', state_vars)
+        for v in inputs:
+            if v not in state_vars:
+                raise KeyError(f"{json_path}: controller input {v!r} is not a state variable")
+        # Relative paths are tried against the JSON file's directory, then the project root
+        path = ctrl['model_path']
+        if not os.path.isabs(path):
+            local = os.path.join(os.path.dirname(os.path.abspath(json_path)), path)
+            path = local if os.path.isfile(local) else os.path.join(PROJECT_ROOT, path)
+        if path not in controller_cache:
+            from lib.ANN import ANN
+            controller_cache[path] = ANN(path)
+        net = controller_cache[path]
+        # Checked once here rather than at every step
+        nOut = net.getOutputs(np.zeros((1, len(inputs)))).shape[1]
+        if nOut != len(ctrl['outputs']):
+            raise ValueError(f"{json_path}: controller has {nOut} outputs, "
+                             f"but {len(ctrl['outputs'])} output names are given")
+        return net, [state_vars.index(v) for v in inputs], list(ctrl['outputs'])
+
+    @staticmethod
+    def build(json_path):
+        # Return cached function if we have already compiled this JSON
+        if json_path in eq_cache:
+            return eq_cache[json_path]
+
+        state_vars, rhs_exprs, safe_globals, noise_ranges, controller = Equation.parse(json_path)
+
         # Build and return a closure that evaluates the next state
         def step(state, t=None):
             # Map each state variable to its current value
             loc = {v: float(state[i]) for i, v in enumerate(state_vars)}
+            # Controller outputs for this state
+            if controller is not None:
+                net, inIdx, outputs = controller
+                u = net.getOutputs([[float(state[i]) for i in inIdx]])[0]
+                for name, val in zip(outputs, u):
+                    loc[name] = float(val)
             # Add time if supplied
             if t is not None:
                 loc['t'] = float(t)
@@ -90,3 +168,84 @@ class Equation:
         # Cache and return the compiled function
         eq_cache[json_path] = step
         return step
+
+    @staticmethod
+    def buildBatch(json_path):
+        """
+        Compile the equations into a function that advances a whole (K, n)
+        state matrix by one step. Returns None when the expressions cannot be
+        evaluated on arrays, in which case callers use the scalar `build` path.
+        """
+        if json_path in batch_cache:
+            return batch_cache[json_path]
+
+        state_vars, rhs_exprs, safe_globals, noise_ranges, controller = Equation.parse(json_path)
+
+        # Same constants as the scalar path, but with array-aware functions
+        np_globals = dict(safe_globals)
+        np_globals.update(ALLOWED_FUNCS_NP)
+        codes = [compile(expr, json_path, 'eval') for expr in rhs_exprs]
+        nStates = len(state_vars)
+
+        def step(states, rng, t=None, noise=None):
+            K = states.shape[0]
+            loc = {v: states[:, i] for i, v in enumerate(state_vars)}
+            if t is not None:
+                loc['t'] = float(t)
+            # One batched controller inference for all K states
+            if controller is not None:
+                net, inIdx, outputs = controller
+                u = net.getOutputs(states[:, inIdx])
+                for j, name in enumerate(outputs):
+                    loc[name] = u[:, j]
+            for noise_name, (lo, hi) in noise_ranges.items():
+                loc[noise_name] = rng.uniform(lo, hi, K) if noise is None else noise[noise_name]
+            out = np.empty((K, nStates))
+            # Overflow shows up as inf/nan in the affected rows instead of an exception
+            with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+                for i, code in enumerate(codes):
+                    out[:, i] = eval(code, np_globals, loc)
+            return out
+
+        # Probe once so that unsupported expressions fall back to the scalar path
+        try:
+            step(np.ones((2, nStates)), np.random.default_rng(0))
+        except Exception:
+            step = None
+
+        batch_cache[json_path] = step
+        return step
+
+    @staticmethod
+    def buildInterval(json_path):
+        """
+        Compile the equations into a function that maps a list of Interval
+        state enclosures to enclosures of the next state, with every noise
+        variable ranging over its whole range. Returns None for closed-loop
+        models, whose controller has no interval semantics here.
+        """
+        if json_path in interval_cache:
+            return interval_cache[json_path]
+
+        from lib.Interval import Interval, INTERVAL_FUNCS, down, up
+
+        state_vars, rhs_exprs, safe_globals, noise_ranges, controller = Equation.parse(json_path)
+        if controller is not None:
+            interval_cache[json_path] = None
+            return None
+
+        iv_globals = dict(safe_globals)
+        iv_globals.update(INTERVAL_FUNCS)
+        codes = [compile(expr, json_path, 'eval') for expr in rhs_exprs]
+        # random.uniform(lo, hi) can round one ulp past either end
+        noise = {k: Interval(down(lo), up(hi)) for k, (lo, hi) in noise_ranges.items()}
+
+        def step(boxes, t=None):
+            loc = {v: boxes[i] for i, v in enumerate(state_vars)}
+            if t is not None:
+                loc['t'] = float(t)
+            loc.update(noise)
+            return [Interval.lift(eval(code, iv_globals, loc)) for code in codes]
+
+        interval_cache[json_path] = step
+        return step
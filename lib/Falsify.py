@@ -0,0 +1,121 @@
+import os,sys
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import *
+
+import numpy as np
+from lib.TrajValidity import TrajValidity
+
+# Weight of the new elite statistics when updating the sampling distribution
+CE_SMOOTHING = 0.7
+# Smallest standard deviation kept per coordinate, so the search never freezes
+CE_MIN_STD = 1e-3
+
+
+class Falsifier:
+    """
+    Cross-entropy search for a trajectory that is valid against the log and
+    violates a safety constraint. A candidate is a point of [0, 1]^d: the
+    initial state, scaled into the first log box, followed (for batched
+    equation models) by a piecewise-constant schedule of FALSIFY_SEGMENTS
+    values for every noise variable in `ranges`. Candidates are ranked by
+    how far they leave the log boxes, then by their robustness margin (the
+    smallest distance to an unsafe half-space over the run), and the
+    sampling distribution moves towards the best of them. The checker can
+    also be an STL specification, whose robustness is used the same way.
+
+    Any valid trajectory that violates a constraint is a witness, and a
+    witness is a sound UNSAFE verdict on its own. Finding none proves
+    nothing.
+    """
+
+    def __init__(self, system, logUn, safety_checker, T, rng):
+        self.system = system
+        self.checker = safety_checker
+        self.T = T
+        self.rng = rng
+        self.valObj = TrajValidity(logUn)
+        self.times = self.valObj.times
+        self.lo, self.hi = np.asarray(self.valObj.lo), np.asarray(self.valObj.hi)
+        self.width = np.maximum(self.hi - self.lo, 1e-12)
+        initSet = logUn[0][0]
+        self.lo0 = np.array([dim[0] for dim in initSet], dtype=float)
+        self.hi0 = np.array([dim[1] for dim in initSet], dtype=float)
+        # Noise can only be chosen through the batched equation step
+        self.noise = system.model.noise_ranges if system.useBatch() else {}
+        self.nDims = len(self.lo0) + len(self.noise) * FALSIFY_SEGMENTS
+
+    def simulate(self, z):
+        """(P, T, n) trajectories for P candidates z in [0, 1]^d."""
+        P, n = len(z), len(self.lo0)
+        states = self.lo0 + (self.hi0 - self.lo0) * z[:, :n]
+        if not self.noise:
+            # Nothing to schedule: whole trajectories at once (ANN models keep their input window)
+            trajs = self.system.getTrajsFrom(states, self.T)
+            if trajs is not None:
+                return trajs
+        schedule = z[:, n:].reshape(P, len(self.noise), FALSIFY_SEGMENTS)
+        trajs = np.empty((P, self.T, n))
+        for t in range(self.T):
+            trajs[:, t] = states
+            if t + 1 >= self.T:
+                break
+            if self.noise:
+                seg = min(t * FALSIFY_SEGMENTS // max(self.T - 1, 1), FALSIFY_SEGMENTS - 1)
+                noise = {name: lo + (hi - lo) * schedule[:, i, seg]
+                         for i, (name, (lo, hi)) in enumerate(self.noise.items())}
+                states = self.system.model.getNextStates(states, self.system.rng, noise=noise)
+            else:
+                states = self.system.stepStates(states)
+        return trajs
+
+    def score(self, trajs):
+        """
+        Per trajectory: the penalty, i.e. the total distance outside the log
+        boxes in units of box width (0 for valid trajectories), and the
+        robustness margin, which is negative or zero once it is unsafe.
+        """
+        samples = trajs[:, self.times, :]
+        with np.errstate(invalid='ignore'):
+            excess = (np.maximum(self.lo - samples, 0) + np.maximum(samples - self.hi, 0)) / self.width
+            penalty = excess.sum(axis=(1, 2))
+            robustness = self.checker.robustness(trajs)
+        # Overflowed (nan) trajectories rank last
+        penalty = np.where(np.isnan(penalty), np.inf, penalty)
+        robustness = np.where(np.isnan(robustness), np.inf, robustness)
+        return penalty, robustness
+
+    def run(self):
+        """
+        Returns a dict with the witness trajectory (or None), its first
+        unsafe time step, the number of candidates simulated and the best
+        robustness margin reached by a valid candidate.
+        """
+        P = FALSIFY_POPULATION
+        nElite = max(2, int(round(FALSIFY_ELITE * P)))
+        mean = np.full(self.nDims, 0.5)
+        std = np.full(self.nDims, 0.5)
+        bestRobustness = np.inf
+        for it in range(FALSIFY_ITERATIONS):
+            if it == 0:
+                z = self.rng.uniform(size=(P, self.nDims))
+            else:
+                z = np.clip(self.rng.normal(mean, std, size=(P, self.nDims)), 0, 1)
+            trajs = self.simulate(z)
+            valid, _ = self.valObj.getValMask(trajs)
+            tViolate = self.checker.getViolations(trajs)
+            hits = np.flatnonzero(valid & (tViolate >= 0))
+            if len(hits):
+                k = hits[0]
+                return {'witness': trajs[k], 'tViolate': int(tViolate[k]),
+                        'nSims': (it + 1) * P, 'bestRobustness': -np.inf}
+            penalty, robustness = self.score(trajs)
+            if valid.any():
+                bestRobustness = min(bestRobustness, float(robustness[valid].min()))
+            # Leaving the log first, robustness second
+            elite = z[np.lexsort((robustness, penalty))[:nElite]]
+            mean = CE_SMOOTHING * elite.mean(axis=0) + (1 - CE_SMOOTHING) * mean
+            std = np.maximum(CE_SMOOTHING * elite.std(axis=0) + (1 - CE_SMOOTHING) * std, CE_MIN_STD)
+        return {'witness': None, 'tViolate': -1,
+                'nSims': FALSIFY_ITERATIONS * P, 'bestRobustness': bestRobustness}
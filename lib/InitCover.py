@@ -0,0 +1,124 @@
+import os,sys
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import *
+
+import numpy as np
+
+
+class InitCover:
+    """
+    Sub-boxes of the first log box that still contain every initial point
+    of a valid trajectory, for deterministic ANN models. A sub-box is
+    dropped when interval bound propagation through the network shows that
+    no trajectory from it passes through some later log box. Sampling
+    uniformly over the kept sub-boxes is then sampling the initial box
+    conditioned on a superset of the valid points, so the valid
+    trajectories keep exactly the same distribution; only fewer are
+    rejected.
+    """
+
+    def __init__(self, lo, hi, lo0, hi0):
+        self.lo, self.hi = lo, hi
+        # Volume over the dimensions the initial box is not flat in
+        flat = hi0 <= lo0
+        self.vol = np.prod(np.where(flat, 1.0, hi - lo), axis=1)
+        self.vol0 = float(np.prod(np.where(flat, 1.0, hi0 - lo0)))
+
+    @staticmethod
+    def build(ann, initSet, logUn):
+        """
+        Bisect the initial box for up to IBP_MAX_ROUNDS rounds, at most
+        IBP_MAX_BOXES sub-boxes, dropping the sub-boxes that provably miss a
+        log record. Interval bounds are loose on big boxes, so pruning often
+        only starts after several rounds. Once it has, bisection stops when
+        the rounds of one sweep (one halving of every non-flat side) prune
+        nothing; a single idle round can be followed by more pruning. If
+        nothing is pruned by IBP_PROBE_BOXES sub-boxes, bisection gives up.
+        Returns None when the network has no NumPy engine, or when nothing
+        was pruned, since the cover would then be the whole box.
+        """
+        if ann.net is None:
+            return None
+        lo0 = np.array([dim[0] for dim in initSet], dtype=float)
+        hi0 = np.array([dim[1] for dim in initSet], dtype=float)
+        scale = np.where(hi0 > lo0, hi0 - lo0, np.inf)
+        order = np.argsort(logUn.times, kind='stable')
+        records = (logUn.times[order], logUn.lo[order], logUn.hi[order])
+
+        sweep = max(int(np.sum(hi0 > lo0)), 1)
+        pruned, idleRounds = False, 0
+        lo, hi = lo0[None, :], hi0[None, :]
+        for rnd in range(IBP_MAX_ROUNDS + 1):
+            keep = InitCover.reaches(ann, lo, hi, *records)
+            idle = bool(keep.all())
+            pruned = pruned or not idle
+            idleRounds = idleRounds + 1 if idle else 0
+            lo, hi = lo[keep], hi[keep]
+            if rnd == IBP_MAX_ROUNDS or len(lo) == 0 or 2 * len(lo) > IBP_MAX_BOXES:
+                break
+            if (pruned and idleRounds >= sweep) or (not pruned and 2 * len(lo) > IBP_PROBE_BOXES):
+                break
+            # Halve every box along its widest side, relative to the initial box
+            rel = (hi - lo) / scale
+            if not (rel > 0).any():
+                break
+            d = np.argmax(rel, axis=1)
+            rows = np.arange(len(lo))
+            mid = (lo[rows, d] + hi[rows, d]) / 2
+            loR, hiL = lo.copy(), hi.copy()
+            loR[rows, d] = mid
+            hiL[rows, d] = mid
+            lo, hi = np.concatenate([lo, loR]), np.concatenate([hiL, hi])
+        if not pruned:
+            return None
+        return InitCover(lo, hi, lo0, hi0)
+
+    @staticmethod
+    def reaches(ann, lo, hi, times, rlo, rhi):
+        """
+        (M,) mask of the (M, n) boxes whose reachable enclosure meets the box
+        of every record. Enclosures are intersected with each record box on
+        the way, since a valid trajectory lies inside it.
+        """
+        M, n = lo.shape
+        W = ann.windowSize(n)
+        idx = np.arange(M)
+        r = 0
+        for t in range(int(times.max()) + 1 if len(times) else 0):
+            if t > 0:
+                # The window holds the last W enclosures, oldest first, padded with the initial one
+                out = ann.net.bounds(wlo.reshape(len(idx), -1), whi.reshape(len(idx), -1))
+                if out[0].shape[1] != n:
+                    raise ValueError(f"model outputs {out[0].shape[1]} values per state, expected {n} "
+                                     f"to use them as the next state")
+                lo, hi = out
+            while r < len(times) and times[r] == t:
+                lo, hi = np.maximum(lo, rlo[r]), np.minimum(hi, rhi[r])
+                r += 1
+            alive = np.all(lo <= hi, axis=1)
+            idx, lo, hi = idx[alive], lo[alive], hi[alive]
+            if len(idx) == 0:
+                break
+            if t == 0:
+                wlo = np.repeat(lo[:, None, :], W, axis=1)
+                whi = np.repeat(hi[:, None, :], W, axis=1)
+            else:
+                wlo = np.concatenate([wlo[alive, 1:], lo[:, None, :]], axis=1)
+                whi = np.concatenate([whi[alive, 1:], hi[:, None, :]], axis=1)
+        keep = np.zeros(M, dtype=bool)
+        keep[idx] = True
+        return keep
+
+    def __len__(self):
+        return len(self.lo)
+
+    def fraction(self):
+        """Share of the initial box volume that is kept."""
+        return float(self.vol.sum() / self.vol0) if self.vol0 > 0 else 1.0
+
+    def sample(self, rng, K):
+        """(K, n) points uniform over the union of the kept boxes."""
+        k = rng.choice(len(self.lo), size=K, p=self.vol / self.vol.sum())
+        return rng.uniform(self.lo[k], self.hi[k])
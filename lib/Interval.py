@@ -0,0 +1,214 @@
+import os,sys
+import math
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+
+INF = float('inf')
+# Library functions (sin, exp, ...) are only faithful to a few ulps: widen their results by this many
+FUNC_ULPS = 4
+
+
+def down(x, ulps=1):
+    for _ in range(ulps):
+        x = float(np.nextafter(x, -INF))
+    return x
+
+
+def up(x, ulps=1):
+    for _ in range(ulps):
+        x = float(np.nextafter(x, INF))
+    return x
+
+
+class Interval:
+    """
+    Closed interval [lo, hi] of reals with outward rounding: the result of
+    every operation contains every value the operation can take on its
+    operands, including the floating-point values the scalar and batched
+    engines compute, so propagating boxes through the model equations
+    gives a sound over-approximation.
+    """
+
+    __slots__ = ('lo', 'hi')
+
+    def __init__(self, lo, hi=None):
+        self.lo = float(lo)
+        self.hi = float(lo if hi is None else hi)
+        # Undefined results (inf - inf, inf / inf) widen to the whole line
+        if math.isnan(self.lo):
+            self.lo = -INF
+        if math.isnan(self.hi):
+            self.hi = INF
+
+    @staticmethod
+    def lift(x):
+        return x if isinstance(x, Interval) else Interval(x)
+
+    @staticmethod
+    def whole():
+        return Interval(-INF, INF)
+
+    def width(self):
+        return self.hi - self.lo
+
+    def isPoint(self):
+        return self.lo == self.hi
+
+    def __repr__(self):
+        return f"[{self.lo}, {self.hi}]"
+
+    def __add__(self, other):
+        other = Interval.lift(other)
+        return Interval(down(self.lo + other.lo), up(self.hi + other.hi))
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return Interval(-self.hi, -self.lo)
+
+    def __pos__(self):
+        return self
+
+    def __sub__(self, other):
+        return self + (-Interval.lift(other))
+
+    def __rsub__(self, other):
+        return Interval.lift(other) + (-self)
+
+    def __mul__(self, other):
+        other = Interval.lift(other)
+        # 0 * inf counts as 0: an unbounded factor times exactly 0 is 0
+        prods = [0.0 if (a == 0 or b == 0) else a * b
+                 for a in (self.lo, self.hi) for b in (other.lo, other.hi)]
+        return Interval(down(min(prods)), up(max(prods)))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        other = Interval.lift(other)
+        if other.lo <= 0 <= other.hi:
+            return Interval.whole()
+        quots = [a / b for a in (self.lo, self.hi) for b in (other.lo, other.hi)]
+        return Interval(down(min(quots)), up(max(quots)))
+
+    def __rtruediv__(self, other):
+        return Interval.lift(other) / self
+
+    def __pow__(self, other):
+        other = Interval.lift(other)
+        if other.isPoint() and float(other.lo).is_integer():
+            n = int(other.lo)
+            if n == 0:
+                return Interval(1.0)
+            if n < 0:
+                return Interval(1.0) / (self ** (-n))
+            lo, hi = power(self.lo, n), power(self.hi, n)
+            # pow is faithful to an ulp or so, like the library functions
+            if n % 2 == 1 or self.lo >= 0:
+                return Interval(down(lo, FUNC_ULPS), up(hi, FUNC_ULPS))
+            if self.hi <= 0:
+                return Interval(max(down(hi, FUNC_ULPS), 0.0), up(lo, FUNC_ULPS))
+            return Interval(0.0, up(max(lo, hi), FUNC_ULPS))
+        # Real exponent: defined for positive bases only
+        return iexp(other * ilog(self))
+
+    def __rpow__(self, other):
+        return Interval.lift(other) ** self
+
+    def __abs__(self):
+        if self.lo >= 0:
+            return self
+        if self.hi <= 0:
+            return -self
+        return Interval(0.0, max(-self.lo, self.hi))
+
+
+def power(x, n):
+    # x ** n for an integer n >= 1, with overflow to +-inf instead of OverflowError
+    try:
+        return x ** n
+    except OverflowError:
+        return INF if (x > 0 or n % 2 == 0) else -INF
+
+
+def monotone(f, x):
+    # Enclosure of an increasing function
+    x = Interval.lift(x)
+    return Interval(down(f(x.lo), FUNC_ULPS), up(f(x.hi), FUNC_ULPS))
+
+
+def iexp(x):
+    x = Interval.lift(x)
+    a = math.exp(x.lo) if x.lo < 709 else INF
+    b = math.exp(x.hi) if x.hi < 709 else INF
+    return Interval(max(down(a, FUNC_ULPS), 0.0), up(b, FUNC_ULPS))
+
+
+def ilog(x):
+    x = Interval.lift(x)
+    if x.hi <= 0:
+        raise ValueError("log of a non-positive interval")
+    a = math.log(x.lo) if x.lo > 0 else -INF
+    b = math.log(x.hi) if x.hi < INF else INF
+    return Interval(down(a, FUNC_ULPS), up(b, FUNC_ULPS))
+
+
+def isqrt(x):
+    x = Interval.lift(x)
+    if x.hi < 0:
+        raise ValueError("sqrt of a negative interval")
+    return Interval(max(down(math.sqrt(max(x.lo, 0.0)), FUNC_ULPS), 0.0), up(math.sqrt(x.hi), FUNC_ULPS))
+
+
+def periodic(f, x, peak):
+    """
+    Enclosure of sin or cos: f at the endpoints, widened to +-1 where the
+    interval contains a maximum (at peak + 2k pi) or a minimum (at
+    peak + pi + 2k pi).
+    """
+    x = Interval.lift(x)
+    if not (math.isfinite(x.lo) and math.isfinite(x.hi)) or x.width() >= 2 * math.pi:
+        return Interval(-1.0, 1.0)
+    a, b = f(x.lo), f(x.hi)
+    lo, hi = down(min(a, b), FUNC_ULPS), up(max(a, b), FUNC_ULPS)
+    k = math.ceil((x.lo - peak) / (2 * math.pi))
+    if peak + 2 * math.pi * k <= x.hi:
+        hi = 1.0
+    k = math.ceil((x.lo - peak - math.pi) / (2 * math.pi))
+    if peak + math.pi + 2 * math.pi * k <= x.hi:
+        lo = -1.0
+    return Interval(max(lo, -1.0), min(hi, 1.0))
+
+
+def isin(x):
+    return periodic(math.sin, x, math.pi / 2)
+
+
+def icos(x):
+    return periodic(math.cos, x, 0.0)
+
+
+def itan(x):
+    x = Interval.lift(x)
+    if not (math.isfinite(x.lo) and math.isfinite(x.hi)):
+        return Interval.whole()
+    # Poles at pi/2 + k pi
+    k = math.ceil((x.lo - math.pi / 2) / math.pi)
+    if math.pi / 2 + math.pi * k <= x.hi:
+        return Interval.whole()
+    return monotone(math.tan, x)
+
+
+def iabs(x):
+    return abs(Interval.lift(x))
+
+
+# Interval counterparts of Equation.ALLOWED_FUNCS
+INTERVAL_FUNCS = {
+    'sin': isin, 'cos': icos, 'tan': itan,
+    'exp': iexp, 'log': ilog, 'sqrt': isqrt,
+    'fabs': iabs, 'abs': iabs
+}
@@ -19,6 +19,17 @@ class JFB:
         K=math.ceil((-math.log10(self.B+1)/math.log10(self.c)))
         return K
 
+    def getConfidence(self, K):
+        # Inverse of getNumberOfSamples: the largest c that K samples reach at this B
+        if K <= 0:
+            return 0.0
+        return (self.B + 1) ** (-1.0 / K)
+
+    def getBayesFactor(self, K):
+        # Inverse of getNumberOfSamples the other way: the largest B that K samples reach at this c
+        exponent = -K * math.log(self.c)
+        return math.inf if exponent > 700 else math.expm1(exponent)
+
     def getErr(self):
         err=(self.c/(self.c+((1-self.c)*self.B)))
         return err
@@ -0,0 +1,215 @@
+import os,sys
+from itertools import islice
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+
+# Binary columnar log (.lgb): a 64-byte header followed by the columns
+#   times int64[R] | lo float64[R, n] | hi float64[R, n]
+# with records sorted by time, so a time window is a contiguous slice. Only
+# logs already in time order are written, so the first record (the initial
+# box) is the same in both formats.
+LGB_MAGIC = b'POSTOLGB'
+LGB_VERSION = 1
+LGB_HEADER = 64
+
+# Lines parsed per chunk by the streaming text parser
+PARSE_CHUNK = 65536
+
+# Everything in "t=0: [[lo, hi], ...]" that is not part of a number
+TEXT_SEPARATORS = str.maketrans({ch: ' ' for ch in '[],:t='})
+
+
+class LogFile:
+    """
+    A log held as columns: record times (R,) and the lower and upper bounds
+    (R, n) of every log box. It also behaves like the list of (box, t)
+    records used throughout the code, building a record only when it is
+    indexed, so array-aware code (TrajValidity, TrajSafety) never needs
+    Python lists.
+    """
+
+    def __init__(self, times, lo, hi, path=None, window=None):
+        self.times = times
+        self.lo = lo
+        self.hi = hi
+        # Set for memory-mapped logs, so that pickling ships the path, not the data
+        self.path = path
+        self.window = window
+
+    @staticmethod
+    def fromRecords(records):
+        for k, (_, t) in enumerate(records):
+            if t != int(t):
+                raise ValueError(f"record {k}: time {t!r} is not an integer")
+        times = np.array([int(t) for _, t in records], dtype=np.int64)
+        lo = np.array([[iv[0] for iv in box] for box, _ in records], dtype=float)
+        hi = np.array([[iv[1] for iv in box] for box, _ in records], dtype=float)
+        return LogFile(times, lo.reshape(len(records), -1), hi.reshape(len(records), -1))
+
+    @staticmethod
+    def read(path):
+        if str(path).endswith('.lgb'):
+            return LogFile.readBinary(path)
+        return LogFile.readText(path)
+
+    @staticmethod
+    def readText(path):
+        """
+        Parse a text .lg log ("t=0: [[x_lo,x_hi],[y_lo,y_hi]]" per line) in
+        chunks of lines: each chunk is turned into one flat float array
+        instead of calling ast.literal_eval line by line.
+        """
+        chunks = []
+        nRead = 0
+        with open(path, 'r') as f:
+            while True:
+                lines = [ln for ln in islice(f, PARSE_CHUNK) if ln.strip()]
+                if not lines:
+                    break
+                chunks.append(LogFile.parseLines(path, lines, nRead))
+                nRead += len(lines)
+        if not chunks:
+            raise ValueError(f"{path}: empty log")
+        return LogFile.fromData(np.concatenate(chunks))
+
+    @staticmethod
+    def readTextFrom(path, offset):
+        """
+        Parse the complete lines appended to a text log after byte `offset`,
+        for following a log that is still being written. Returns (log,
+        newOffset); log is None when no complete line was added. A partly
+        written last line is left for the next call.
+        """
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        lines = [ln for ln in data[:end].decode().splitlines(keepends=True) if ln.strip()]
+        if not lines:
+            return None, offset + end
+        return LogFile.fromData(LogFile.parseLines(path, lines, 0)), offset + end
+
+    @staticmethod
+    def parseLines(path, lines, offset):
+        # One (len(lines), 1 + 2n) array: t, lo_0, hi_0, lo_1, hi_1, ...
+        width = len(lines[0].translate(TEXT_SEPARATORS).split())
+        try:
+            vals = np.array(''.join(lines).translate(TEXT_SEPARATORS).split(), dtype=float)
+        except ValueError:
+            vals = None
+        if vals is None or vals.size != width * len(lines) or width < 3 or width % 2 == 0:
+            LogFile.checkLines(path, lines, width, offset)
+        vals = vals.reshape(len(lines), width)
+        bad = np.flatnonzero(vals[:, 0] != np.floor(vals[:, 0]))
+        if len(bad):
+            k = int(bad[0])
+            raise ValueError(f"{path}: non-integer time on log line {offset + k + 1}: {lines[k].strip()!r}")
+        return vals
+
+    @staticmethod
+    def fromData(data):
+        times = data[:, 0].astype(np.int64)
+        return LogFile(times, np.ascontiguousarray(data[:, 1::2]), np.ascontiguousarray(data[:, 2::2]))
+
+    @staticmethod
+    def checkLines(path, lines, width, offset):
+        # Slow path, only used to point at the malformed line
+        for k, line in enumerate(lines):
+            try:
+                vals = [float(v) for v in line.translate(TEXT_SEPARATORS).split()]
+            except ValueError:
+                vals = None
+            if vals is None or len(vals) != width or width < 3 or width % 2 == 0:
+                raise ValueError(f"{path}: malformed log line {offset + k + 1}: {line.strip()!r}")
+        raise ValueError(f"{path}: malformed log")
+
+    @staticmethod
+    def readBinary(path, tMin=None, tMax=None):
+        """
+        Memory-map a binary .lgb log. With tMin/tMax only the records with
+        tMin <= t <= tMax are mapped, found by binary search on the times.
+        """
+        with open(path, 'rb') as f:
+            header = f.read(LGB_HEADER)
+        if header[:8] != LGB_MAGIC:
+            raise ValueError(f"{path}: not a binary Posto log")
+        version, R, n = np.frombuffer(header[8:32], dtype=np.int64)
+        if version != LGB_VERSION:
+            raise ValueError(f"{path}: unsupported binary log version {version}")
+        R, n = int(R), int(n)
+        times = np.memmap(path, dtype=np.int64, mode='r', offset=LGB_HEADER, shape=(R,))
+        lo = np.memmap(path, dtype=np.float64, mode='r', offset=LGB_HEADER + 8 * R, shape=(R, n))
+        hi = np.memmap(path, dtype=np.float64, mode='r', offset=LGB_HEADER + 8 * R * (1 + n), shape=(R, n))
+        i0 = 0 if tMin is None else int(np.searchsorted(times, tMin, side='left'))
+        i1 = R if tMax is None else int(np.searchsorted(times, tMax, side='right'))
+        return LogFile(times[i0:i1], lo[i0:i1], hi[i0:i1], path=path, window=(tMin, tMax))
+
+    def writeText(self, path):
+        with open(path, 'w') as f:
+            for k in range(0, len(self), PARSE_CHUNK):
+                lines = []
+                for box, t in (self[i] for i in range(k, min(k + PARSE_CHUNK, len(self)))):
+                    intervals_line = ", ".join(f"[{lo}, {hi}]" for lo, hi in box)
+                    lines.append(f"t={int(t)}: [{intervals_line}]\n")
+                f.write(''.join(lines))
+
+    def writeBinary(self, path):
+        # Sorting here would change which record is the initial box
+        times = np.asarray(self.times)
+        back = np.flatnonzero(np.diff(times) < 0)
+        if len(back):
+            k = int(back[0]) + 1
+            raise ValueError(f"record {k + 1} (t={int(times[k])}) comes after t={int(times[k - 1])}; "
+                             f".lgb needs records in time order")
+        R, n = self.lo.shape
+        header = LGB_MAGIC + np.array([LGB_VERSION, R, n], dtype=np.int64).tobytes()
+        with open(path, 'wb') as f:
+            f.write(header.ljust(LGB_HEADER, b'\0'))
+            f.write(np.ascontiguousarray(times, dtype=np.int64).tobytes())
+            f.write(np.ascontiguousarray(self.lo, dtype=np.float64).tobytes())
+            f.write(np.ascontiguousarray(self.hi, dtype=np.float64).tobytes())
+
+    def write(self, path):
+        if str(path).endswith('.lgb'):
+            self.writeBinary(path)
+        else:
+            self.writeText(path)
+
+    def subset(self, mask):
+        return LogFile(self.times[mask], self.lo[mask], self.hi[mask])
+
+    def maxTime(self):
+        return int(self.times.max()) if len(self) else 0
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, k):
+        # Legacy (box, t) record, box being a list of [lo, hi] per state
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError(k)
+        box = [[float(lo), float(hi)] for lo, hi in zip(self.lo[k], self.hi[k])]
+        return (box, int(self.times[k]))
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getstate__(self):
+        if self.path is not None:
+            return {'path': self.path, 'window': self.window}
+        return {'times': np.asarray(self.times), 'lo': np.asarray(self.lo), 'hi': np.asarray(self.hi)}
+
+    def __setstate__(self, state):
+        if 'path' in state:
+            self.__dict__.update(LogFile.readBinary(state['path'], *state['window']).__dict__)
+        else:
+            self.__init__(state['times'], state['lo'], state['hi'])
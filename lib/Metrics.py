@@ -0,0 +1,149 @@
+import os,sys
+import io
+import json
+import time
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import *
+from lib.RejectionProfile import RejectionProfile
+
+# Functions and allocation sites listed in a --profile report
+PROFILE_TOP = 25
+
+
+def clock():
+    return time.perf_counter(), time.process_time()
+
+
+class Phase:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.lap(self.name, self.start)
+        return False
+
+
+class Metrics:
+    """
+    Instrumentation of one run: wall and CPU time per phase, and counters
+    (steps simulated, model calls, trajectories rejected, ...), and the
+    rejection profile of the log (lib/RejectionProfile.py). Phases are
+    timed with `with metrics.phase(name):`, or in hot loops with
+    `t = metrics.lap(name, t)` starting from `t = clock()`, which costs two
+    clock reads. A phase may be entered many times; its times add up.
+
+    Worker processes keep their own Metrics; each batch result carries the
+    batch's share (state()), which the parent merges.
+    """
+
+    def __init__(self):
+        self.reset()
+        self.profiler = None
+
+    def reset(self):
+        self.wall = {}
+        self.cpu = {}
+        self.calls = {}
+        self.counters = {}
+        self.rejections = RejectionProfile()
+
+    def phase(self, name):
+        return Phase(self, name)
+
+    def lap(self, name, start):
+        """Add the time since `start` (a clock()) to phase `name`; returns a new clock()."""
+        now = clock()
+        self.wall[name] = self.wall.get(name, 0.0) + now[0] - start[0]
+        self.cpu[name] = self.cpu.get(name, 0.0) + now[1] - start[1]
+        self.calls[name] = self.calls.get(name, 0) + 1
+        return now
+
+    def count(self, name, k=1):
+        self.counters[name] = self.counters.get(name, 0) + int(k)
+
+    def state(self):
+        return {'wall': dict(self.wall), 'cpu': dict(self.cpu),
+                'calls': dict(self.calls), 'counters': dict(self.counters),
+                'rejections': self.rejections.state()}
+
+    def merge(self, state):
+        for key in ('wall', 'cpu', 'calls', 'counters'):
+            mine = getattr(self, key)
+            for name, v in state[key].items():
+                mine[name] = mine.get(name, 0) + v
+        self.rejections.merge(state['rejections'])
+
+    def report(self):
+        phases = {name: {'wall': self.wall[name], 'cpu': self.cpu[name], 'calls': self.calls[name]}
+                  for name in self.wall}
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def summary(self):
+        """Print the phases, slowest first, and the counters."""
+        for name in sorted(self.wall, key=self.wall.get, reverse=True):
+            note(f"  {name:<14} wall {self.wall[name]:9.3f} sec   cpu {self.cpu[name]:9.3f} sec   "
+                 f"({self.calls[name]} calls)")
+        for name, v in self.counters.items():
+            note(f"  {name:<14} {v}")
+
+    # ---- --profile ----------------------------------------------------
+
+    def startProfile(self):
+        import cProfile
+        import tracemalloc
+        tracemalloc.start()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stopProfile(self, outdir):
+        """
+        Stop profiling; write the cProfile data (profile.prof, for pstats or
+        snakeviz) and a text summary (profile.txt) to outdir. Returns the
+        profile part of the report: where the files are, the peak traced
+        memory and the largest allocation sites.
+        """
+        import pstats
+        import tracemalloc
+        if self.profiler is None:
+            return None
+        self.profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        os.makedirs(outdir, exist_ok=True)
+        profPath = os.path.join(outdir, 'profile.prof')
+        textPath = os.path.join(outdir, 'profile.txt')
+        self.profiler.dump_stats(profPath)
+        buf = io.StringIO()
+        pstats.Stats(self.profiler, stream=buf).sort_stats('cumulative').print_stats(PROFILE_TOP)
+        sites = snapshot.statistics('lineno')[:PROFILE_TOP]
+        with open(textPath, 'w') as f:
+            f.write(buf.getvalue())
+            f.write(f"\nTraced memory: peak {peak / 2**20:.1f} MiB, at exit {current / 2**20:.1f} MiB\n")
+            f.write("Largest allocation sites still alive at exit:\n")
+            for stat in sites:
+                f.write(f"  {stat}\n")
+        self.profiler = None
+        return {
+            'cprofile': profPath,
+            'summary': textPath,
+            'tracedPeakMB': peak / 2**20,
+            'topAllocations': [{'site': str(stat.traceback[0]), 'sizeMB': stat.size / 2**20, 'count': stat.count}
+                               for stat in sites[:10]],
+        }
+
+    @staticmethod
+    def writeReport(path, report):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, default=float)
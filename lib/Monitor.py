@@ -0,0 +1,117 @@
+import os,sys
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import *
+
+import numpy as np
+from lib.LogFile import LogFile
+
+
+class Monitor:
+    """
+    Incremental safety check for a log that keeps growing. Holds a pool of
+    up to K trajectories consistent with every record seen so far, storing
+    only their current state and first safety violation; the random stream
+    is the System's. A new record advances the pool from the last record
+    time to its own, drops the trajectories that miss it and tops the pool
+    back up with fresh trajectories, simulated from t=0 over the stored
+    records. Handling a record thus costs the steps the log advanced, plus
+    the refills.
+    """
+
+    def __init__(self, system, K, safety_checker):
+        self.system = system
+        self.K = K
+        self.checker = safety_checker
+        self.chunks = []
+        self.log = None
+        self.initSet = None
+        # Time of the pool states: every record up to it has been checked
+        self.t = 0
+        self.states = None
+        self.tViolate = np.empty(0, dtype=int)
+        self.nRecords = 0
+        self.nLogUnsafe = 0
+        self.nGenerated = 0
+
+    def records(self):
+        # All records so far, joined only when a refill needs them
+        if self.log is None:
+            self.log = LogFile(np.concatenate([ch.times for ch in self.chunks]),
+                               np.concatenate([ch.lo for ch in self.chunks]),
+                               np.concatenate([ch.hi for ch in self.chunks]))
+        return self.log
+
+    def update(self, new):
+        """
+        Fold in a LogFile of newly appended records. Returns the number of
+        fresh trajectories added to the pool.
+        """
+        self.chunks.append(new)
+        self.log = None
+        self.nRecords += len(new)
+        self.nLogUnsafe += int(self.checker.getLogViolations(new.lo, new.hi).sum())
+        if self.initSet is None:
+            # Trajectories start in the first record's box, as in checkSafety
+            self.initSet = new[0][0]
+            self.states = np.empty((0, len(self.initSet)))
+        tNew = max(self.t, int(new.times.max()))
+        if int(new.times.min()) < self.t:
+            # The pool keeps no history to check a late record against: rebuild it
+            warn(f"Record at t={int(new.times.min())} arrived after t={self.t}; rebuilding the trajectory pool.")
+            self.states = self.states[:0]
+            self.tViolate = self.tViolate[:0]
+        else:
+            self.states, self.tViolate = self.advance(
+                self.states, self.tViolate, self.t, tNew, new.times, new.lo, new.hi)
+        self.t = tNew
+        return self.refill()
+
+    def advance(self, states, tViolate, t0, t1, times, lo, hi):
+        """
+        Step (K, n) states at time t0 up to t1, dropping those outside the box
+        of a record with t0 <= t <= t1 and noting the first unsafe step of the
+        others. Returns the surviving states and their tViolate.
+        """
+        order = np.argsort(times, kind='stable')
+        times, lo, hi = times[order], lo[order], hi[order]
+        r = int(np.searchsorted(times, t0, side='left'))
+        t = t0
+        while True:
+            while r < len(times) and times[r] == t:
+                inside = np.all((states >= lo[r]) & (states <= hi[r]), axis=1)
+                states, tViolate = states[inside], tViolate[inside]
+                r += 1
+            if len(states) == 0:
+                break
+            bad = self.checker.violated(states[:, :self.checker.nStates] @ self.checker.A.T).any(axis=1)
+            tViolate = np.where(bad & (tViolate < 0), t, tViolate)
+            if t >= t1:
+                break
+            states = self.system.stepStates(states)
+            t += 1
+        return states, tViolate
+
+    def refill(self):
+        if len(self.states) >= self.K:
+            return 0
+        log = self.records()
+        lo0 = np.array([dim[0] for dim in self.initSet], dtype=float)
+        hi0 = np.array([dim[1] for dim in self.initSet], dtype=float)
+        nNew = 0
+        while len(self.states) < self.K:
+            fresh = self.system.rng.uniform(lo0, hi0, size=(BATCH_SIZE, len(lo0)))
+            self.nGenerated += BATCH_SIZE
+            fresh, tv = self.advance(fresh, np.full(BATCH_SIZE, -1), 0, self.t, log.times, log.lo, log.hi)
+            take = self.K - len(self.states)
+            self.states = np.concatenate([self.states, fresh[:take]])
+            self.tViolate = np.concatenate([self.tViolate, tv[:take]])
+            nNew += min(take, len(fresh))
+        return nNew
+
+    def isSafe(self):
+        return self.nLogUnsafe == 0 and not (self.tViolate >= 0).any()
+
+    def nUnsafe(self):
+        return int((self.tViolate >= 0).sum())
@@ -0,0 +1,119 @@
+import os,sys
+import json
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import *
+
+import numpy as np
+
+# Records listed in the console summary of a rejection profile
+REJECTION_TOP = 3
+
+
+class RejectionProfile:
+    """
+    Where the log rejects trajectories. Records are taken in time order and
+    a trajectory is rejected by the first record it misses. For every record
+    (by its index in the log) the profile keeps the number of trajectories
+    that reached it, i.e. passed every earlier record, the number it
+    rejected, and per state dimension the number of those rejections in
+    which that state lay outside the record's interval. A rejection can
+    involve several dimensions.
+
+    Worker processes fill their own profile; the parent merges state()s,
+    like Metrics.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.reached = None
+        self.rejected = None
+        self.dims = None
+
+    def ensure(self, R, n):
+        if self.reached is None:
+            self.reached = np.zeros(R, dtype=np.int64)
+            self.rejected = np.zeros(R, dtype=np.int64)
+            self.dims = np.zeros((R, n), dtype=np.int64)
+
+    def add(self, record, nReached, outside):
+        """
+        Count one record check: nReached trajectories met it, and outside
+        (k, n) holds, for each of the k it rejected, the dimensions that were
+        out of its box.
+        """
+        self.reached[record] += nReached
+        self.rejected[record] += len(outside)
+        self.dims[record] += outside.sum(axis=0)
+
+    def addBatch(self, order, inside, outside):
+        """
+        Count whole trajectories checked at once: inside (K, R) tells whether
+        each trajectory lies in each record's box and outside (K, R, n) which
+        dimensions miss it, both in log order; `order` lists the records in
+        time order.
+        """
+        K, R, n = outside.shape
+        self.ensure(R, n)
+        insideT = inside[:, order]
+        fail = ~insideT.all(axis=1)
+        first = np.argmin(insideT[fail], axis=1)
+        rejected = np.bincount(first, minlength=R)
+        self.reached[order] += K - np.concatenate(([0], np.cumsum(rejected)[:-1]))
+        self.rejected[order] += rejected
+        np.add.at(self.dims, order[first], outside[np.flatnonzero(fail), order[first]])
+
+    def state(self):
+        if self.reached is None:
+            return None
+        return {'reached': self.reached.copy(), 'rejected': self.rejected.copy(), 'dims': self.dims.copy()}
+
+    def merge(self, state):
+        if state is None:
+            return
+        R, n = state['dims'].shape
+        self.ensure(R, n)
+        self.reached += state['reached']
+        self.rejected += state['rejected']
+        self.dims += state['dims']
+
+    def report(self, times, stateNames=None):
+        """
+        Per-record dicts in time order: index, t, reached, rejected, the
+        conditional acceptance rate (None for records no trajectory reached)
+        and the rejections per dimension.
+        """
+        if self.reached is None:
+            return []
+        n = self.dims.shape[1]
+        names = stateNames if stateNames and len(stateNames) == n else [f"state[{i}]" for i in range(n)]
+        rows = []
+        for r in np.argsort(times, kind='stable'):
+            reached, rejected = int(self.reached[r]), int(self.rejected[r])
+            rows.append({
+                'record': int(r), 't': int(times[r]),
+                'reached': reached, 'rejected': rejected,
+                'acceptance': (reached - rejected) / reached if reached else None,
+                'dims': {name: int(k) for name, k in zip(names, self.dims[r])},
+            })
+        return rows
+
+    def summary(self, rows):
+        """Print the records that reject the most trajectories."""
+        worst = sorted((row for row in rows if row['rejected']), key=lambda row: row['rejected'], reverse=True)
+        total = sum(row['rejected'] for row in rows)
+        if not worst:
+            return
+        for row in worst[:REJECTION_TOP]:
+            dims = ", ".join(f"{name}: {k}" for name, k in row['dims'].items() if k)
+            note(f"  record {row['record']} (t={row['t']}) rejects {row['rejected']} of {row['reached']} "
+                 f"reaching it ({1 - row['acceptance']:.1%}); {row['rejected'] / total:.0%} of all rejections; "
+                 f"out of box in {dims}")
+
+    @staticmethod
+    def write(path, rows):
+        with open(path, 'w') as f:
+            json.dump({'records': rows}, f, indent=2)
@@ -0,0 +1,47 @@
+import os,sys
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+
+
+class Reservoir:
+    """
+    Fixed-size uniform sample over a stream of items (reservoir sampling).
+    Items arrive in chunks: each chunk is itself a uniform sample of the
+    items it stands for, so per-batch samples from worker processes can be
+    merged without shipping whole batches.
+    """
+
+    def __init__(self, size, rng):
+        self.size = size
+        self.rng = rng
+        self.items = []
+        self.seen = 0
+
+    def add(self, item):
+        self.merge([item], 1)
+
+    def merge(self, sample, total):
+        """
+        Fold in `sample`, a uniformly random subset of min(total, size) of
+        `total` new items. Afterwards the reservoir is a uniform sample of
+        min(seen, size) of all items seen so far.
+        """
+        if total == 0:
+            return
+        sample = list(sample)
+        if self.seen + total <= self.size:
+            self.items += sample
+            self.seen += total
+            return
+        # How many of the final slots fall to the new items
+        if self.seen == 0:
+            nNew = self.size
+        else:
+            nNew = int(self.rng.hypergeometric(total, self.seen, self.size))
+        keepOld = self.rng.choice(len(self.items), self.size - nNew, replace=False)
+        takeNew = self.rng.choice(len(sample), nNew, replace=False)
+        self.items = [self.items[i] for i in sorted(keepOld)] + [sample[i] for i in sorted(takeNew)]
+        self.seen += total
@@ -0,0 +1,426 @@
+import os,sys
+import re
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import msg, note
+
+import numpy as np
+from lib.LogFile import LogFile
+
+TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)"
+                   r"|([A-Za-z_][A-Za-z0-9_]*)|(->|<=|>=|&&|\|\||[<>!&|()\[\],+\-*]))")
+# Word spellings of the operators
+WORDS = {'not': '!', 'and': '&', 'or': '|', 'implies': '->',
+         'always': 'G', 'eventually': 'F', 'until': 'U', '&&': '&', '||': '|'}
+COMPARISONS = {'<', '<=', '>', '>='}
+# Words the tokenizer reads as operators or constants, so not usable as state names
+RESERVED = {'G', 'F', 'U', 'true', 'false', 'inf'} | {w for w in WORDS if w.isalpha()}
+
+
+def slidingMax(x, a, b):
+    """
+    out[:, t] = max of x[:, t+a .. t+b] over the steps that exist (-inf if
+    none) for a (K, T) array; b=None means up to the end. Bounded windows
+    use the van Herk / Gil-Werman scheme: prefix and suffix maxima within
+    blocks of the window length, so the cost is O(T) whatever the window.
+    """
+    K, T = x.shape
+    out = np.full((K, T), -np.inf)
+    if a >= T:
+        return out
+    if b is None:
+        suffix = np.maximum.accumulate(x[:, ::-1], axis=1)[:, ::-1]
+        out[:, :T - a] = suffix[:, a:]
+        return out
+    w = b - a + 1
+    nBlocks = -(-(T + w - 1) // w)
+    y = np.full((K, nBlocks * w), -np.inf)
+    y[:, :T - a] = x[:, a:]
+    y = y.reshape(K, nBlocks, w)
+    prefix = np.maximum.accumulate(y, axis=2).reshape(K, -1)
+    suffix = np.maximum.accumulate(y[:, :, ::-1], axis=2)[:, :, ::-1].reshape(K, -1)
+    # [t, t+w-1] is the tail of t's block plus the head of the next one
+    return np.maximum(suffix[:, :T], prefix[:, w - 1:w - 1 + T])
+
+
+def slidingMin(x, a, b):
+    return -slidingMax(-x, a, b)
+
+
+def shift(x, k, fill):
+    # out[:, t] = x[:, t+k], `fill` past the end
+    out = np.full_like(x, fill)
+    if k < x.shape[1]:
+        out[:, :x.shape[1] - k] = x[:, k:]
+    return out
+
+
+class STL:
+    """
+    Signal temporal logic specification over the state variables, evaluated
+    as quantitative robustness on (K, T, n) trajectory batches. Whether a
+    trajectory satisfies the specification is decided by the Boolean
+    semantics, which keep the strictness of every atom: on a boundary
+    (robustness 0) `x <= 0.5` holds and `x < 0.5` does not. Robustness only
+    ranks and reports trajectories.
+
+    Syntax (time bounds are in steps; [a, inf] or no bounds is unbounded):
+        atoms       linear comparisons, e.g.  x < 0.5,  2*x - y >= 1
+        boolean     ! (not), & (and), | (or), -> (implies), true, false
+        temporal    G[a,b] phi (always), F[a,b] phi (eventually),
+                    phi U[a,b] psi (until)
+    e.g.  G (y > 1 -> F[0,50] x < 0.5)
+
+    Windows are cut off at the end of the trajectory: near the end, F only
+    sees the steps that exist, and G and U likewise.
+
+    Drop-in replacement for TrajSafety in checkSafety. A log record is
+    checked on its own against the atoms that a top-level G requires at its
+    time step, as TrajSafety checks constraints: it is unsafe when its box
+    meets the set where such an atom fails. Other parts of the formula are
+    only checked on trajectories.
+    """
+
+    # Safety is decided on whole trajectories, not state by state
+    stepwise = False
+
+    def __init__(self, text, state_names):
+        self.text = text.strip()
+        self.names = list(state_names)
+        self.nStates = len(self.names)
+        clash = sorted(RESERVED.intersection(self.names))
+        if clash:
+            raise ValueError(f"STL: state names {clash} are reserved words of the formula syntax; rename them")
+        self.tokens = list(self.tokenize(self.text))
+        self.pos = 0
+        self.root = self.parseImplies()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"STL: unexpected {self.tokens[self.pos][1]!r} in {self.text!r}")
+        del self.tokens
+        self.invariants, self.logComplete = self.findInvariants(self.root)
+
+    @staticmethod
+    def load(spec, state_names):
+        """An STL from a formula, or from a file holding one ('#' starts a comment)."""
+        if os.path.isfile(spec):
+            with open(spec) as f:
+                spec = ' '.join(line.split('#')[0] for line in f)
+        return STL(spec, state_names)
+
+    def describe(self):
+        return self.text
+
+    # ---- parsing -------------------------------------------------------
+
+    def tokenize(self, text):
+        pos = 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = TOKEN.match(text, pos)
+            if m is None or m.end() == pos:
+                raise ValueError(f"STL: cannot read {text[pos:]!r}")
+            pos = m.end()
+            num, word, op = m.groups()
+            if num is not None:
+                yield ('num', float(num))
+            elif word is not None:
+                yield ('op', WORDS[word]) if word in WORDS else ('word', word)
+            else:
+                yield ('op', WORDS.get(op, op))
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, 'end of formula')
+
+    def accept(self, *ops):
+        kind, val = self.peek()
+        if (kind == 'op' or (kind == 'word' and val in ('G', 'F', 'U'))) and val in ops:
+            self.pos += 1
+            return val
+        return None
+
+    def expect(self, op):
+        if self.accept(op) is None:
+            raise ValueError(f"STL: expected {op!r} at {self.peek()[1]!r} in {self.text!r}")
+
+    def parseImplies(self):
+        left = self.parseOr()
+        if self.accept('->'):
+            return ('implies', left, self.parseImplies())
+        return left
+
+    def parseOr(self):
+        parts = [self.parseAnd()]
+        while self.accept('|'):
+            parts.append(self.parseAnd())
+        return parts[0] if len(parts) == 1 else ('or', parts)
+
+    def parseAnd(self):
+        parts = [self.parseUntil()]
+        while self.accept('&'):
+            parts.append(self.parseUntil())
+        return parts[0] if len(parts) == 1 else ('and', parts)
+
+    def parseUntil(self):
+        left = self.parseUnary()
+        if self.accept('U'):
+            a, b = self.parseBounds()
+            return ('U', a, b, left, self.parseUnary())
+        return left
+
+    def parseUnary(self):
+        if self.accept('!'):
+            return ('not', self.parseUnary())
+        op = self.accept('G', 'F')
+        if op:
+            a, b = self.parseBounds()
+            return (op, a, b, self.parseUnary())
+        if self.accept('('):
+            node = self.parseImplies()
+            self.expect(')')
+            return node
+        kind, val = self.peek()
+        if kind == 'word' and val in ('true', 'false'):
+            self.pos += 1
+            return ('const', np.inf if val == 'true' else -np.inf)
+        return self.parseAtom()
+
+    def parseBounds(self):
+        if not self.accept('['):
+            return 0, None
+        a = self.parseStep()
+        self.expect(',')
+        b = self.parseStep(allowInf=True)
+        self.expect(']')
+        if b is not None and b < a:
+            raise ValueError(f"STL: empty time bounds [{a},{b}] in {self.text!r}")
+        return a, b
+
+    def parseStep(self, allowInf=False):
+        kind, val = self.peek()
+        self.pos += 1
+        if allowInf and kind == 'word' and val == 'inf':
+            return None
+        if kind != 'num' or val != int(val):
+            raise ValueError(f"STL: time bounds are whole steps, got {val!r} in {self.text!r}")
+        return int(val)
+
+    def parseLinear(self):
+        # sum of [sign] (num | name | num * name | name * num) terms
+        coeffs = np.zeros(self.nStates)
+        const = 0.0
+        sign = -1.0 if self.accept('-') else 1.0
+        while True:
+            kind, val = self.peek()
+            self.pos += 1
+            coef, name = 1.0, None
+            if kind == 'num':
+                coef = val
+                if self.accept('*'):
+                    kind, name = self.peek()
+                    self.pos += 1
+                    if kind != 'word':
+                        raise ValueError(f"STL: expected a state name after '*' in {self.text!r}")
+            elif kind == 'word':
+                name = val
+                if self.accept('*'):
+                    kind, coef = self.peek()
+                    self.pos += 1
+                    if kind != 'num':
+                        raise ValueError(f"STL: expected a number after '*' in {self.text!r}")
+            else:
+                raise ValueError(f"STL: expected a term at {str(val)!r} in {self.text!r}")
+            if name is None:
+                const += sign * coef
+            elif name in self.names:
+                coeffs[self.names.index(name)] += sign * coef
+            else:
+                raise ValueError(f"STL: unknown state {name!r}; states are {self.names}")
+            op = self.accept('+', '-')
+            if op is None:
+                return coeffs, const
+            sign = 1.0 if op == '+' else -1.0
+
+    def parseAtom(self):
+        lc, lk = self.parseLinear()
+        kind, op = self.peek()
+        if op not in COMPARISONS:
+            raise ValueError(f"STL: expected a comparison at {op!r} in {self.text!r}")
+        self.pos += 1
+        rc, rk = self.parseLinear()
+        # Robustness: how far the comparison holds, negative when it fails; 0 fails strict comparisons only
+        strict = op in ('<', '>')
+        if op in ('>', '>='):
+            return ('atom', lc - rc, lk - rk, strict)
+        return ('atom', rc - lc, rk - lk, strict)
+
+    # ---- evaluation ----------------------------------------------------
+
+    def signal(self, node, X, boolean=False):
+        """
+        Robustness of `node` at every time step, (K, T). With `boolean` the
+        atoms give +1 where they hold and -1 where they fail instead, so the
+        same min/max operators yield the Boolean semantics: > 0 is satisfied.
+        """
+        kind = node[0]
+        if kind == 'atom':
+            rho = X[..., :self.nStates] @ node[1] + node[2]
+            # Overflowed states never violate, as in TrajSafety
+            rho = np.where(np.isnan(rho), np.inf, rho)
+            if boolean:
+                return np.where(rho > 0 if node[3] else rho >= 0, 1.0, -1.0)
+            return rho
+        if kind == 'const':
+            return np.full(X.shape[:2], node[1])
+        if kind == 'not':
+            return -self.signal(node[1], X, boolean)
+        if kind == 'and':
+            return np.minimum.reduce([self.signal(n, X, boolean) for n in node[1]])
+        if kind == 'or':
+            return np.maximum.reduce([self.signal(n, X, boolean) for n in node[1]])
+        if kind == 'implies':
+            return np.maximum(-self.signal(node[1], X, boolean), self.signal(node[2], X, boolean))
+        if kind == 'G':
+            return slidingMin(self.signal(node[3], X, boolean), node[1], node[2])
+        if kind == 'F':
+            return slidingMax(self.signal(node[3], X, boolean), node[1], node[2])
+        if kind == 'U':
+            return self.until(self.signal(node[3], X, boolean), self.signal(node[4], X, boolean),
+                              node[1], node[2])
+        raise ValueError(f"STL: unknown node {kind!r}")
+
+    @staticmethod
+    def until(phi, psi, a, b):
+        """
+        rho(t) = max over k in [a, b] of min(psi(t+k), min of phi(t..t+k)).
+        The unbounded until is a backward recursion over t. A bounded one is
+        rewritten as G[0,a] phi & F[a,b] psi & F[a,a] (phi U psi): a sliding
+        min, a sliding max and a shift of the unbounded until, so it also
+        costs O(T) whatever the bounds.
+        """
+        K, T = phi.shape
+        u = np.empty((K, T + 1))
+        u[:, T] = -np.inf
+        for t in range(T - 1, -1, -1):
+            u[:, t] = np.minimum(phi[:, t], np.maximum(psi[:, t], u[:, t + 1]))
+        if b is not None:
+            return np.minimum(np.minimum(slidingMin(phi, 0, a), slidingMax(psi, a, b)),
+                              shift(u[:, :T], a, -np.inf))
+        if a == 0:
+            return u[:, :T]
+        return np.minimum(slidingMin(phi, 0, a - 1), shift(u[:, :T], a, -np.inf))
+
+    def robustness(self, trajs):
+        """(K,) robustness at t=0 of a (K, T, n) batch; < 0 is a violation, 0 may be either."""
+        return self.signal(self.root, np.asarray(trajs, dtype=float))[:, 0]
+
+    def getViolations(self, trajs):
+        """
+        For a (K, T, n) trajectory array, the first violating time step of
+        every trajectory (-1 if it satisfies the specification). Under a
+        top-level G (or a conjunction of them) that is the first step the
+        inner formula fails; other violated specifications report 0.
+        """
+        X = np.asarray(trajs, dtype=float)
+        return self.firstViolation(self.root, X)
+
+    def firstViolation(self, node, X):
+        K, T = X.shape[:2]
+        if node[0] == 'and':
+            times = np.stack([self.firstViolation(n, X) for n in node[1]])
+            times = np.where(times < 0, T, times).min(axis=0)
+            return np.where(times < T, times, -1)
+        if node[0] == 'G':
+            _, a, b, child = node
+            bad = self.signal(child, X, boolean=True) < 0
+            bad[:, :min(a, T)] = False
+            if b is not None:
+                bad[:, b + 1:] = False
+            return np.where(bad.any(axis=1), np.argmax(bad, axis=1), -1)
+        return np.where(self.signal(node, X, boolean=True)[:, 0] < 0, 0, -1)
+
+    def getSafeUnsafeTrajs(self, trajs):
+        if isinstance(trajs, np.ndarray):
+            tViolate = self.getViolations(trajs)
+            return trajs[tViolate < 0], trajs[tViolate >= 0]
+        safeTrajs = []
+        unsafeTrajs = []
+        if not trajs:
+            return safeTrajs, unsafeTrajs
+        try:
+            tViolate = self.getViolations(trajs)
+        except ValueError:
+            # Ragged input (truncated trajectories): check one by one
+            tViolate = [self.getViolations(np.asarray(traj, dtype=float)[None])[0] for traj in trajs]
+        for traj, tv in zip(trajs, tViolate):
+            if tv < 0:
+                safeTrajs.append(traj)
+            else:
+                unsafeTrajs.append(traj)
+        return safeTrajs, unsafeTrajs
+
+    @staticmethod
+    def conjuncts(node):
+        if node[0] == 'and':
+            return [c for n in node[1] for c in STL.conjuncts(n)]
+        return [node]
+
+    @staticmethod
+    def findInvariants(root):
+        """
+        The (a, b, atoms) of every top-level G[a,b] whose body is, or is a
+        conjunction including, linear atoms: each atom must hold at every
+        step in [a, b], so one log box can be checked against it. Also
+        returns whether these cover the whole formula.
+        """
+        invariants, complete = [], True
+        for node in STL.conjuncts(root):
+            body = STL.conjuncts(node[3]) if node[0] == 'G' else []
+            atoms = [n for n in body if n[0] == 'atom']
+            if atoms:
+                invariants.append((node[1], node[2], atoms))
+            complete = complete and bool(body) and len(atoms) == len(body)
+        return invariants, complete
+
+    def getLogViolations(self, lo, hi, times):
+        """
+        For (R, n) log box bounds at times (R,), a (R,) mask of the boxes
+        that meet the set where an invariant atom fails at their time step,
+        using the box corner that minimises the atom's robustness.
+        """
+        lo = np.asarray(lo, dtype=float)[:, :self.nStates]
+        hi = np.asarray(hi, dtype=float)[:, :self.nStates]
+        times = np.asarray(times)
+        bad = np.zeros(len(times), dtype=bool)
+        for a, b, atoms in self.invariants:
+            inside = (times >= a) & (times <= b if b is not None else True)
+            for _, coeffs, const, strict in atoms:
+                rho = lo @ np.maximum(coeffs, 0) + hi @ np.minimum(coeffs, 0) + const
+                bad |= inside & ((rho <= 0) if strict else (rho < 0))
+        return bad
+
+    def getSafeUnsafeLog(self, log):
+        if isinstance(log, LogFile):
+            bad = self.getLogViolations(log.lo, log.hi, log.times)
+            return log.subset(~bad), log.subset(bad)
+        log = list(log)
+        if not log:
+            return [], []
+        lo = [[iv[0] for iv in box] for box, _ in log]
+        hi = [[iv[1] for iv in box] for box, _ in log]
+        bad = self.getLogViolations(lo, hi, [t for _, t in log])
+        return ([sample for sample, b in zip(log, bad) if not b],
+                [sample for sample, b in zip(log, bad) if b])
+
+    def reportLogViolations(self, unsafeSamps):
+        """Print one summary line for the log records that violate an invariant atom."""
+        if not self.logComplete:
+            note("Log records are only checked against the G atoms of the specification; "
+                 "the rest of it is checked on trajectories")
+        if not unsafeSamps:
+            return
+        box, sample_time = unsafeSamps[0]
+        print(
+            f"{msg.FAIL}[Violated]{msg.ENDC} {len(unsafeSamps)} log record(s) meet the set where "
+            f"{self.text!r} fails; first at t={sample_time} (box: {box})"
+        )
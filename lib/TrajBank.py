@@ -0,0 +1,210 @@
+import os,sys
+import json
+import hashlib
+import fcntl
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+from Parameters import *
+
+import numpy as np
+
+
+def fileDigest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class TrajBank:
+    """
+    Persistent store of simulated trajectories of one model, reused across
+    the logs checked against it. A bank directory holds:
+
+        meta.json   model, mode, region, horizon T, grid and seed
+        init.bin    (N, n) float64 initial states, the spatial index
+        trajs.bin   (N, T, n) float64 trajectories, memory-mapped
+
+    Both .bin files are append-only. The region is cut into a grid of
+    cells, and the trajectories of each cell start at independent uniform
+    points of that cell. A query for a box draws, per batch, a multinomial
+    number of trajectories from every cell in proportion to the volume the
+    cell shares with the box, and takes that many unused trajectories of
+    the cell that start inside the box. The drawn initial states are thus
+    uniform over the box, as if simulated afresh. Cells that run out are
+    topped up with new trajectories, simulated uniformly over the whole cell
+    so that the cell stays uniform for later queries: enough for the
+    missing ones to start inside the box in expectation, and at least
+    BANK_TOPUP.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.lo = np.array(self.meta['lo'], dtype=float)
+        self.hi = np.array(self.meta['hi'], dtype=float)
+        self.T = int(self.meta['T'])
+        self.n = len(self.lo)
+        self.grid = tuple(self.meta['grid'])
+        self.load()
+
+    @staticmethod
+    def create(path, mode, model_path, region, T, seed=None):
+        """Start an empty bank over the box `region` for T-step trajectories."""
+        os.makedirs(path, exist_ok=True)
+        lo = [float(dim[0]) for dim in region]
+        hi = [float(dim[1]) for dim in region]
+        # Roughly BANK_CELLS cells, split evenly over the dimensions the region is not flat in
+        nWide = sum(1 for l, h in zip(lo, hi) if h > l)
+        perDim = max(1, int(BANK_CELLS ** (1 / max(nWide, 1))))
+        meta = {
+            'mode': mode,
+            'model_path': os.path.abspath(model_path),
+            'model_sha256': fileDigest(model_path),
+            'lo': lo, 'hi': hi, 'T': int(T),
+            'grid': [perDim if h > l else 1 for l, h in zip(lo, hi)],
+            'seed': int(np.random.SeedSequence(seed).entropy),
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+        for name in ('init.bin', 'trajs.bin'):
+            open(os.path.join(path, name), 'ab').close()
+        return TrajBank(path)
+
+    def load(self):
+        # Rows whose trajectory is only partly written (an interrupted append) are ignored
+        initPath, trajPath = os.path.join(self.path, 'init.bin'), os.path.join(self.path, 'trajs.bin')
+        rowBytes = self.T * self.n * 8
+        N = min(os.path.getsize(initPath) // (self.n * 8), os.path.getsize(trajPath) // rowBytes)
+        self.N = N
+        self.init = np.fromfile(initPath, dtype=np.float64, count=N * self.n).reshape(N, self.n)
+        self.trajs = (np.memmap(trajPath, dtype=np.float64, mode='r', shape=(N, self.T, self.n))
+                      if N else np.empty((0, self.T, self.n)))
+        self.cells = self.cellOf(self.init)
+
+    def matches(self, mode, model_path):
+        """Whether the bank was simulated from this model file, unchanged since."""
+        return self.meta['mode'] == mode and self.meta['model_sha256'] == fileDigest(model_path)
+
+    def cellOf(self, points):
+        g = np.array(self.grid)
+        width = np.where(self.hi > self.lo, self.hi - self.lo, 1.0)
+        idx = np.floor((points - self.lo) / width * g).astype(int)
+        idx = np.clip(idx, 0, g - 1)
+        return np.ravel_multi_index(idx.T, self.grid) if len(points) else np.empty(0, dtype=int)
+
+    def cellBox(self, cell):
+        idx = np.array(np.unravel_index(cell, self.grid))
+        width = (self.hi - self.lo) / np.array(self.grid)
+        return self.lo + idx * width, np.where(idx == np.array(self.grid) - 1, self.hi, self.lo + (idx + 1) * width)
+
+    def append(self, system, cell, K):
+        """Simulate K trajectories from uniform points of `cell` and store them."""
+        lo, hi = self.cellBox(cell)
+        with open(os.path.join(self.path, 'meta.json')) as lock:
+            # Several checks may grow the same bank at once
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.load()
+                # The stream depends only on the bank contents, so banks grow reproducibly
+                rng, system.rng = system.rng, np.random.default_rng(
+                    np.random.SeedSequence(self.meta['seed'], spawn_key=(int(cell), self.N)))
+                try:
+                    states = system.rng.uniform(lo, hi, size=(K, self.n))
+                    trajs = system.getTrajsFrom(states, self.T)
+                finally:
+                    system.rng = rng
+                with open(os.path.join(self.path, 'trajs.bin'), 'ab') as f:
+                    f.write(np.ascontiguousarray(trajs, dtype=np.float64).tobytes())
+                with open(os.path.join(self.path, 'init.bin'), 'ab') as f:
+                    f.write(np.ascontiguousarray(states, dtype=np.float64).tobytes())
+                self.load()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def fill(self, system, K):
+        """Add about K trajectories, spread evenly over the cells."""
+        nCells = int(np.prod(self.grid))
+        for cell in range(nCells):
+            self.append(system, cell, K // nCells + (1 if cell < K % nCells else 0))
+
+    def serves(self, box):
+        """
+        Whether queries for `box` can be answered: it lies in the region, and
+        is flat only where the region is (no bank point lands exactly on a
+        flat side of a wider region).
+        """
+        lo = np.array([dim[0] for dim in box], dtype=float)
+        hi = np.array([dim[1] for dim in box], dtype=float)
+        if len(lo) != self.n or np.any(lo < self.lo) or np.any(hi > self.hi):
+            return False
+        return bool(np.all((hi > lo) | (self.hi <= self.lo)))
+
+    def query(self, box):
+        return BankQuery(self, box)
+
+
+class BankQuery:
+    """
+    Draws from a TrajBank for one initial box. Every bank trajectory is
+    used at most once per query.
+    """
+
+    def __init__(self, bank, box):
+        self.bank = bank
+        self.lo = np.array([dim[0] for dim in box], dtype=float)
+        self.hi = np.array([dim[1] for dim in box], dtype=float)
+        first, last = bank.cellOf(self.lo[None])[0], bank.cellOf(self.hi[None])[0]
+        first, last = np.unravel_index(first, bank.grid), np.unravel_index(last, bank.grid)
+        ranges = [np.arange(a, b + 1) for a, b in zip(first, last)]
+        self.cellIds = np.ravel_multi_index([ix.ravel() for ix in np.meshgrid(*ranges, indexing='ij')],
+                                            bank.grid)
+        # Volume each cell shares with the box, over the dimensions the box is not flat in
+        flat = self.hi <= self.lo
+        vols = []
+        for cell in self.cellIds:
+            clo, chi = bank.cellBox(cell)
+            side = np.minimum(chi, self.hi) - np.maximum(clo, self.lo)
+            vols.append(np.prod(np.where(flat, 1.0, np.maximum(side, 0.0))))
+        vols = np.array(vols)
+        self.p = vols / vols.sum()
+        # Share of each cell that lies in the box: the fraction of a top-up that starts inside it
+        cellVols = []
+        for cell in self.cellIds:
+            clo, chi = bank.cellBox(cell)
+            cellVols.append(np.prod(np.where(flat, 1.0, chi - clo)))
+        self.share = dict(zip(self.cellIds, vols / np.maximum(cellVols, 1e-300)))
+        self.rows = {}
+        self.used = {}
+        self.nNew = 0
+
+    def inside(self, cell, start=0):
+        bank = self.bank
+        rows = start + np.flatnonzero(bank.cells[start:] == cell)
+        pts = bank.init[rows]
+        return rows[np.all((pts >= self.lo) & (pts <= self.hi), axis=1)]
+
+    def draw(self, rng, K, system, T):
+        """(K, T, n) trajectories whose initial states are uniform over the box."""
+        counts = rng.multinomial(K, self.p)
+        picked = []
+        for cell, c in zip(self.cellIds, counts):
+            if c == 0:
+                continue
+            if cell not in self.rows:
+                self.rows[cell], self.used[cell] = self.inside(cell), 0
+            while len(self.rows[cell]) - self.used[cell] < c:
+                # Out of unused trajectories in this cell: grow it, keeping it uniform
+                missing = c - (len(self.rows[cell]) - self.used[cell])
+                seen = self.bank.N
+                self.bank.append(system, cell, max(BANK_TOPUP, int(np.ceil(missing / self.share[cell]))))
+                self.nNew += self.bank.N - seen
+                self.rows[cell] = np.concatenate([self.rows[cell], self.inside(cell, seen)])
+            u = self.used[cell]
+            picked.append(self.rows[cell][u:u + c])
+            self.used[cell] = u + c
+        rows = np.sort(np.concatenate(picked))
+        return np.asarray(self.bank.trajs[rows][:, :T])
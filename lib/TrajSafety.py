@@ -4,25 +4,41 @@ PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
 sys.path.append(PROJECT_ROOT)
 from Parameters import msg
 
+import numpy as np
+from lib.LogFile import LogFile
+
+# Printable form of each operator
+OP_SYMBOLS = {'ge': '>=', 'le': '<=', 'gt': '>', 'lt': '<'}
+
 class TrajSafety:
     """
     Safety checker for trajectories and logs that supports multiple constraints.
     A trajectory or log sample is considered safe only if **all** constraints
-    are satisfied.  Each constraint is a tuple (state_idx, op, const).
+    are satisfied.  Each constraint is a tuple (state_idx, op, const), or
+    ({state_idx: coeff, ...}, op, const) for a general linear constraint
+    over several states, where the left-hand side is sum(coeff * state).
 
     Supported operators:
-        - 'ge' : state >= const is unsafe
-        - 'le' : state <= const is unsafe
-        - 'gt' : state  > const is unsafe
-        - 'lt' : state  < const is unsafe
+        - 'ge' : lhs >= const is unsafe
+        - 'le' : lhs <= const is unsafe
+        - 'gt' : lhs  > const is unsafe
+        - 'lt' : lhs  < const is unsafe
+
+    The constraints are compiled once into unsafe half-spaces A x >= b
+    (A x > b where strict), which are evaluated on whole (K, T, n)
+    trajectory batches and on all log boxes at once.
     """
 
+    # Every constraint is a property of single states, so it can be checked step by step
+    stepwise = True
+
     def __init__(self, unsafeConstraint):
         """
         Initialize with either a single constraint [state_idx, op, const],
         or a list of such constraints.  Constraints can also be provided
         as dictionaries with keys 'state', 'state_idx', 'op', 'inequal',
-        and 'const'/'value'.
+        and 'const'/'value', or 'coeffs' (a {state_idx: coeff} dict or a
+        list with one coefficient per state) for a linear constraint.
         """
         constraints = []
         # If the first element is a list/tuple/dict, treat the whole arg as multiple constraints
@@ -33,9 +49,9 @@ class TrajSafety:
 
         for item in items:
             if isinstance(item, dict):
-                st = item.get('state_idx') or item.get('state')
-                op = item.get('op') or item.get('inequal')
-                val = item.get('const') or item.get('value')
+                st = TrajSafety.first(item, 'coeffs', 'state_idx', 'state')
+                op = TrajSafety.first(item, 'op', 'inequal')
+                val = TrajSafety.first(item, 'const', 'value')
                 if st is None or op is None or val is None:
                     raise ValueError(f"Constraint dict {item!r} must define state, op, and const")
             else:
@@ -46,15 +62,107 @@ class TrajSafety:
                         f"Constraint {item!r} is not in a recognized format. "
                         "Expected a 3‑tuple/list or a dict with appropriate keys."
                     )
-            constraints.append((int(st), op, float(val)))
+            if op not in OP_SYMBOLS:
+                raise ValueError(f"Constraint {item!r} has unknown operator {op!r}")
+            if isinstance(st, dict):
+                st = {int(i): float(a) for i, a in st.items()}
+            elif isinstance(st, (list, tuple)):
+                st = {i: float(a) for i, a in enumerate(st) if a != 0}
+            else:
+                st = int(st)
+            constraints.append((st, op, float(val)))
         self.constraints = constraints
+        self.compile()
+
+    @staticmethod
+    def first(item, *keys):
+        for key in keys:
+            if item.get(key) is not None:
+                return item[key]
+        return None
+
+    @staticmethod
+    def describe(constraint):
+        st, op, const = constraint
+        if isinstance(st, dict):
+            lhs = " + ".join(f"{a}*state[{i}]" for i, a in sorted(st.items()))
+        else:
+            lhs = f"state[{st}]"
+        return f"{lhs} {OP_SYMBOLS[op]} {const}"
+
+    def compile(self):
+        """
+        Build the coefficient matrix A (m, n), bound vector b (m,) and
+        strictness flags (m,) such that constraint j is violated by x exactly
+        when A[j] @ x >= b[j] (> for strict constraints).
+        """
+        idxs = []
+        for st, _, _ in self.constraints:
+            idxs += list(st) if isinstance(st, dict) else [st]
+        self.nStates = max(idxs) + 1 if idxs else 0
+        m = len(self.constraints)
+        self.A = np.zeros((m, self.nStates))
+        self.b = np.zeros(m)
+        self.strict = np.zeros(m, dtype=bool)
+        for j, (st, op, const) in enumerate(self.constraints):
+            coeffs = st if isinstance(st, dict) else {st: 1.0}
+            # 'le'/'lt' bound the left-hand side from above: negate to get the >= form
+            sign = 1.0 if op in ('ge', 'gt') else -1.0
+            for i, a in coeffs.items():
+                self.A[j, i] += sign * a
+            self.b[j] = sign * const
+            self.strict[j] = op in ('gt', 'lt')
+
+    def violated(self, lhs):
+        # lhs[..., j] = A[j] @ x; nan never violates, as in the scalar comparisons
+        return np.where(self.strict, lhs > self.b, lhs >= self.b)
+
+    def getViolations(self, trajs):
+        """
+        For a (K, T, n) trajectory array, return the first violating time step
+        of every trajectory (-1 if it satisfies all constraints).
+        """
+        trajs = np.asarray(trajs, dtype=float)
+        lhs = trajs[..., :self.nStates] @ self.A.T
+        bad = self.violated(lhs).any(axis=-1)
+        return np.where(bad.any(axis=1), np.argmax(bad, axis=1), -1)
+
+    def robustness(self, trajs):
+        """
+        (K,) robustness margin of a (K, T, n) batch: the smallest distance
+        b - A x to an unsafe half-space over the run, <= 0 once unsafe. nan
+        where a state overflowed.
+        """
+        trajs = np.asarray(trajs, dtype=float)
+        with np.errstate(invalid='ignore'):
+            return (self.b - trajs[..., :self.nStates] @ self.A.T).min(axis=(1, 2))
+
+    def getLogViolations(self, lo, hi):
+        """
+        For (R, n) log box bounds, return a (R,) mask of the boxes that meet
+        an unsafe half-space, i.e. whose maximum of A[j] @ x over the box
+        violates some constraint.
+        """
+        lo = np.asarray(lo, dtype=float)[:, :self.nStates]
+        hi = np.asarray(hi, dtype=float)[:, :self.nStates]
+        lhs = hi @ np.maximum(self.A, 0).T + lo @ np.minimum(self.A, 0).T
+        return self.violated(lhs).any(axis=-1)
 
     def getSafeUnsafeTrajs(self, trajs):
+        if isinstance(trajs, np.ndarray):
+            tViolate = self.getViolations(trajs)
+            return trajs[tViolate < 0], trajs[tViolate >= 0]
         safeTrajs = []
         unsafeTrajs = []
-        for traj in trajs:
-            safeFlag, _ = self.isTrajSafe(traj)
-            if safeFlag:
+        if not trajs:
+            return safeTrajs, unsafeTrajs
+        try:
+            tViolate = self.getViolations(trajs)
+        except ValueError:
+            # Ragged input (truncated trajectories): check one by one
+            tViolate = [self.isTrajSafe(traj)[1] for traj in trajs]
+        for traj, tv in zip(trajs, tViolate):
+            if tv < 0:
                 safeTrajs.append(traj)
             else:
                 unsafeTrajs.append(traj)
@@ -72,39 +180,27 @@ class TrajSafety:
         Returns (True, -1) if all constraints are satisfied at every time step;
         otherwise returns (False, t) where t is the index of the first violating time step.
         """
-        for t, state_vec in enumerate(traj):
-            for (st_idx, op, const) in self.constraints:
-                val = state_vec[st_idx]
-                if op == 'ge' and val >= const:
-                    """ print(
-                        f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] >= {const} at time step {t} (value: {val})"
-                    ) """
-                    return False, t
-                elif op == 'le' and val <= const:
-                    """ print(
-                        f"[{msg.FAIL}Violated]{msg.ENDC} state[{st_idx}] <= {const} at time step {t} (value: {val})"
-                    ) """
-                    return False, t
-                elif op == 'gt' and val > const:
-                    """ print(
-                        f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] > {const} at time step {t} (value: {val})"
-                    ) """
-                    return False, t
-                elif op == 'lt' and val < const:
-                    """ print(
-                        f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] < {const} at time step {t} (value: {val})"
-                    ) """
-                    return False, t
-        return True, -1
+        t = int(self.getViolations(np.asarray(traj, dtype=float)[None])[0])
+        if t < 0:
+            return True, -1
+        return False, t
 
     def getSafeUnsafeLog(self, log):
+        if isinstance(log, LogFile):
+            # Columnar log: split it without building (box, t) records
+            bad = self.getLogViolations(log.lo, log.hi)
+            return log.subset(~bad), log.subset(bad)
         safeSamps = []
         unsafeSamps = []
-        for sample in log:
-            if self.isSampleSafe(sample):
-                safeSamps.append(sample)
-            else:
+        if not log:
+            return safeSamps, unsafeSamps
+        lo = [[iv[0] for iv in box] for box, _ in log]
+        hi = [[iv[1] for iv in box] for box, _ in log]
+        for sample, bad in zip(log, self.getLogViolations(lo, hi)):
+            if bad:
                 unsafeSamps.append(sample)
+            else:
+                safeSamps.append(sample)
         return safeSamps, unsafeSamps
 
     def isLogSafe(self, log):
@@ -118,31 +214,21 @@ class TrajSafety:
         Return True if all constraints are satisfied for this log sample.
         A sample is (box, t) where box is a list of [lo, hi] for each state.
         """
-        box, sample_time = sample[0], sample[1]
-        for (st_idx, op, const) in self.constraints:
-            lo, hi = box[st_idx]
-            if op == 'ge' and hi >= const:
-                print(
-                    f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] >= {const} in log record at t={sample_time} "
-                    f"(interval: [{lo}, {hi}])"
-                )
-                return False
-            elif op == 'le' and lo <= const:
-                print(
-                    f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] <= {const} in log record at t={sample_time} "
-                    f"(interval: [{lo}, {hi}])"
-                )
-                return False
-            elif op == 'gt' and hi > const:
-                print(
-                    f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] > {const} in log record at t={sample_time} "
-                    f"(interval: [{lo}, {hi}])"
-                )
-                return False
-            elif op == 'lt' and lo < const:
-                print(
-                    f"{msg.FAIL}[Violated]{msg.ENDC} state[{st_idx}] < {const} in log record at t={sample_time} "
-                    f"(interval: [{lo}, {hi}])"
-                )
-                return False
-        return True
\ No newline at end of file
+        box = sample[0]
+        lo = [[iv[0] for iv in box]]
+        hi = [[iv[1] for iv in box]]
+        return not self.getLogViolations(lo, hi)[0]
+
+    def reportLogViolations(self, unsafeSamps):
+        """Print one summary line for the log records that meet the unsafe set."""
+        if not unsafeSamps:
+            return
+        box, sample_time = unsafeSamps[0]
+        lo = np.array([[iv[0] for iv in box]])
+        hi = np.array([[iv[1] for iv in box]])
+        hits = [self.describe(con) for con in self.constraints
+                if TrajSafety([con]).getLogViolations(lo, hi)[0]]
+        print(
+            f"{msg.FAIL}[Violated]{msg.ENDC} {len(unsafeSamps)} log record(s) meet the unsafe set; "
+            f"first at t={sample_time} ({', '.join(hits)}, box: {box})"
+        )
@@ -3,13 +3,59 @@ import os,sys,copy
 PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
 sys.path.append(PROJECT_ROOT)
 
+import numpy as np
+from lib.LogFile import LogFile
+
 
 class TrajValidity:
 
     def __init__(self,log):
         self.log=log
-    
-    def getValTrajs(self,trajs):
+        # Log as arrays: record times (R,), lower and upper bounds (R, n)
+        if isinstance(log,LogFile):
+            # Columnar (possibly memory-mapped) log: use its arrays as they are
+            self.times,self.lo,self.hi=log.times,log.lo,log.hi
+        else:
+            self.times=np.array([int(t) for _,t in log],dtype=int)
+            self.lo=np.array([[iv[0] for iv in box] for box,_ in log],dtype=float)
+            self.hi=np.array([[iv[1] for iv in box] for box,_ in log],dtype=float)
+        # Record indices in time order, for checking records while simulating
+        self.order=np.argsort(self.times,kind='stable')
+
+    def getValMask(self,trajs,rejections=None):
+        """
+        Validate a (K, T, n) trajectory array against every log record at once.
+        Returns (mask, firstFail): mask[k] is True if trajectory k lies inside
+        every log box, and firstFail[k] is the index of the first log record it
+        misses (-1 for valid trajectories). The rejections are added to
+        `rejections` (a RejectionProfile) when one is given.
+        """
+        samples=trajs[:,self.times,:]
+        # Written so that nan (overflowed) states are never inside a box
+        inBox=(samples>=self.lo)&(samples<=self.hi)
+        inside=np.all(inBox,axis=2)
+        if rejections is not None:
+            rejections.addBatch(self.order,inside,~inBox)
+        mask=inside.all(axis=1)
+        firstFail=np.where(mask,-1,np.argmin(inside,axis=1))
+        return (mask,firstFail)
+
+    def getValTrajs(self,trajs,rejections=None):
+
+        if isinstance(trajs,np.ndarray):
+            mask,_=self.getValMask(trajs,rejections)
+            return (trajs[mask],trajs[~mask])
+
+        # List-of-trajectories adapter; ragged input (truncated trajectories) uses the scalar check
+        try:
+            arr=np.asarray(trajs,dtype=float)
+        except ValueError:
+            arr=None
+        if arr is not None and arr.ndim==3:
+            mask,_=self.getValMask(arr,rejections)
+            valTrajs=[traj for traj,m in zip(trajs,mask) if m]
+            inValTrajs=[traj for traj,m in zip(trajs,mask) if not m]
+            return (valTrajs,inValTrajs)
 
         valTrajs=[]
         inValTrajs=[]
@@ -33,7 +79,8 @@ class TrajValidity:
             sm=traj[tk]
             isSampVal=True
             for i in range(nState):
-                if sm[i]<self.log[k][0][i][0] or sm[i]>self.log[k][0][i][1]:
+                # Written so that nan (overflowed) states are never inside a box
+                if not (self.log[k][0][i][0]<=sm[i]<=self.log[k][0][i][1]):
                     isSampVal=False
                     break
             if isSampVal==False:
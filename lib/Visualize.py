@@ -242,6 +242,43 @@ class Visualize:
         plt.clf()
 
 
+    def vizRejections(self, rows, save=False, name="Untitled"):
+        """
+        Rejection profile of a safety check (lib/RejectionProfile.py): the
+        conditional acceptance rate of every log record over time, and the
+        rejections it caused per state dimension.
+        """
+        if self.viz == False:
+            print(f"{self.msg.WARNING}[WARN]{self.msg.ENDC} Graphical visualization disabled. "
+            f"Set {self.msg.BOLD}VIZ=True{self.msg.ENDC} to enable.")
+            return
+
+        reached = [row for row in rows if row['reached']]
+        t = [row['t'] for row in reached]
+        fig, (top, bottom) = plt.subplots(2, 1, sharex=True, figsize=(9, 6))
+
+        top.plot(t, [row['acceptance'] for row in reached], color='black', marker='.', linewidth=1)
+        top.set_ylabel("Acceptance", fontsize=14, fontweight='bold')
+        top.set_ylim(-0.05, 1.05)
+
+        names = list(reached[0]['dims']) if reached else []
+        for i, dim in enumerate(names):
+            label = self.stateLabel(i) if self.state_names else dim
+            bottom.plot(t, [row['dims'][dim] for row in reached], marker='.', linewidth=1, label=label)
+        bottom.set_xlabel("Time", fontsize=14, fontweight='bold')
+        bottom.set_ylabel("Rejections", fontsize=14, fontweight='bold')
+        if names:
+            bottom.legend()
+
+        if save:
+            out = os.path.join(self.path, f"{name}.pdf")
+            fig.savefig(out, format="pdf", bbox_inches="tight")
+            plt.show()
+        else:
+            plt.show()
+        plt.close(fig)
+
+
     def statePairs(self, nStates):
         return list(combinations(range(nStates), 2))
 
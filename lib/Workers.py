@@ -0,0 +1,86 @@
+import os,sys
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+sys.path.append(PROJECT_ROOT)
+
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+# One System per worker process, built once by the pool initializer
+worker_sys = None
+worker_ctx = None
+
+
+def initWorker(sysArgs, ctx):
+    global worker_sys, worker_ctx
+    from System import System
+    worker_sys = System(*sysArgs)
+    worker_ctx = ctx
+
+
+def callWorker(name, b):
+    # Dict results carry the metrics of this batch alone, for the parent to merge
+    worker_sys.metrics.reset()
+    res = getattr(worker_sys, name)(b, **worker_ctx)
+    if isinstance(res, dict):
+        res['metrics'] = worker_sys.metrics.state()
+    return res
+
+
+class WorkerPool:
+    """
+    Runs numbered batches of a System method across worker processes.
+    Every worker loads the model once; the per-run context (log, horizon,
+    seed sequence, ...) is shipped once through the pool initializer, so a
+    job is just (method name, batch index).
+    """
+
+    def __init__(self, sysArgs, nWorkers, ctx):
+        self.nWorkers = nWorkers
+        # spawn: TensorFlow and forked processes do not mix
+        self.executor = ProcessPoolExecutor(
+            max_workers=nWorkers,
+            mp_context=mp.get_context('spawn'),
+            initializer=initWorker,
+            initargs=(sysArgs, ctx),
+        )
+
+    def map(self, name, isFinal=None, nJobs=None):
+        """
+        Yield the results of batches 0, 1, 2, ... in batch order while keeping
+        a bounded number of batches in flight. When a result satisfies
+        isFinal, no batch after it can change the outcome, so later batches
+        are cancelled (or never submitted). Stopping the iteration cancels
+        whatever is still pending.
+        """
+        inFlight = {}
+        done = {}
+        nextJob = 0
+        nextOut = 0
+        lastJob = None if nJobs is None else nJobs - 1
+        try:
+            while lastJob is None or nextOut <= lastJob:
+                while len(inFlight) < 2 * self.nWorkers and (lastJob is None or nextJob <= lastJob):
+                    inFlight[self.executor.submit(callWorker, name, nextJob)] = nextJob
+                    nextJob += 1
+                if nextOut in done:
+                    yield done.pop(nextOut)
+                    nextOut += 1
+                    continue
+                finished, _ = wait(list(inFlight), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    b = inFlight.pop(fut)
+                    res = fut.result()
+                    done[b] = res
+                    if isFinal is not None and isFinal(res) and (lastJob is None or b < lastJob):
+                        lastJob = b
+                        for other, ob in list(inFlight.items()):
+                            if ob > b:
+                                other.cancel()
+                                inFlight.pop(other)
+        finally:
+            for fut in inFlight:
+                fut.cancel()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
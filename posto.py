@@ -4,13 +4,18 @@ Posto: scripts to generate logs, plot behaviour trajectories and check safety
 of trajectories.
 
 Usage:
-    posto.py behavior --log=<directory> --init=<initialSet> --timestamp=<T> --mode=<mode> --model_path=<model_path> [--states=<states>]
-    posto.py generateLog --log=<logfile> --init=<initialSet> --timestamp=<T> --mode=<mode> --model_path=<model_path> --prob=<prob> --dtlog=<dtlog> [--states=<states>]
-    posto.py checkSafety --log=<logfile> --mode=<mode> --model_path=<model_path> [--states=<states>] [--constraints=<constraints>]
+    posto.py behavior --log=<directory> --init=<initialSet> --timestamp=<T> --mode=<mode> --model_path=<model_path> [--states=<states>] [--workers=<N>] [--seed=<seed>] [--no-plot]
+    posto.py generateLog --log=<logfile> --init=<initialSet> --timestamp=<T> --mode=<mode> --model_path=<model_path> --prob=<prob> --dtlog=<dtlog> [--states=<states>] [--workers=<N>] [--seed=<seed>] [--no-plot]
+    posto.py checkSafety --log=<logfile> --mode=<mode> --model_path=<model_path> [--states=<states>] [--constraints=<constraints>] [--workers=<N>] [--seed=<seed>] [--bounded-memory] [--sampler=<sampler>] [--falsify] [--bank=<dir>] [--segment=<steps>] [--spec=<spec>] [--profile] [--report=<json>] [--quiet] [--time-budget=<sec>] [--sweep=<pairs>] [--no-plot]
+    posto.py monitor --log=<logfile> --mode=<mode> --model_path=<model_path> [--states=<states>] [--constraints=<constraints>] [--seed=<seed>] [--poll=<sec>] [--max-idle=<sec>]
+    posto.py convertLog --log=<logfile> --out=<outfile>
+    posto.py bank --bank=<dir> --init=<initialSet> --timestamp=<T> --mode=<mode> --model_path=<model_path> [--states=<states>] [--size=<N>] [--seed=<seed>]
 
 Options:
     --log=<directory or logfile>   For `behavior`, path to a directory where plots will be saved; an `img` folder will be created under this directory.
                                    For `generateLog` and `checkSafety`, path to the `.lg` file to write or read; plots are saved in an `img` folder next to the file.
+                                   A `.lgb` path uses the binary columnar log format instead of text.
+    --out=<outfile>                For `convertLog`, the converted log; `.lg` for text or `.lgb` for binary.
     --init=<initialSet>            Initial state set for trajectory sampling, e.g. "[0.8,1],[0.8,1]".  One [lo, hi] pair per dimension.
     --timestamp=<T>                Time horizon (integer ≥ 0) for the simulation.
     --mode=<mode>                  Either `equation` (use a JSON model) or `ann` (use a trained neural network `.h5`).
@@ -19,6 +24,23 @@ Options:
     --dtlog=<dtlog>                Time step between logged entries when generating a log (float ≥ 0).
     --states=<states>              Comma-separated list of state variable names.  Required for ann mode; optional for equation mode.
     --constraints=<constraints>    Safety constraints specification (JSON file or list).  Required for checkSafety in ann mode; optional otherwise.
+    --workers=<N>                  Number of worker processes used for trajectory sampling [default: 1].
+    --seed=<seed>                  Integer seed; a given seed gives the same verdict and counts on every run, whatever the number of workers.
+    --bounded-memory               Keep only counters and a fixed-size sample of trajectories for the plots, so memory does not grow with K.
+    --sampler=<sampler>            `iid` samples independent trajectories; `smc` splits trajectories at every log record, for logs few trajectories pass; screening only, it finds UNSAFE but never reports SAFE [default: iid].
+    --falsify                      Before sampling, search the initial box (and the model noise) for a valid unsafe trajectory; one found settles the verdict as UNSAFE.
+    --bank=<dir>                   Trajectory bank directory. `bank` creates it over --init (or adds to it); `checkSafety` draws its trajectories from it.
+    --segment=<steps>              Screening mode for long logs: check windows of about this many time steps independently (and in parallel with --workers), each from its own first log box.
+    --spec=<spec>                  STL specification checked instead of the safety constraints: a formula such as "G (y > 1 -> F[0,50] x < 0.5)", or a file holding one.
+    --profile                      For `checkSafety`, run under cProfile and tracemalloc and print the time spent in each phase; profile.prof and profile.txt are saved in img/profile next to the log.
+    --report=<json>                For `checkSafety`, write the verdict, the counts, the per-phase wall and CPU times and the counters to this JSON file.
+    --quiet                        For `checkSafety`, do not print a progress line after every batch.
+    --sweep=<pairs>                For `checkSafety`, decide several (B, c) pairs, given as "B:c,B:c,...", from one sample stream drawn up to the largest K.
+    --time-budget=<sec>            For `checkSafety`, stop sampling after the first batch that ends past this many seconds, and report the confidence reached; the verdict is UNDECIDED unless an unsafe trajectory was found.
+    --size=<N>                     For `bank`, number of trajectories to simulate into the bank [default: 10000].
+    --no-plot                      Skip all plots; matplotlib is then never imported.
+    --poll=<sec>                   For `monitor`, seconds between checks of the log for new records [default: 1].
+    --max-idle=<sec>               For `monitor`, stop after this many seconds without new records (default: run until Ctrl-C).
 
 Examples:
     # Plot random trajectories using an ANN model and save plots to ./plots/img
@@ -29,6 +51,16 @@ Examples:
 
     # Check safety of an existing log
     posto.py checkSafety --log=traj.lg --mode=ann --model_path=model.h5 --states=x,y --constraints=constraints.json
+
+    # Check a temporal property instead: whenever y exceeds 1, x drops below 0.5 within 50 steps
+    posto.py checkSafety --log=traj.lg --mode=equation --model_path=operator.json --spec="G (y > 1 -> F[0,50] x < 0.5)"
+
+    # Simulate a bank of trajectories once, then check many logs of the same model against it
+    posto.py bank --bank=banks/jet --init="[0.5,1.2],[0.5,1.2]" --timestamp=1000 --mode=equation --model_path=models/Jet.json
+    posto.py checkSafety --log=logs/Jet.lg --mode=equation --model_path=models/Jet.json --bank=banks/jet
+
+    # Follow a log that is still being written and update the verdict as records arrive
+    posto.py monitor --log=traj.lg --mode=equation --model_path=operator.json
 """
 
 from docopt import docopt
@@ -83,17 +115,32 @@ def parse_initset(init_str):
     return out
 
 
+def parse_pairs(pairs_str):
+    """Convert a string like "100000:0.9,100000:0.99" into a list of (B, c) pairs."""
+    out = []
+    for item in pairs_str.split(','):
+        try:
+            B_str, c_str = item.split(':')
+            B_f, c_f = float(B_str), float(c_str)
+        except ValueError:
+            raise ValueError(f"--sweep expects B:c pairs separated by commas, got {item.strip()!r}")
+        if B_f <= 0 or not 0 < c_f < 1:
+            raise ValueError(f"--sweep pair {item.strip()!r} needs B > 0 and 0 < c < 1")
+        out.append((B_f, c_f))
+    return out
+
+
 def require_path(path_str, flag_name="--log"):
-    """Ensure that path_str is a .lg file and its parent directory exists."""
+    """Ensure that path_str is a .lg/.lgb file and its parent directory exists."""
     if path_str is None or str(path_str).strip() == "":
         die(f"Missing {flag_name}.", hint=f"Provide a valid path via {flag_name}=<file>.")
     parent = os.path.dirname(os.path.abspath(path_str))
     if parent and not os.path.isdir(parent):
         die(f"Directory does not exist for {flag_name}: {parent!r}.",
             hint="Create the directory or change the path.")
-    if not str(path_str).endswith(".lg"):
+    if not str(path_str).endswith((".lg", ".lgb")):
         die(f"Invalid file type for {flag_name}: {path_str!r}.",
-            hint="The log file must use the .lg extension.")
+            hint="The log file must use the .lg (text) or .lgb (binary) extension.")
     return path_str
 
 
@@ -152,30 +199,55 @@ def require_model(model_str, mode):
 if __name__ == '__main__':
     args = docopt(__doc__)
 
+    # Log conversion needs no model
+    if args['convertLog']:
+        src = require_path(args['--log'], "--log")
+        dst = require_path(args['--out'], "--out")
+        try:
+            log = LogFile.read(src)
+            log.write(dst)
+            ok(f"Converted {len(log)} records: {src} -> {dst}")
+        except Exception as e:
+            die(f"Log conversion failed: {e!r}", hint="Check that the input is a valid .lg or .lgb log.")
+        sys.exit(0)
+
     # Extract common CLI values
     log_arg = args['--log']
     mode = require_mode(args['--mode'])
     model_path = require_model(args['--model_path'], mode)
     states = args['--states'].split(',') if args['--states'] else None
     constraints = args['--constraints'] if args['--constraints'] else None
+    workers = require_int(args['--workers'], "--workers", min_value=1)
+    seed = require_int(args['--seed'], "--seed", min_value=0) if args['--seed'] is not None else None
 
     # For ANN mode, require both state names and constraints
     if mode == 'ann':
         if not states:
             die("Missing --states for ann mode.", hint="Provide state names via --states=<name1,name2,...>.")
-        if args['checkSafety'] and not constraints:
+        if (args['checkSafety'] or args['monitor']) and not constraints and not args['--spec']:
             die("Missing --constraints for ann mode.", hint="Provide constraints via --constraints=<json or list>.")
 
     # Interpret --log depending on the command
     if args['behavior']:
         # Behavior uses a directory; no .lg suffix is required
         log = log_arg
+    elif args['bank']:
+        # The bank takes no log; plots would go next to the bank directory
+        if not args['--bank']:
+            die("Missing --bank.", hint="Provide a bank directory via --bank=<dir>.")
+        log = args['--bank']
+    elif args['monitor']:
+        # The monitored log may not exist yet, but it must be a text log
+        log = require_path(log_arg, "--log")
+        if not log.endswith(".lg"):
+            die("monitor follows text logs only.", hint="Use a .lg log file.")
     else:
         # generateLog and checkSafety require a .lg log file
         log = require_path(log_arg, "--log")
 
     # Create the System instance
-    my_sys = System(log, mode, model_path, states, constraints)
+    my_sys = System(log, mode, model_path, states, constraints, workers, seed, plot=not args['--no-plot'],
+                    spec=args['--spec'])
 
     # Dispatch to the appropriate command with consistent error handling
     if args['behavior']:
@@ -197,13 +269,60 @@ if __name__ == '__main__':
         except Exception as e:
             die(f"Log generation failed: {e!r}", hint="Check your inputs and file permissions.")
     elif args['checkSafety']:
+        sampler = args['--sampler'].strip().lower()
+        if sampler not in {"iid", "smc"}:
+            die(f"Invalid --sampler: {args['--sampler']!r}.", hint='Allowed values: "iid" or "smc"')
+        timeBudget = None
+        if args['--time-budget'] is not None:
+            if args['--segment'] is not None:
+                die("--time-budget does not apply to --segment.", hint="Drop one of the two options.")
+            timeBudget = require_float(args['--time-budget'], "--time-budget", min_value=0)
+        pairs = None
+        if args['--sweep'] is not None:
+            if args['--segment'] is not None:
+                die("--sweep does not apply to --segment.", hint="Drop one of the two options.")
+            if sampler == 'smc':
+                die("--sweep does not apply to --sampler=smc, which gives no (B, c) verdicts.",
+                    hint="Use --sampler=iid.")
+            try:
+                pairs = parse_pairs(args['--sweep'])
+            except ValueError as e:
+                die(str(e), hint='Example: --sweep="100000:0.6,100000:0.9,100000:0.99"')
         try:
-            my_sys.checkSafety()
+            if args['--segment'] is not None:
+                my_sys.checkSafetySegmented(require_int(args['--segment'], "--segment", min_value=1),
+                                            report=args['--report'], profile=args['--profile'])
+            elif pairs is not None:
+                my_sys.sweepSafety(pairs, bounded=args['--bounded-memory'], sampler=sampler, falsify=args['--falsify'],
+                                   bank=args['--bank'], quiet=args['--quiet'], report=args['--report'],
+                                   profile=args['--profile'], timeBudget=timeBudget)
+            else:
+                my_sys.checkSafety(bounded=args['--bounded-memory'], sampler=sampler, falsify=args['--falsify'],
+                                   bank=args['--bank'], quiet=args['--quiet'], report=args['--report'],
+                                   profile=args['--profile'], timeBudget=timeBudget)
             ok("Safety check completed.")
         except Exception as e:
             die(f"Safety check failed: {e!r}",
                 hint="Verify the log file exists and input parameters are correct.")
+    elif args['bank']:
+        init = parse_initset(args['--init'])
+        timestamp = require_int(args['--timestamp'], "--timestamp", min_value=1)
+        size = require_int(args['--size'], "--size", min_value=0)
+        try:
+            my_sys.buildBank(args['--bank'], init, timestamp, size)
+            ok("Trajectory bank updated.")
+        except Exception as e:
+            die(f"Building the trajectory bank failed: {e!r}", hint="Check your inputs and file permissions.")
+    elif args['monitor']:
+        poll = require_float(args['--poll'], "--poll", min_value=0)
+        max_idle = require_float(args['--max-idle'], "--max-idle", min_value=0) if args['--max-idle'] is not None else None
+        try:
+            my_sys.monitor(poll, max_idle)
+            ok("Monitoring stopped.")
+        except Exception as e:
+            die(f"Monitoring failed: {e!r}",
+                hint="Verify the log file and input parameters are correct.")
     else:
-        warn("No command provided. Use 'behavior', 'generateLog' or 'checkSafety'.")
+        warn("No command provided. Use 'behavior', 'generateLog', 'checkSafety', 'monitor' or 'bank'.")
         print(__doc__)
         sys.exit(1)
@@ -0,0 +1,57 @@
+import os,sys
+import json
+
+# Every module reads the project root from the environment when it is imported
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('POSTO_ROOT_DIR', PROJECT_ROOT)
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '3')
+sys.path.insert(0, PROJECT_ROOT)
+
+import numpy as np
+import pytest
+
+
+def root(*parts):
+    return os.path.join(PROJECT_ROOT, *parts)
+
+
+@pytest.fixture
+def shippedLog(tmp_path):
+    """
+    Copy a shipped log into tmp_path and return the copy's path, so the
+    img/ directory a check writes next to its log stays out of the tree.
+    """
+    def copy(*parts):
+        dst = tmp_path / parts[-1]
+        dst.write_bytes(open(root(*parts), 'rb').read())
+        return str(dst)
+    return copy
+
+
+@pytest.fixture
+def denseModel(tmp_path):
+    """
+    Write a Sequential Dense model as a Keras .h5 file, in the layout that
+    lib/DenseNet.py reads, from a list of (kernel, bias, activation). Needs
+    h5py only.
+    """
+    h5py = pytest.importorskip('h5py')
+
+    def write(layers, name='net.h5'):
+        path = str(tmp_path / name)
+        nIn = layers[0][0].shape[0]
+        cfgs = [{'class_name': 'InputLayer', 'config': {'batch_shape': [None, nIn]}}]
+        with h5py.File(path, 'w') as f:
+            weights = f.create_group('model_weights')
+            for k, (kernel, bias, activation) in enumerate(layers):
+                layer = f"dense_{k}"
+                cfgs.append({'class_name': 'Dense',
+                             'config': {'name': layer, 'activation': activation, 'use_bias': True}})
+                group = weights.create_group(layer)
+                group.attrs['weight_names'] = [f"{layer}/kernel".encode(), f"{layer}/bias".encode()]
+                group[f"{layer}/kernel"] = np.asarray(kernel, dtype=np.float32)
+                group[f"{layer}/bias"] = np.asarray(bias, dtype=np.float32)
+            f.attrs['model_config'] = json.dumps(
+                {'class_name': 'Sequential', 'config': {'name': 'sequential', 'layers': cfgs}})
+        return path
+    return write
@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pytest
+
+from lib.DenseNet import DenseNet
+from lib.ANN import ANN
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+CONTROLLER = os.path.join(PROJECT_ROOT, 'models', 'MountainCar_ReluController.h5')
+
+pytest.importorskip('h5py')
+
+
+def kerasPredict(path, x):
+    pytest.importorskip('tensorflow')
+    from lib.ANN import loadKeras
+    return np.asarray(loadKeras(path).predict(x, verbose=0))
+
+
+def saveSequential(path, inputShape, layers):
+    # layers: (kind, kwargs) pairs of tf.keras layers
+    tf = pytest.importorskip('tensorflow')
+    model = tf.keras.Sequential([tf.keras.Input(shape=inputShape)]
+                                + [getattr(tf.keras.layers, kind)(**kw) for kind, kw in layers])
+    rng = np.random.default_rng(0)
+    model.set_weights([rng.normal(0, 0.5, w.shape).astype(np.float32) for w in model.get_weights()])
+    model.save(path)
+    return path
+
+
+def testControllerMatchesKeras():
+    net = DenseNet.load(CONTROLLER)
+    assert net is not None
+    x = np.random.default_rng(0).uniform([-1.2, -0.07], [0.6, 0.07], (256, 2)).astype(np.float32)
+    np.testing.assert_allclose(net.predict(x), kerasPredict(CONTROLLER, x), rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize('activation', ['linear', 'relu', 'tanh', 'sigmoid'])
+def testActivationsMatchKeras(tmp_path, activation):
+    path = saveSequential(str(tmp_path / 'net.h5'), (3,), [
+        ('Dense', {'units': 16, 'activation': activation}),
+        ('Dropout', {'rate': 0.5}),
+        ('Dense', {'units': 8}),
+        ('Activation', {'activation': activation}),
+        ('Dense', {'units': 3, 'use_bias': False}),
+    ])
+    net = DenseNet.load(path)
+    assert net is not None
+    x = np.random.default_rng(1).normal(0, 2, (128, 3)).astype(np.float32)
+    np.testing.assert_allclose(net.predict(x), kerasPredict(path, x), rtol=1e-5, atol=1e-6)
+
+
+def testWindowedModelMatchesKeras(tmp_path):
+    path = saveSequential(str(tmp_path / 'window.h5'), (4, 2), [
+        ('Flatten', {}),
+        ('Dense', {'units': 16, 'activation': 'relu'}),
+        ('Dense', {'units': 2}),
+    ])
+    ann = ANN(path)
+    assert ann.net is not None
+    assert ann.windowSize(2) == 4
+    x = np.random.default_rng(2).normal(0, 1, (64, 4, 2)).astype(np.float32)
+    np.testing.assert_allclose(ann.net.predict(x), kerasPredict(path, x), rtol=1e-5, atol=1e-6)
+
+
+def testOtherModelsFallBackToKeras(tmp_path):
+    path = saveSequential(str(tmp_path / 'rnn.h5'), (4, 2), [
+        ('SimpleRNN', {'units': 4}),
+        ('Dense', {'units': 2}),
+    ])
+    assert DenseNet.load(path) is None
@@ -0,0 +1,86 @@
+import os
+import itertools
+
+import numpy as np
+
+from lib.ANN import ANN
+from lib.DenseNet import DenseNet
+from lib.LogFile import LogFile
+from lib.InitCover import InitCover
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+CONTROLLER = os.path.join(PROJECT_ROOT, 'models', 'MountainCar_ReluController.h5')
+INIT = [[0.0, 1.0], [0.0, 1.0]]
+
+
+def rotation(denseModel, seed=0):
+    """
+    A damped rotation plus a small ReLU term, x' = A x + W2 relu(W1 x + b1),
+    as a two-layer ReLU network (x = relu(x) - relu(-x) carries the linear part).
+    """
+    rng = np.random.default_rng(seed)
+    th = 0.3
+    A = 0.98 * np.array([[np.cos(th), -np.sin(th)], [np.sin(th), np.cos(th)]])
+    W1, b1, W2 = rng.normal(0, 0.3, (2, 8)), rng.normal(0, 0.1, 8), rng.normal(0, 0.05, (8, 2))
+    return ANN(denseModel([
+        (np.concatenate([np.eye(2), -np.eye(2), W1], axis=1), np.concatenate([np.zeros(4), b1]), 'relu'),
+        (np.concatenate([A.T, -A.T, W2], axis=0), np.zeros(2), 'linear'),
+    ]))
+
+
+def logAround(ann, start, times, eps):
+    # Boxes of half-width eps around one trajectory, after the whole initial box at t=0
+    ref = ann.getTrajs(np.array([start]), int(times[-1]) + 1)[0]
+    lo = np.array([[b[0] for b in INIT]] + [ref[t] - eps for t in times[1:]])
+    hi = np.array([[b[1] for b in INIT]] + [ref[t] + eps for t in times[1:]])
+    return LogFile(np.asarray(times), lo, hi)
+
+
+def testBoundsContainOutputs(denseModel):
+    rng = np.random.default_rng(1)
+    nets = [DenseNet.load(CONTROLLER)]
+    for activation in ('relu', 'tanh', 'sigmoid'):
+        nets.append(DenseNet.load(denseModel([
+            (rng.normal(0, 1, (3, 16)), rng.normal(0, 1, 16), activation),
+            (rng.normal(0, 1, (16, 16)), rng.normal(0, 1, 16), activation),
+            (rng.normal(0, 1, (16, 2)), rng.normal(0, 1, 2), 'linear'),
+        ], name=f"{activation}.h5")))
+    for net in nets:
+        c = rng.normal(0, 1, (200, net.nIn))
+        r = rng.uniform(0, 0.5, (200, net.nIn)) * rng.integers(0, 2, (200, net.nIn))
+        lo, hi = net.bounds(c - r, c + r)
+        # Corners of every box, then random inner points
+        for corner in itertools.product((0, 1), repeat=net.nIn):
+            out = net.predict(np.where(np.array(corner, dtype=bool), c + r, c - r))
+            assert (lo <= out).all() and (out <= hi).all()
+        for _ in range(20):
+            out = net.predict(rng.uniform(c - r, c + r))
+            assert (lo <= out).all() and (out <= hi).all()
+
+
+def testCoverKeepsEveryValidStart(denseModel):
+    ann = rotation(denseModel)
+    times = [0, 5, 10, 20]
+    log = logAround(ann, [0.5, 0.5], times, 0.05)
+    cover = InitCover.build(ann, INIT, log)
+    assert cover is not None and cover.fraction() < 0.1
+
+    rng = np.random.default_rng(2)
+    starts = rng.uniform(0, 1, (20000, 2))
+    trajs = ann.getTrajs(starts, times[-1] + 1)
+    valid = np.ones(len(starts), dtype=bool)
+    for t, lo, hi in zip(log.times, log.lo, log.hi):
+        valid &= ((trajs[:, t] >= lo) & (trajs[:, t] <= hi)).all(axis=1)
+    kept = ((starts[:, None] >= cover.lo) & (starts[:, None] <= cover.hi)).all(axis=2).any(axis=1)
+    assert valid.sum() > 100
+    assert not (valid & ~kept).any()
+
+    # Samples of the cover stay in the kept boxes
+    pts = cover.sample(rng, 1000)
+    assert ((pts[:, None] >= cover.lo) & (pts[:, None] <= cover.hi)).all(axis=2).any(axis=1).all()
+
+
+def testNothingPrunedGivesNone(denseModel):
+    ann = rotation(denseModel)
+    log = logAround(ann, [0.5, 0.5], [0, 5, 10], 10.0)
+    assert InitCover.build(ann, INIT, log) is None
@@ -0,0 +1,103 @@
+import os
+import math
+import operator
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from lib.Interval import Interval, INTERVAL_FUNCS
+from lib.Equation import Equation
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+
+# Domain of every interval function: the random intervals are drawn inside it
+DOMAINS = {'sin': (-20, 20), 'cos': (-20, 20), 'tan': (-1.5, 1.5), 'exp': (-30, 30),
+           'log': (1e-6, 1e6), 'sqrt': (0, 1e6), 'fabs': (-10, 10), 'abs': (-10, 10)}
+FUNCS = {'sin': math.sin, 'cos': math.cos, 'tan': math.tan, 'exp': math.exp,
+         'log': math.log, 'sqrt': math.sqrt, 'fabs': math.fabs, 'abs': abs}
+NP_FUNCS = {'sin': np.sin, 'cos': np.cos, 'tan': np.tan, 'exp': np.exp,
+            'log': np.log, 'sqrt': np.sqrt, 'fabs': np.fabs, 'abs': np.abs}
+
+
+def randomInterval(rng, lo=-10, hi=10):
+    a, b = sorted(rng.uniform(lo, hi, 2))
+    return Interval(a, b)
+
+
+def contains(iv, x):
+    return Fraction(iv.lo) <= Fraction(x) <= Fraction(iv.hi)
+
+
+@pytest.mark.parametrize('op', [operator.add, operator.sub, operator.mul, operator.truediv])
+def testArithmeticEnclosesExactResults(op):
+    # Exact rational results at the corners and at inner points, so rounding inwards would show
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        a, b = randomInterval(rng), randomInterval(rng)
+        if op is operator.truediv and b.lo <= 0 <= b.hi:
+            continue
+        r = op(a, b)
+        for x in (a.lo, a.hi, rng.uniform(a.lo, a.hi)):
+            for y in (b.lo, b.hi, rng.uniform(b.lo, b.hi)):
+                assert Fraction(r.lo) <= op(Fraction(x), Fraction(y)) <= Fraction(r.hi)
+
+
+def testRoundingIsOutward():
+    s = Interval(0.1) + Interval(0.2)
+    assert s.lo < s.hi
+    assert contains(s, Fraction(0.1) + Fraction(0.2))
+    p = Interval(1 / 3) * Interval(3.0)
+    assert contains(p, Fraction(1 / 3) * 3)
+
+
+@pytest.mark.parametrize('name', sorted(INTERVAL_FUNCS))
+def testFunctionsEncloseLibraryValues(name):
+    # What the scalar (math) and batched (NumPy) engines compute must lie inside
+    rng = np.random.default_rng(1)
+    lo, hi = DOMAINS[name]
+    for _ in range(300):
+        x = randomInterval(rng, lo, hi)
+        r = INTERVAL_FUNCS[name](x)
+        pts = np.concatenate([[x.lo, x.hi], rng.uniform(x.lo, x.hi, 20)])
+        for p in pts:
+            assert r.lo <= FUNCS[name](float(p)) <= r.hi
+        vals = NP_FUNCS[name](pts)
+        assert (r.lo <= vals).all() and (vals <= r.hi).all()
+
+
+def testPowers():
+    rng = np.random.default_rng(2)
+    for _ in range(300):
+        x = randomInterval(rng, -3, 3)
+        for n in (2, 3, 4, -1, 0.5):
+            if (n == -1 and x.lo <= 0 <= x.hi) or (n == 0.5 and x.lo <= 0):
+                continue
+            r = x ** n
+            for p in np.concatenate([[x.lo, x.hi], rng.uniform(x.lo, x.hi, 10)]):
+                assert r.lo <= float(p) ** n <= r.hi
+    assert (Interval(-2, 1) ** 2).lo == 0.0
+
+
+def testPeriodicExtrema():
+    assert INTERVAL_FUNCS['sin'](Interval(0, math.pi)).hi == 1.0
+    assert INTERVAL_FUNCS['cos'](Interval(3.0, 3.3)).lo == -1.0
+    assert INTERVAL_FUNCS['tan'](Interval(1.0, 2.0)).lo == -math.inf
+
+
+def testEquationStepEnclosesTheEngines():
+    # Twenty interval steps of the Jet model against both engines with random noise
+    path = os.path.join(PROJECT_ROOT, 'models', 'Jet.json')
+    step = Equation.buildInterval(path)
+    eq = Equation(path)
+    rng = np.random.default_rng(3)
+    boxes = [Interval(0.8, 1.0), Interval(0.8, 1.0)]
+    states = rng.uniform(0.8, 1.0, (2000, 2))
+    scalar = [tuple(s) for s in states[:50]]
+    for t in range(20):
+        boxes = step(boxes, t)
+        states = eq.getNextStates(states, rng, t)
+        scalar = [eq.getNextState(s) for s in scalar]
+        for i, box in enumerate(boxes):
+            assert (box.lo <= states[:, i]).all() and (states[:, i] <= box.hi).all()
+            assert all(box.lo <= s[i] <= box.hi for s in scalar)
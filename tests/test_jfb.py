@@ -0,0 +1,31 @@
+import math
+
+import pytest
+
+from lib.JFBF import JFB
+
+PAIRS = [(B, c) for B in (10, 100, 1000, 1e4, 1e5, 1e6) for c in (0.5, 0.9, 0.95, 0.99, 0.999, 0.9999)]
+
+
+@pytest.mark.parametrize('B, c', PAIRS)
+def testConfidenceInvertsSampleCount(B, c):
+    # K is the fewest samples that reach c at B, so K - 1 samples fall short
+    jfb = JFB(B, c)
+    K = jfb.getNumberOfSamples()
+    assert jfb.getConfidence(K) >= c
+    assert jfb.getConfidence(K - 1) < c
+
+
+@pytest.mark.parametrize('B, c', PAIRS)
+def testBayesFactorInvertsSampleCount(B, c):
+    jfb = JFB(B, c)
+    K = jfb.getNumberOfSamples()
+    assert jfb.getBayesFactor(K) >= B
+    assert jfb.getBayesFactor(K - 1) < B
+
+
+def testEdgeCases():
+    jfb = JFB(1e5, 0.99)
+    assert jfb.getConfidence(0) == 0.0
+    assert jfb.getBayesFactor(0) == 0.0
+    assert jfb.getBayesFactor(10 ** 7) == math.inf
@@ -0,0 +1,79 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from lib.LogFile import LogFile
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+JET_LOG = os.path.join(PROJECT_ROOT, 'art', 'figA3b', 'Jet.lg')
+
+
+def sameLog(a, b):
+    return (np.array_equal(a.times, b.times) and np.array_equal(a.lo, b.lo)
+            and np.array_equal(a.hi, b.hi))
+
+
+def testBinaryReadsBackTheTextLog(tmp_path):
+    text = LogFile.read(JET_LOG)
+    path = str(tmp_path / 'Jet.lgb')
+    text.write(path)
+    binary = LogFile.read(path)
+    assert sameLog(text, binary)
+    assert binary[0] == text[0]
+    assert binary.maxTime() == text.maxTime()
+
+
+def testTextRoundTrip(tmp_path):
+    log = LogFile.read(JET_LOG)
+    path = str(tmp_path / 'Jet.lg')
+    log.write(path)
+    assert sameLog(log, LogFile.read(path))
+
+
+def testRecordsMatchTheParser():
+    log = LogFile.read(JET_LOG)
+    assert sameLog(LogFile.fromRecords(list(log)), log)
+
+
+def testTimeWindowIsASlice(tmp_path):
+    log = LogFile.read(JET_LOG)
+    path = str(tmp_path / 'Jet.lgb')
+    log.write(path)
+    window = LogFile.readBinary(path, 40, 90)
+    assert sameLog(window, log.subset((log.times >= 40) & (log.times <= 90)))
+
+
+def testMappedLogPicklesItsPath(tmp_path):
+    path = str(tmp_path / 'Jet.lgb')
+    LogFile.read(JET_LOG).write(path)
+    log = LogFile.readBinary(path, 10, None)
+    data = pickle.dumps(log)
+    assert len(data) < 1000
+    assert sameLog(pickle.loads(data), log)
+
+
+def testUnsortedLogIsNotConverted(tmp_path):
+    path = tmp_path / 'unsorted.lg'
+    path.write_text("t=5: [[0.8, 1.0], [0.8, 1.0]]\nt=0: [[0.7, 1.0], [0.8, 1.0]]\n")
+    log = LogFile.read(str(path))
+    assert log[0] == ([[0.8, 1.0], [0.8, 1.0]], 5)
+    with pytest.raises(ValueError, match="time order"):
+        log.write(str(tmp_path / 'unsorted.lgb'))
+
+
+def testNonIntegerTimeNamesTheLine(tmp_path):
+    path = tmp_path / 'bad.lg'
+    path.write_text("t=0: [[0.8, 1.0], [0.8, 1.0]]\nt=2.5: [[0.8, 1.0], [0.8, 1.0]]\n")
+    with pytest.raises(ValueError, match="line 2"):
+        LogFile.read(str(path))
+    with pytest.raises(ValueError, match="not an integer"):
+        LogFile.fromRecords([([[0.8, 1.0]], 0), ([[0.8, 1.0]], 2.5)])
+
+
+def testMalformedLineIsNamed(tmp_path):
+    path = tmp_path / 'bad.lg'
+    path.write_text("t=0: [[0.8, 1.0], [0.8, 1.0]]\nt=1: [[0.8, 1.0], [0.8]]\n")
+    with pytest.raises(ValueError, match="line 2"):
+        LogFile.read(str(path))
@@ -0,0 +1,45 @@
+import numpy as np
+
+from lib.Reservoir import Reservoir
+
+
+def chunked(rng, items, size, chunk):
+    # Each chunk arrives as a uniform sample of min(len, size) of its items, as from a worker
+    for k in range(0, len(items), chunk):
+        part = items[k:k + chunk]
+        pick = rng.choice(len(part), min(len(part), size), replace=False)
+        yield [part[i] for i in pick], len(part)
+
+
+def testKeepsEverythingUntilFull():
+    res = Reservoir(10, np.random.default_rng(0))
+    res.merge([0, 1, 2], 3)
+    res.add(3)
+    assert res.items == [0, 1, 2, 3]
+    assert res.seen == 4
+
+
+def testMergeKeepsSizeAndSeen():
+    rng = np.random.default_rng(1)
+    res = Reservoir(5, rng)
+    items = list(range(37))
+    for sample, total in chunked(rng, items, 5, 6):
+        res.merge(sample, total)
+    assert len(res.items) == 5
+    assert len(set(res.items)) == 5
+    assert set(res.items) <= set(items)
+    assert res.seen == 37
+
+
+def testMergeIsUniform():
+    # Every one of 20 items should end up in a size-5 reservoir with probability 1/4
+    rng = np.random.default_rng(2)
+    n, size, trials = 20, 5, 4000
+    hits = np.zeros(n)
+    for _ in range(trials):
+        res = Reservoir(size, rng)
+        for sample, total in chunked(rng, list(range(n)), size, 3):
+            res.merge(sample, total)
+        hits[res.items] += 1
+    # 4 standard deviations of a binomial(4000, 1/4) share
+    assert np.abs(hits / trials - size / n).max() < 4 * np.sqrt(0.25 * 0.75 / trials)
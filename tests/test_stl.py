@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from lib.STL import STL, slidingMax, slidingMin
+from lib.LogFile import LogFile
+
+
+def bruteSlidingMax(x, a, b):
+    K, T = x.shape
+    out = np.full((K, T), -np.inf)
+    for t in range(T):
+        hi = T - 1 if b is None else min(t + b, T - 1)
+        if t + a <= hi:
+            out[:, t] = x[:, t + a:hi + 1].max(axis=1)
+    return out
+
+
+def bruteUntil(phi, psi, a, b):
+    # max over k in [a, b] of min(psi(t+k), min of phi(t..t+k)), over the steps that exist
+    K, T = phi.shape
+    out = np.full((K, T), -np.inf)
+    for t in range(T):
+        hi = T - 1 - t if b is None else min(b, T - 1 - t)
+        for k in range(a, hi + 1):
+            out[:, t] = np.maximum(out[:, t], np.minimum(psi[:, t + k], phi[:, t:t + k + 1].min(axis=1)))
+    return out
+
+
+def randomWindow(rng, T):
+    a = int(rng.integers(0, T + 3))
+    b = None if rng.random() < 0.25 else a + int(rng.integers(0, T + 3))
+    return a, b
+
+
+def testSlidingWindowsMatchBruteForce():
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        T = int(rng.integers(1, 40))
+        x = rng.normal(0, 1, (3, T))
+        a, b = randomWindow(rng, T)
+        np.testing.assert_array_equal(slidingMax(x, a, b), bruteSlidingMax(x, a, b))
+        np.testing.assert_array_equal(slidingMin(x, a, b), -bruteSlidingMax(-x, a, b))
+
+
+def testUntilMatchesBruteForce():
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        T = int(rng.integers(1, 30))
+        # Few distinct values, so ties and sign changes are common
+        phi = rng.integers(-2, 3, (3, T)).astype(float)
+        psi = rng.integers(-2, 3, (3, T)).astype(float)
+        a, b = randomWindow(rng, T)
+        np.testing.assert_array_equal(STL.until(phi, psi, a, b), bruteUntil(phi, psi, a, b))
+
+
+def testAtomStrictness():
+    X = np.array([[[0.5]], [[0.4]], [[0.6]]])
+    assert list(STL("x <= 0.5", ['x']).getViolations(X)) == [-1, -1, 0]
+    assert list(STL("x < 0.5", ['x']).getViolations(X)) == [0, -1, 0]
+
+
+def testFirstViolationUnderG():
+    X = np.array([[0.0, 0.0, 1.0, 0.0], [0.0] * 4])[..., None]
+    assert list(STL("G x < 0.5", ['x']).getViolations(X)) == [2, -1]
+    assert list(STL("G[3,3] x < 0.5", ['x']).getViolations(X)) == [-1, -1]
+
+
+def testReservedStateNames():
+    with pytest.raises(ValueError, match="reserved"):
+        STL("G F > 0", ['F', 'x'])
+
+
+def testLogRecordsAgainstInvariants():
+    spec = STL("G[5,10] x < 1 & G y >= 0 & F x > 3", ['x', 'y'])
+    log = LogFile(np.array([0, 5, 7, 11]),
+                  np.array([[0, 0], [0, 0], [0, -1], [0, 0]], dtype=float),
+                  np.array([[1, 1], [1, 1], [0.5, 1], [0.5, 1]], dtype=float))
+    safe, unsafe = spec.getSafeUnsafeLog(log)
+    # t=5 touches x = 1, which x < 1 excludes; t=7 reaches y < 0
+    assert list(unsafe.times) == [5, 7]
+    assert list(safe.times) == [0, 11]
+    assert not spec.logComplete
+    assert STL("G (x > -0.1 & y > -0.1)", ['x', 'y']).logComplete
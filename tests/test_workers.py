@@ -0,0 +1,29 @@
+import os
+import io
+import contextlib
+
+import pytest
+
+from System import System
+
+PROJECT_ROOT = os.environ['POSTO_ROOT_DIR']
+
+# Fields of a checkSafety result that must not depend on the number of workers
+RESULT_FIELDS = ('verdict', 'valid', 'safe', 'unsafe', 'trajsGenerated', 'rejectionProfile')
+
+
+def check(log, model, workers, K=None):
+    system = System(log, 'equation', os.path.join(PROJECT_ROOT, model), workers=workers, seed=5, plot=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = system.runSafetyCheck(quiet=True, K=K)
+    return {key: result[key] for key in RESULT_FIELDS}
+
+
+@pytest.mark.parametrize('log, model, K', [
+    (('art', 'figA3d', 'Jet.lg'), 'models/Jet.json', None),
+    (('art', 'figB6a', 'MCcontroller.lg'), 'models/MountainCarCL.json', 100),
+])
+def testWorkersMatchSingleProcess(shippedLog, log, model, K):
+    # Batches draw from seeded streams of their own, so the split over processes changes nothing
+    path = shippedLog(*log)
+    assert check(path, model, 1, K) == check(path, model, 3, K)